@@ -0,0 +1,146 @@
+"""
+Admission Control for Synchronous Analyses
+Bounds the analyses that run or wait at the same time; overflow is rejected right
+away with an estimated retry delay instead of queueing behind the server threads,
+and waiting requests whose client has disconnected are dropped
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from metrics import REGISTRY, Counter, Gauge, stage_estimate_ms
+
+# Stages an uncached analysis runs ('contours' is part of 'detections'). Their recent
+# durations add up to the service time; cache hits only run 'cache_lookup', so they
+# do not pull the estimate down
+ANALYSIS_STAGES = ('decode', 'inference', 'detections', 'render', 'report', 'save_reports')
+
+ADMISSION_EVENTS = REGISTRY.register(Counter(
+    'dentx_admission_events_total', 'Admission decisions (admitted, rejected, timeout, cancelled)', ('event',)
+))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    'dentx_admission_queued', 'Analyses waiting for an admission slot'
+))
+
+
+class AdmissionRejected(Exception):
+    """The server is at capacity; retry_after is the suggested delay in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AnalysisCancelled(Exception):
+    """The client disconnected before the analysis finished"""
+
+
+class AdmissionController:
+    """
+    Limits in-flight and waiting analyses and estimates when capacity frees up
+
+    Limits are per process: under prefork_server.py every worker admits its own
+    max_in_flight / max_queued analyses
+    """
+
+    def __init__(self, max_in_flight: int = 2, max_queued: int = 1, queue_timeout: float = 30.0,
+                 poll_interval: float = 0.1, initial_service_time: float = 5.0):
+        """
+        Args:
+            max_in_flight: Analyses allowed to run at the same time
+            max_queued: Analyses allowed to wait for a slot (beyond that: rejected)
+            queue_timeout: Longest time in seconds a request waits for a slot
+            poll_interval: How often waiting requests check for a client disconnect
+            initial_service_time: Assumed analysis time in seconds before any stage was measured
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self.initial_service_time = initial_service_time
+        self.counters = {'admitted': 0, 'rejected': 0, 'timeout': 0, 'cancelled': 0}
+
+    def _count(self, event: str):
+        self.counters[event] += 1
+        ADMISSION_EVENTS.inc(event=event)
+
+    def service_time(self) -> float:
+        """Expected seconds of one uncached analysis, from the recent per-stage latencies"""
+        measured = [stage_estimate_ms(stage, -1.0) for stage in ANALYSIS_STAGES]
+        if all(ms < 0 for ms in measured):
+            return self.initial_service_time
+        return sum(ms for ms in measured if ms > 0) / 1000
+
+    def _retry_after(self) -> int:
+        """Seconds until the work ahead of a new request should have drained"""
+        waves = (self._in_flight + self._queued + 1) / self.max_in_flight
+        return max(1, math.ceil(self.service_time() * waves))
+
+    def _acquire(self, is_cancelled: Optional[Callable[[], bool]]):
+        with self._cond:
+            if self._in_flight < self.max_in_flight and self._queued == 0:
+                self._in_flight += 1
+                self._count('admitted')
+                return
+            if self._queued >= self.max_queued:
+                self._count('rejected')
+                raise AdmissionRejected("Server is busy, please retry later", self._retry_after())
+
+            deadline = time.monotonic() + self.queue_timeout
+            self._queued += 1
+            ADMISSION_QUEUED.inc()
+            try:
+                while self._in_flight >= self.max_in_flight:
+                    if is_cancelled is not None and is_cancelled():
+                        self._count('cancelled')
+                        raise AnalysisCancelled("Client disconnected while waiting for an analysis slot")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count('timeout')
+                        raise AdmissionRejected("Timed out waiting for an analysis slot", self._retry_after())
+                    self._cond.wait(min(self.poll_interval, remaining))
+                self._in_flight += 1
+                self._count('admitted')
+            finally:
+                self._queued -= 1
+                ADMISSION_QUEUED.dec()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, is_cancelled: Callable[[], bool] = None):
+        """
+        Hold an analysis slot for the enclosed block
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait timed out
+            AnalysisCancelled: If is_cancelled() turned true while waiting
+        """
+        self._acquire(is_cancelled)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def get_stats(self) -> Dict:
+        """Current occupancy, decisions so far and the retry estimate"""
+        with self._cond:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queued': self.max_queued,
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'mean_service_time_s': round(self.service_time(), 3),
+                'retry_after_s': self._retry_after(),
+                **self.counters,
+            }
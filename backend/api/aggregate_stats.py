@@ -0,0 +1,279 @@
+"""
+Aggregate Statistics
+Population statistics of all analyses (disease / severity / urgency distributions,
+per-tooth prevalence, detection-count and latency histograms) kept as daily
+counters that every finished prediction updates incrementally, so /api/stats
+answers time windows without reading the saved reports. Counters survive
+restarts through a small JSON snapshot, which prefork workers merge into under a
+file lock
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import fcntl  # Serializes snapshot merges across prefork workers (Linux / macOS)
+except ImportError:
+    fcntl = None
+
+# Histogram upper bounds (inclusive); the last slot counts everything above
+DETECTION_COUNT_BUCKETS = (0, 4, 8, 12, 16, 20, 24, 28, 32)
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+SNAPSHOT_VERSION = 1
+
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+
+def _bucket_index(bounds: tuple, value: float) -> int:
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+def _empty_bucket() -> Dict:
+    return {
+        'studies': 0,
+        'detections': 0,
+        'disease': {},
+        'severity': {},
+        'urgency': {},
+        # tooth number -> [studies in which it was detected, studies in which it was diseased]
+        'teeth': {},
+        'detection_counts': [0] * (len(DETECTION_COUNT_BUCKETS) + 1),
+        'latency_ms': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        'latency_sum_ms': 0.0,
+        'latency_count': 0,
+    }
+
+
+def _merge_bucket(target: Dict, source: Dict):
+    """Add the counters of source to target"""
+    for key in ('studies', 'detections', 'latency_sum_ms', 'latency_count'):
+        target[key] += source[key]
+    for key in ('disease', 'severity', 'urgency'):
+        for name, count in source[key].items():
+            target[key][name] = target[key].get(name, 0) + count
+    for tooth, (detected, diseased) in source['teeth'].items():
+        counts = target['teeth'].setdefault(tooth, [0, 0])
+        counts[0] += detected
+        counts[1] += diseased
+    for key in ('detection_counts', 'latency_ms'):
+        target[key] = [a + b for a, b in zip(target[key], source[key])]
+
+
+def _histogram(bounds: tuple, counts: List[int]) -> List[Dict]:
+    """Buckets as [{'le': upper bound, 'count': n}, ...]; the overflow bucket has le None"""
+    return [{'le': bound, 'count': count} for bound, count in zip(list(bounds) + [None], counts)]
+
+
+def _percentile(bounds: tuple, counts: List[int], fraction: float) -> Optional[float]:
+    """Upper bound of the histogram bucket holding the given fraction of observations (None above the last bound)"""
+    total = sum(counts)
+    if not total:
+        return None
+    cumulative = 0
+    for index, count in enumerate(counts):
+        cumulative += count
+        if cumulative >= fraction * total:
+            return bounds[index] if index < len(bounds) else None
+    return None
+
+
+class AggregateStats:
+    """Daily population counters with windowed summaries and a persistent snapshot"""
+
+    def __init__(self, snapshot_path: str, writer=None, retention_days: int = 400,
+                 snapshot_interval: float = 60.0):
+        """
+        Args:
+            snapshot_path: JSON snapshot file (loaded at start, rewritten periodically)
+            writer: Optional ArtifactWriter that saves snapshots in the background
+            retention_days: Daily buckets older than this are dropped
+            snapshot_interval: Minimum seconds between two snapshots
+        """
+        self.snapshot_path = snapshot_path
+        self.writer = writer
+        self.retention_days = retention_days
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        # Counters saved in (or merged from) the snapshot, local changes since, and
+        # changes currently being merged into the file
+        self._saved: Dict[str, Dict] = {}
+        self._delta: Dict[str, Dict] = {}
+        self._saving: Dict[str, Dict] = {}
+        self._last_snapshot = time.monotonic()
+        self._snapshot_queued = False
+
+        self._saved = self._read_snapshot()
+        atexit.register(self.save_snapshot)
+
+    def record(self, results: Dict, latency_ms: float = None, at: float = None):
+        """Count one finished analysis"""
+        detections = results.get('detections') or []
+        day = _day(at if at is not None else time.time())
+        with self._lock:
+            bucket = self._delta.get(day)
+            if bucket is None:
+                bucket = self._delta[day] = _empty_bucket()
+            bucket['studies'] += 1
+            bucket['detections'] += len(detections)
+            bucket['detection_counts'][_bucket_index(DETECTION_COUNT_BUCKETS, len(detections))] += 1
+            if latency_ms is not None:
+                bucket['latency_ms'][_bucket_index(LATENCY_BUCKETS_MS, latency_ms)] += 1
+                bucket['latency_sum_ms'] += latency_ms
+                bucket['latency_count'] += 1
+
+            teeth = {}
+            for det in detections:
+                disease = det['disease_type']
+                bucket['disease'][disease] = bucket['disease'].get(disease, 0) + 1
+                bucket['severity'][det['severity']] = bucket['severity'].get(det['severity'], 0) + 1
+                level = det['urgency'].split(' - ')[0]
+                bucket['urgency'][level] = bucket['urgency'].get(level, 0) + 1
+                tooth = str(det['tooth_number'])
+                teeth[tooth] = teeth.get(tooth, False) or disease != 'Healthy'
+            for tooth, diseased in teeth.items():
+                counts = bucket['teeth'].setdefault(tooth, [0, 0])
+                counts[0] += 1
+                counts[1] += int(diseased)
+
+            due = not self._snapshot_queued and time.monotonic() - self._last_snapshot >= self.snapshot_interval
+            if due:
+                self._snapshot_queued = True
+        if due:
+            if self.writer is not None:
+                self.writer.defer(self.save_snapshot)
+            else:
+                self.save_snapshot()
+
+    def summary(self, days: int = None, now: float = None) -> Dict:
+        """
+        Aggregates over the last `days` days (today included), or over all retained days
+
+        Cost is proportional to the number of days in the window, not to the number
+        of analyses.
+        """
+        now = now if now is not None else time.time()
+        first_day = _day(now - (days - 1) * 86400) if days else None
+        total = _empty_bucket()
+        with self._lock:
+            for buckets in (self._saved, self._saving, self._delta):
+                for day, bucket in buckets.items():
+                    if first_day is None or day >= first_day:
+                        _merge_bucket(total, bucket)
+
+        return {
+            'window_days': days,
+            'since': first_day,
+            'studies': total['studies'],
+            'detections': total['detections'],
+            'disease_distribution': total['disease'],
+            'severity_distribution': total['severity'],
+            'urgency_distribution': total['urgency'],
+            'tooth_prevalence': [
+                {
+                    'tooth_number': int(tooth),
+                    'studies': detected,
+                    'diseased': diseased,
+                    'prevalence': round(diseased / detected, 4) if detected else 0.0
+                }
+                for tooth, (detected, diseased) in sorted(total['teeth'].items(), key=lambda item: int(item[0]))
+            ],
+            'detections_per_study': _histogram(DETECTION_COUNT_BUCKETS, total['detection_counts']),
+            'latency_ms': {
+                'histogram': _histogram(LATENCY_BUCKETS_MS, total['latency_ms']),
+                'mean': round(total['latency_sum_ms'] / total['latency_count'], 1) if total['latency_count'] else None,
+                'p50_at_most': _percentile(LATENCY_BUCKETS_MS, total['latency_ms'], 0.5),
+                'p95_at_most': _percentile(LATENCY_BUCKETS_MS, total['latency_ms'], 0.95),
+            },
+        }
+
+    def _read_snapshot(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                print(f"⚠️ Ignoring aggregate stats snapshot with version {snapshot.get('version')}")
+                return {}
+            buckets = {}
+            for day, saved in snapshot.get('days', {}).items():
+                # Start from an empty bucket so counters added in later versions default to 0
+                bucket = _empty_bucket()
+                bucket.update(saved)
+                buckets[day] = bucket
+            return buckets
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Could not read aggregate stats snapshot: {e}")
+            return {}
+
+    def save_snapshot(self):
+        """
+        Merge local changes into the snapshot file and reload it
+
+        The file is re-read under a lock first, so several processes sharing the
+        snapshot all keep their counts (and see each other's after their next save).
+        """
+        with self._lock:
+            delta, self._delta = self._delta, {}
+            self._saving = delta
+        if not delta:
+            with self._lock:
+                self._snapshot_queued = False
+            return
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(self.snapshot_path + '.lock', 'a')
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            buckets = self._read_snapshot()
+            for day, bucket in delta.items():
+                _merge_bucket(buckets.setdefault(day, _empty_bucket()), bucket)
+            oldest = _day(time.time() - self.retention_days * 86400)
+            buckets = {day: bucket for day, bucket in sorted(buckets.items()) if day >= oldest}
+
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'days': buckets},
+                          f, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"⚠️ Saving aggregate stats snapshot failed: {e}")
+            # Keep the unsaved counts for the next attempt
+            with self._lock:
+                for day, bucket in delta.items():
+                    _merge_bucket(self._delta.setdefault(day, _empty_bucket()), bucket)
+                self._saving = {}
+                self._snapshot_queued = False
+            return
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+
+        with self._lock:
+            self._saved = buckets
+            self._saving = {}
+            self._last_snapshot = time.monotonic()
+            self._snapshot_queued = False
+
+    def get_stats(self) -> Dict:
+        """Snapshot bookkeeping"""
+        with self._lock:
+            return {
+                'snapshot_path': self.snapshot_path,
+                'days': len(set(self._saved) | set(self._saving) | set(self._delta)),
+                'unsaved_days': len(self._delta),
+                'seconds_since_snapshot': round(time.monotonic() - self._last_snapshot, 1),
+            }
@@ -0,0 +1,168 @@
+"""
+Annotation Renderer
+Draws tooth outlines, labels and semi-transparent polygon fills directly into
+a single BGR array - fills are rasterized into one index mask and only the
+covered pixels are alpha-blended, without full-frame RGBA overlays
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from label_layout import LabelLayout
+from metrics import span
+
+# Opacity of the polygon fills (128 = 50% of 255)
+FILL_ALPHA = 128
+LABEL_FONT_SIZE = 16
+LABEL_PADDING = 4
+LABEL_BORDER = 2
+OUTLINE_WIDTH = 2
+
+
+@lru_cache(maxsize=8)
+def load_font(size: int) -> ImageFont.ImageFont:
+    """Load the label font once per size"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+def hex_to_bgr(color_hex: str) -> Tuple[int, int, int]:
+    """Convert '#RRGGBB' to an OpenCV BGR tuple"""
+    r, g, b = (int(color_hex.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
+    return b, g, r
+
+
+def label_text(detection: Dict) -> str:
+    """Single-line label: disease, tooth number and confidence"""
+    return f"{detection['disease_type']} #{detection['tooth_number']} ({detection['confidence']:.0%})"
+
+
+def _fill_rect(canvas: np.ndarray, x0: int, y0: int, x1: int, y1: int, color):
+    """Fill an inclusive pixel rectangle, clipped to the canvas"""
+    h, w = canvas.shape[:2]
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(w - 1, x1), min(h - 1, y1)
+    if x0 <= x1 and y0 <= y1:
+        canvas[y0:y1 + 1, x0:x1 + 1] = color
+
+
+def _blend_text(canvas: np.ndarray, x: int, y: int, text: str, font):
+    """Alpha-blend anti-aliased white text at (x, y)"""
+    bbox = font.getbbox(text)
+    width, height = bbox[2], bbox[3]
+    if width <= 0 or height <= 0:
+        return
+    glyphs = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(glyphs).text((0, 0), text, fill=255, font=font)
+    alpha = np.asarray(glyphs, dtype=np.uint16)
+
+    h, w = canvas.shape[:2]
+    cx0, cy0 = max(0, x), max(0, y)
+    cx1, cy1 = min(w, x + width), min(h, y + height)
+    if cx0 >= cx1 or cy0 >= cy1:
+        return
+    alpha = alpha[cy0 - y:cy1 - y, cx0 - x:cx1 - x, None]
+    region = canvas[cy0:cy1, cx0:cx1]
+    region[:] = ((255 * alpha + region.astype(np.uint16) * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+
+def blend_polygon_fills(canvas: np.ndarray, polygons: List[List[tuple]], colors: List[Tuple[int, int, int]],
+                        alpha: int = FILL_ALPHA):
+    """
+    Blend all polygon fills into the canvas in place
+
+    Polygons are rasterized in one pass into an index mask (later polygons win
+    where they overlap) restricted to their joint bounding box, and only the
+    covered pixels are blended
+    """
+    if not polygons:
+        return
+    h, w = canvas.shape[:2]
+    points = [np.asarray(polygon, dtype=np.int32) for polygon in polygons]
+    stacked = np.concatenate(points)
+    x0, y0 = np.clip(stacked.min(axis=0), 0, [w - 1, h - 1])
+    x1, y1 = np.clip(stacked.max(axis=0), 0, [w - 1, h - 1])
+
+    mask_dtype = np.uint8 if len(points) < 255 else np.uint16
+    mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=mask_dtype)
+    offset = np.array([x0, y0], dtype=np.int32)
+    for index, pts in enumerate(points, start=1):
+        cv2.fillPoly(mask, [pts - offset], index)
+
+    covered = mask > 0
+    if not covered.any():
+        return
+    palette = np.array([(0, 0, 0)] + list(colors), dtype=np.uint16)
+    region = canvas[y0:y1 + 1, x0:x1 + 1]
+    pixels = region[covered].astype(np.uint16)
+    fills = palette[mask[covered]]
+    region[covered] = ((fills * alpha + pixels * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+
+def render_annotations(image: np.ndarray, detections: List[Dict], timings: Dict[str, float] = None,
+                       fills: bool = True) -> np.ndarray:
+    """
+    Draw color-coded polygon masks and non-overlapping labels for the given detections
+
+    Args:
+        image: Decoded BGR image (not modified)
+        detections: Detections to draw
+        timings: Optional dict that receives the label layout time in ms
+        fills: Blend the semi-transparent polygon fills (False: outlines and labels only)
+
+    Returns:
+        Annotated BGR image
+    """
+    canvas = image.copy()
+    height, width = canvas.shape[:2]
+    font = load_font(LABEL_FONT_SIZE)
+
+    # Lay out all labels first (deterministic, spatially indexed)
+    with span('label_layout', timings):
+        layout = LabelLayout(width, height, margin=LABEL_PADDING)
+        labels = []
+        for detection in detections:
+            bbox = detection['bounding_box']
+            text = label_text(detection)
+            text_bbox = font.getbbox(text)
+            text_width = text_bbox[2] - text_bbox[0]
+            text_height = text_bbox[3] - text_bbox[1]
+            label_x, label_y = layout.place(
+                (bbox['x1'], bbox['y1'], bbox['x2'], bbox['y2']), text_width, text_height
+            )
+            labels.append((text, label_x, label_y, text_width, text_height))
+
+    fill_polygons = []
+    fill_colors = []
+
+    for detection, (text, label_x, label_y, text_width, text_height) in zip(detections, labels):
+        polygon = detection.get('polygon', [])
+        color = hex_to_bgr(detection.get('color', '#FFFFFF'))
+
+        # Thin colored outline for definition, fills are blended in one pass at the end
+        if polygon and len(polygon) >= 3:
+            if fills:
+                fill_polygons.append(polygon)
+                fill_colors.append(color)
+            pts = np.asarray(polygon, dtype=np.int32)
+            cv2.polylines(canvas, [pts], True, color, OUTLINE_WIDTH)
+
+        # Label background: colored border around a black box
+        bg_x0, bg_y0 = label_x - LABEL_PADDING, label_y - LABEL_PADDING
+        bg_x1, bg_y1 = label_x + text_width + LABEL_PADDING, label_y + text_height + LABEL_PADDING
+        _fill_rect(canvas, bg_x0, bg_y0, bg_x1, bg_y1, color)
+        _fill_rect(canvas, bg_x0 + LABEL_BORDER, bg_y0 + LABEL_BORDER,
+                   bg_x1 - LABEL_BORDER, bg_y1 - LABEL_BORDER, (0, 0, 0))
+
+        # White text
+        _blend_text(canvas, label_x, label_y, text, font)
+
+    # Semi-transparent fills go over everything drawn above
+    blend_polygon_fills(canvas, fill_polygons, fill_colors)
+    return canvas
@@ -3,23 +3,36 @@ Tooth Detection API Server - FIXED VERSION
 Production-ready API for mobile app integration
 """
 
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, request, send_file, jsonify, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
 from pathlib import Path
-import uuid
 import traceback
 import io
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import prediction and PDF modules
-from predict_enhanced import ToothDiseasePredictor
+from predict_enhanced import ToothDiseasePredictor, POLYGON_MODES
 from pdf_generator import generate_pdf_report
 from email_service import email_service
+from job_queue import JobQueue, JobStatus, QueueFullError
+from prediction_cache import PredictionCache
+from study_store import StudyStore
+from contour_extraction import CONTOUR_ENGINES
+from admission import AdmissionController, AdmissionRejected, AnalysisCancelled
+from latency_budget import LatencyBudget
+from artifact_writer import ArtifactWriter
+from blob_store import BlobStore, LocalBlobBackend
+from results_index import ResultsIndex, parse_timestamp
+from aggregate_stats import AggregateStats
+from retention import RetentionSweeper
+from metrics import (span, start_trace, end_trace, current_trace, render_metrics,
+                     REQUESTS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, ANALYSES_IN_FLIGHT)
 
 app = Flask(__name__)
 CORS(app)
@@ -28,14 +41,58 @@ CORS(app)
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results_pridects'
 MODEL_PATH = str(Path(__file__).parent.parent / 'model' / 'best.pt')
+PREVIEW_MODEL_PATH = os.getenv('PREVIEW_MODEL_PATH', str(Path(__file__).parent.parent / 'model' / 'preview.pt'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tiff'}
 MAX_FILE_SIZE = 16 * 1024 * 1024
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '16'))
+INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'true').lower() == 'true'
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '8'))
+BATCH_WINDOW_MS = float(os.getenv('BATCH_WINDOW_MS', '10'))
+PREDICTION_CACHE = os.getenv('PREDICTION_CACHE', 'true').lower() == 'true'
+CACHE_MEMORY_MB = float(os.getenv('CACHE_MEMORY_MB', '128'))
+CACHE_DISK_MB = float(os.getenv('CACHE_DISK_MB', '512'))
+CACHE_TTL_HOURS = float(os.getenv('CACHE_TTL_HOURS', '24'))
+RAW_CONF_FLOOR = float(os.getenv('RAW_CONF_FLOOR', '0.05'))
+STUDY_STORE_MB = float(os.getenv('STUDY_STORE_MB', '256'))
+CONTOUR_WORKERS = int(os.getenv('CONTOUR_WORKERS', '0')) or None
+CONTOUR_TIMEOUT_S = float(os.getenv('CONTOUR_TIMEOUT_S', '2.0'))
+CONTOUR_EXECUTOR = os.getenv('CONTOUR_EXECUTOR', 'thread')
+CONTOUR_ENGINE = os.getenv('CONTOUR_ENGINE', 'grabcut')
+GRABCUT_MAX_SIDE = int(os.getenv('GRABCUT_MAX_SIDE', '0')) or None
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'torch')
+TILE_THRESHOLD_MP = float(os.getenv('TILE_THRESHOLD_MP', '3.0'))
+TILE_SIZE = int(os.getenv('TILE_SIZE', '1280'))
+TILE_OVERLAP = int(os.getenv('TILE_OVERLAP', '256'))
+# Keep ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUED below the server threads so a
+# thread stays free to answer 429s and light routes
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '2'))
+ADMISSION_MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', '1'))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_S', '30'))
+INSIGHTS_BACKEND = os.getenv('INSIGHTS_BACKEND', 'gemini')
+INSIGHTS_CACHE_SIZE = int(os.getenv('INSIGHTS_CACHE_SIZE', '512'))
+INSIGHTS_TTL_HOURS = float(os.getenv('INSIGHTS_TTL_HOURS', '24'))
+INSIGHTS_STUB_LATENCY_MS = float(os.getenv('INSIGHTS_STUB_LATENCY_MS', '0'))
+ARTIFACT_QUEUE_SIZE = int(os.getenv('ARTIFACT_QUEUE_SIZE', '256'))
+ARTIFACT_BATCH_SIZE = int(os.getenv('ARTIFACT_BATCH_SIZE', '32'))
+RESULTS_DB = os.getenv('RESULTS_DB', '')  # Default: results.db in the results folder
+STATS_RETENTION_DAYS = int(os.getenv('STATS_RETENTION_DAYS', '400'))
+STATS_SNAPSHOT_INTERVAL_S = float(os.getenv('STATS_SNAPSHOT_INTERVAL_S', '60'))
+RETENTION_MAX_MB = float(os.getenv('RETENTION_MAX_MB', '2048'))  # 0 = no size limit
+RETENTION_MAX_AGE_DAYS = float(os.getenv('RETENTION_MAX_AGE_DAYS', '90'))  # 0 = no age limit
+RETENTION_MIN_IDLE_S = float(os.getenv('RETENTION_MIN_IDLE_S', '600'))
+RETENTION_INTERVAL_S = float(os.getenv('RETENTION_INTERVAL_S', '600'))
+UPLOAD_ORPHAN_AGE_S = float(os.getenv('UPLOAD_ORPHAN_AGE_S', '3600'))
+
+# Uploads are decoded in memory, so reject oversized bodies up front (413)
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Create folders
 uploads_dir = Path(__file__).parent.parent / UPLOAD_FOLDER
 results_dir = Path(__file__).parent.parent / RESULTS_FOLDER
 uploads_dir.mkdir(exist_ok=True)
 results_dir.mkdir(exist_ok=True)
+cache_dir = Path(__file__).parent.parent / 'cache' / 'predictions'
 
 # Initialize predictor
 print("="*70)
@@ -44,7 +101,67 @@ print("="*70)
 print(f"\nInitializing model from: {MODEL_PATH}")
 
 try:
-    predictor = ToothDiseasePredictor(model_path=MODEL_PATH, gemini_api_key=os.getenv("GEMINI_API_KEY"))
+    prediction_cache = None
+    if PREDICTION_CACHE:
+        prediction_cache = PredictionCache(
+            str(cache_dir),
+            max_memory_bytes=int(CACHE_MEMORY_MB * 1024 * 1024),
+            max_disk_bytes=int(CACHE_DISK_MB * 1024 * 1024),
+            ttl_seconds=CACHE_TTL_HOURS * 3600
+        )
+    
+    # Annotated images and reports are written by one background thread into the
+    # content-addressed blob store (identical artifacts are stored once)
+    blob_store = BlobStore(LocalBlobBackend(str(results_dir)), str(results_dir))
+    artifact_writer = ArtifactWriter(max_queued=ARTIFACT_QUEUE_SIZE, batch_size=ARTIFACT_BATCH_SIZE,
+                                     store=blob_store)
+    results_index = ResultsIndex(RESULTS_DB or str(results_dir / 'results.db'))
+    retention = RetentionSweeper(
+        str(results_dir),
+        str(uploads_dir),
+        max_bytes=int(RETENTION_MAX_MB * 1024 * 1024),
+        max_age_seconds=RETENTION_MAX_AGE_DAYS * 86400,
+        min_idle_seconds=RETENTION_MIN_IDLE_S,
+        orphan_age_seconds=UPLOAD_ORPHAN_AGE_S,
+        interval=RETENTION_INTERVAL_S,
+        writer=artifact_writer,
+        store=blob_store,
+        index=results_index
+    )
+    aggregate_stats = AggregateStats(
+        str(results_dir / 'aggregate_stats.json'),
+        writer=artifact_writer,
+        retention_days=STATS_RETENTION_DAYS,
+        snapshot_interval=STATS_SNAPSHOT_INTERVAL_S
+    )
+    
+    predictor = ToothDiseasePredictor(
+        model_path=MODEL_PATH,
+        gemini_api_key=os.getenv("GEMINI_API_KEY"),
+        batching=INFERENCE_BATCHING,
+        max_batch_size=BATCH_MAX_SIZE,
+        batch_window_ms=BATCH_WINDOW_MS,
+        cache=prediction_cache,
+        raw_conf_floor=RAW_CONF_FLOOR,
+        study_store=StudyStore(max_bytes=int(STUDY_STORE_MB * 1024 * 1024)),
+        contour_workers=CONTOUR_WORKERS,
+        contour_timeout=CONTOUR_TIMEOUT_S,
+        contour_executor=CONTOUR_EXECUTOR,
+        contour_engine=CONTOUR_ENGINE,
+        grabcut_max_side=GRABCUT_MAX_SIDE,
+        inference_engine=INFERENCE_ENGINE,
+        preview_model_path=PREVIEW_MODEL_PATH,
+        tile_threshold_px=int(TILE_THRESHOLD_MP * 1_000_000),
+        tile_size=TILE_SIZE,
+        tile_overlap=TILE_OVERLAP,
+        insights_backend=INSIGHTS_BACKEND,
+        insights_cache_size=INSIGHTS_CACHE_SIZE,
+        insights_ttl=INSIGHTS_TTL_HOURS * 3600,
+        insights_stub_latency_ms=INSIGHTS_STUB_LATENCY_MS,
+        artifact_writer=artifact_writer,
+        results_index=results_index,
+        aggregate_stats=aggregate_stats
+    )
     print(f"[OK] Model loaded successfully!")
     print(f"[OK] Classes: {len(predictor.model.names)}")
     print(f"[OK] Accuracy: 92.07%% mAP@0.5")
@@ -56,6 +173,86 @@ except Exception as e:
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def debug_requested():
+    """Query parameter debug=true attaches the timing spans to the response"""
+    return request.args.get('debug', 'false').lower() == 'true'
+
+def run_prediction_job(image_bytes, conf_threshold, image_name, include_polygons, contour_engine=None,
+                       preview=False, debug=False):
+    """Worker function for queued analyses"""
+    trace, token = start_trace()
+    try:
+        with ANALYSES_IN_FLIGHT.track():
+            results = predictor.predict(
+                image_bytes, conf_threshold=conf_threshold, image_name=image_name,
+                include_polygons=include_polygons, contour_engine=contour_engine, preview=preview
+            )
+    finally:
+        end_trace(token)
+    retention.touch(results['unique_id'])
+    if debug:
+        results = dict(results, spans=trace.to_list())
+    return results
+
+# Background analysis queue (request threads only enqueue work)
+job_queue = JobQueue(run_prediction_job, max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE)
+
+# Bounded admission for the synchronous analysis routes (predict, predict-pdf)
+admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    max_queued=ADMISSION_MAX_QUEUED,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_S
+)
+
+def client_disconnected():
+    """Waitress' disconnect check for this request (None without channel_request_lookahead)"""
+    return request.environ.get('waitress.client_disconnected')
+
+def latency_budget():
+    """
+    Per-request deadline from the X-Latency-Budget-Ms header or the deadline_ms field,
+    counted from the arrival of the request (None if not set)
+
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    value = request.headers.get('X-Latency-Budget-Ms') or request.values.get('deadline_ms')
+    if not value:
+        return None
+    return LatencyBudget(float(value), started=g.get('request_started'))
+
+def busy_response(error):
+    """429 with the estimated delay until an analysis slot frees up"""
+    response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@app.before_request
+def start_request_metrics():
+    """Start the request timer, in-flight gauge and span trace"""
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.request_started = time.perf_counter()
+    g.trace, g.trace_token = start_trace()
+    REQUESTS_IN_FLIGHT.inc(route=g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request by route/status and observe its latency"""
+    route = g.get('metrics_route', 'unmatched')
+    REQUESTS.inc(route=route, method=request.method, status=str(response.status_code))
+    if 'request_started' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, route=route)
+        if debug_requested():
+            response.headers['Server-Timing'] = g.trace.server_timing()
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'trace_token' in g:
+        REQUESTS_IN_FLIGHT.dec(route=g.metrics_route)
+        end_trace(g.trace_token)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -63,7 +260,9 @@ def health_check():
         'model': 'loaded',
         'version': '1.0',
         'accuracy': '92.07% mAP@0.5',
-        'classes': len(predictor.model.names)
+        'classes': len(predictor.model.names),
+        'inference_engine': predictor.inference_engine,
+        'preview_model': predictor.preview_model is not None
     })
 
 @app.route('/api/predict', methods=['POST'])
@@ -78,15 +277,212 @@ def predict():
             return jsonify({'error': 'Invalid file type'}), 400
         
         conf_threshold = float(request.form.get('confidence_threshold', 0.25))
+        include_polygons = request.form.get('include_polygons', 'drawn')
+        if include_polygons not in POLYGON_MODES:
+            return jsonify({'error': f'include_polygons must be one of {list(POLYGON_MODES)}'}), 400
+        contour_engine = request.form.get('contour_engine')
+        if contour_engine is not None and contour_engine not in CONTOUR_ENGINES:
+            return jsonify({'error': f'contour_engine must be one of {list(CONTOUR_ENGINES)}'}), 400
+        preview = request.form.get('preview', 'false').lower() == 'true'
+        if preview and predictor.preview_model is None:
+            return jsonify({'error': 'Preview model is not available on this server'}), 400
+        try:
+            budget = latency_budget()
+        except ValueError:
+            return jsonify({'error': 'Latency budget must be a positive number of milliseconds'}), 400
         filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = uploads_dir / unique_filename
-        file.save(str(filepath))
         
-        results = predictor.predict(str(filepath), conf_threshold=conf_threshold)
-        os.remove(filepath)
+        # Decode the upload in memory - no temp file
+        is_cancelled = client_disconnected()
+        with admission.admit(is_cancelled), ANALYSES_IN_FLIGHT.track():
+            results = predictor.predict(
+                file.read(), conf_threshold=conf_threshold, image_name=filename,
+                include_polygons=include_polygons, contour_engine=contour_engine, preview=preview,
+                is_cancelled=is_cancelled, budget=budget
+            )
+        retention.touch(results['unique_id'])
+        if debug_requested():
+            results = dict(results, spans=current_trace().to_list())
         
         return jsonify({'success': True, 'results': results})
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except AnalysisCancelled as e:
+        print(f"⚠️ {e}")
+        return jsonify({'success': False, 'error': str(e)}), 499
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/results/<unique_id>', methods=['GET'])
+def refilter_results(unique_id):
+    """
+    Re-filter a previous analysis for another confidence threshold
+    Query parameter conf: 0.0-1.0 (default: 0.25) - no model re-run
+    """
+    try:
+        conf_threshold = float(request.args.get('conf', 0.25))
+        include_polygons = request.args.get('include_polygons', 'drawn')
+        if include_polygons not in POLYGON_MODES:
+            return jsonify({'error': f'include_polygons must be one of {list(POLYGON_MODES)}'}), 400
+        contour_engine = request.args.get('contour_engine')
+        if contour_engine is not None and contour_engine not in CONTOUR_ENGINES:
+            return jsonify({'error': f'contour_engine must be one of {list(CONTOUR_ENGINES)}'}), 400
+        try:
+            budget = latency_budget()
+        except ValueError:
+            return jsonify({'error': 'Latency budget must be a positive number of milliseconds'}), 400
+        with retention.hold(unique_id):
+            results = predictor.refilter(unique_id, conf_threshold, include_polygons, contour_engine, budget)
+        if results is None:
+            return jsonify({'success': False, 'error': 'Study not found or expired - please re-upload the image'}), 404
+        if debug_requested():
+            results = dict(results, spans=current_trace().to_list())
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an analysis and return its job ID immediately
+    Expects the same multipart/form-data as /api/predict
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type'}), 400
+        
+        conf_threshold = float(request.form.get('confidence_threshold', 0.25))
+        include_polygons = request.form.get('include_polygons', 'drawn')
+        if include_polygons not in POLYGON_MODES:
+            return jsonify({'error': f'include_polygons must be one of {list(POLYGON_MODES)}'}), 400
+        contour_engine = request.form.get('contour_engine')
+        if contour_engine is not None and contour_engine not in CONTOUR_ENGINES:
+            return jsonify({'error': f'contour_engine must be one of {list(CONTOUR_ENGINES)}'}), 400
+        preview = request.form.get('preview', 'false').lower() == 'true'
+        if preview and predictor.preview_model is None:
+            return jsonify({'error': 'Preview model is not available on this server'}), 400
+        filename = secure_filename(file.filename)
+        
+        try:
+            job = job_queue.submit(file.read(), conf_threshold, filename, include_polygons, contour_engine, preview,
+                                   debug_requested())
+        except QueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.job_id,
+            'status': job.status.value,
+            'status_url': f"/api/jobs/{job.job_id}",
+            'result_url': f"/api/jobs/{job.job_id}/result"
+        }), 202
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == JobStatus.DONE:
+        return jsonify({'success': True, 'job': job.to_dict(), 'results': job.result})
+    if job.status == JobStatus.FAILED:
+        return jsonify({'success': False, 'job': job.to_dict(), 'error': job.error}), 500
+    # Still queued or running - client should keep polling
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+@app.route('/api/insights/<signature>', methods=['GET'])
+def get_insights(signature):
+    """
+    AI insights of an analysis (signature from results.ai_insights)
+    202 while they are still being generated
+    """
+    if predictor.insights is None:
+        return jsonify({'success': False, 'error': 'AI insights are not enabled on this server'}), 404
+    insights = predictor.insights.status(signature)
+    if insights['status'] == 'unknown':
+        return jsonify({'success': False, 'error': 'Insights not found or expired'}), 404
+    if insights['status'] == 'failed':
+        return jsonify({'success': False, 'insights': insights, 'error': insights['error']}), 500
+    if insights['status'] == 'pending':
+        return jsonify({'success': True, 'insights': insights}), 202
+    return jsonify({'success': True, 'insights': insights})
+
+def index_query(max_limit=500):
+    """
+    Filters of the results index endpoints: tooth, disease, severity, urgency,
+    since / until (ISO date or Unix seconds), limit and offset
+
+    Raises:
+        ValueError: If a value cannot be parsed
+    """
+    args = request.args
+    tooth = args.get('tooth')
+    return {
+        'tooth_number': int(tooth) if tooth else None,
+        'disease_type': args.get('disease') or None,
+        'severity': args.get('severity') or None,
+        'urgency': args.get('urgency', '').upper() or None,
+        'since': parse_timestamp(args['since']) if args.get('since') else None,
+        'until': parse_timestamp(args['until']) if args.get('until') else None,
+        'limit': max(1, min(int(args.get('limit', 50)), max_limit)),
+        'offset': max(0, int(args.get('offset', 0))),
+    }
+
+@app.route('/api/studies', methods=['GET'])
+def find_studies():
+    """
+    Saved analyses with a detection matching all filters, newest first
+    e.g. /api/studies?tooth=36&disease=Dental Abscess&since=2026-09-01
+    """
+    try:
+        query = index_query()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    try:
+        total, studies = results_index.find_studies(**query)
+        return jsonify({'success': True, 'total': total, 'studies': studies})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/studies/<unique_id>', methods=['GET'])
+def get_study(unique_id):
+    """Indexed analysis with all its detections"""
+    try:
+        study = results_index.get_study(unique_id)
+        if study is None:
+            return jsonify({'success': False, 'error': 'Study not found'}), 404
+        return jsonify({'success': True, 'study': study})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/detections', methods=['GET'])
+def find_detections():
+    """Detections of all saved analyses matching the filters (same as /api/studies), newest first"""
+    try:
+        query = index_query(max_limit=1000)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    try:
+        total, detections = results_index.find_detections(**query)
+        return jsonify({'success': True, 'total': total, 'detections': detections})
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -103,21 +499,31 @@ def predict_pdf():
             return jsonify({'error': 'Invalid file type'}), 400
         
         conf_threshold = float(request.form.get('confidence_threshold', 0.25))
+        contour_engine = request.form.get('contour_engine')
+        if contour_engine is not None and contour_engine not in CONTOUR_ENGINES:
+            return jsonify({'error': f'contour_engine must be one of {list(CONTOUR_ENGINES)}'}), 400
+        try:
+            budget = latency_budget()
+        except ValueError:
+            return jsonify({'error': 'Latency budget must be a positive number of milliseconds'}), 400
         filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = uploads_dir / unique_filename
-        file.save(str(filepath))
         
-        results = predictor.predict(str(filepath), conf_threshold=conf_threshold)
-        pdf_path = generate_pdf_report(results, output_dir=str(results_dir))
-        os.remove(filepath)
+        is_cancelled = client_disconnected()
+        with admission.admit(is_cancelled), ANALYSES_IN_FLIGHT.track():
+            results = predictor.predict(
+                file.read(), conf_threshold=conf_threshold, image_name=filename,
+                contour_engine=contour_engine, is_cancelled=is_cancelled, budget=budget
+            )
+            with span('pdf'), retention.hold(results['unique_id']):
+                # The PDF embeds the annotated image, which may still be queued for writing
+                artifact_writer.wait_for(results['output_image'])
+                pdf_path = generate_pdf_report(results, output_dir=str(results_dir), blob_store=blob_store)
+                
+                # Read PDF into memory
+                pdf_data = blob_store.read(pdf_path)
         
         pdf_filename = f"dental_report_{results['unique_id'][:8]}.pdf"
         
-        # Read PDF into memory
-        with open(pdf_path, 'rb') as f:
-            pdf_data = f.read()
-        
         # Return PDF with explicit headers to prevent connection closed errors
         response = app.response_class(
             pdf_data,
@@ -126,11 +532,17 @@ def predict_pdf():
                 'Content-Disposition': f'attachment; filename={pdf_filename}',
                 'Content-Length': str(len(pdf_data)),
                 'Content-Type': 'application/pdf',
-                'Cache-Control': 'no-cache'
+                'Cache-Control': 'no-cache',
+                'X-Degradations': ','.join(results.get('degradations', []))
             }
         )
         
         return response
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except AnalysisCancelled as e:
+        print(f"⚠️ {e}")
+        return jsonify({'success': False, 'error': str(e)}), 499
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -199,22 +611,60 @@ def send_email():
 def serve_image(filename):
     try:
         image_path = results_dir / filename
-        if image_path.exists():
-            return send_file(str(image_path), mimetype='image/jpeg')
+        with retention.hold(RetentionSweeper.unique_id_of(filename)):
+            # Images of just-finished analyses may still be in the artifact write queue
+            artifact_writer.wait_for(str(image_path))
+            if blob_store.handles(str(image_path)):
+                if blob_store.exists(str(image_path)):
+                    local_path = blob_store.local_path(str(image_path))
+                    if local_path is not None:
+                        return send_file(local_path, mimetype='image/jpeg')
+                    return send_file(io.BytesIO(blob_store.read(str(image_path))), mimetype='image/jpeg')
+            elif image_path.exists():
+                return send_file(str(image_path), mimetype='image/jpeg')
         return jsonify({'error': 'Image not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
+    """
+    Model info, population statistics of the analyses and server component stats
+    Query parameter days: window of the population statistics (default: all retained days)
+    """
+    days = request.args.get('days')
+    try:
+        days = int(days) if days else None
+        if days is not None and days < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'days must be a positive integer'}), 400
     return jsonify({
         'model_version': '1.0',
         'accuracy': '92.07% mAP@0.5',
         'classes': 32,
         'supported_formats': list(ALLOWED_EXTENSIONS),
-        'max_file_size_mb': MAX_FILE_SIZE / (1024 * 1024)
+        'max_file_size_mb': MAX_FILE_SIZE / (1024 * 1024),
+        'analyses': aggregate_stats.summary(days),
+        'aggregate_stats': aggregate_stats.get_stats(),
+        'job_queue': job_queue.get_stats(),
+        'admission': admission.get_stats(),
+        'insights': predictor.insights.get_stats() if predictor.insights else None,
+        'artifact_writer': artifact_writer.get_stats(),
+        'blob_store': blob_store.get_stats(),
+        'results_index': results_index.get_stats(),
+        'retention': retention.get_stats(),
+        'batching': predictor.batcher.get_stats() if predictor.batcher else None,
+        'prediction_cache': prediction_cache.get_stats() if prediction_cache else None,
+        'study_store': predictor.studies.get_stats(),
+        'contours': predictor.contour_extractor.get_stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latency histograms, request counts and in-flight gauges (Prometheus text format)"""
+    return app.response_class(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     print("\n" + "="*70)
     print("API ENDPOINTS:")
@@ -222,20 +672,33 @@ if __name__ == '__main__':
     print("  GET  /api/health        - Health check")
     print("  POST /api/predict       - JSON predictions")
     print("  POST /api/predict-pdf   - PDF report")
+    print("  GET  /api/results/<id>?conf= - Re-filter results (no re-inference)")
+    print("  POST /api/jobs          - Queue analysis (returns job ID)")
+    print("  GET  /api/jobs/<id>     - Job status")
+    print("  GET  /api/jobs/<id>/result - Job result")
+    print("  GET  /api/insights/<sig> - AI insights (asynchronous)")
+    print("  GET  /api/studies       - Query saved analyses (tooth, disease, since, ...)")
+    print("  GET  /api/studies/<id>  - Saved analysis with detections")
+    print("  GET  /api/detections    - Query saved detections")
     print("  POST /api/send-email    - Send email with PDF")
     print("  GET  /api/image/<file>  - Annotated image")
-    print("  GET  /api/stats         - Statistics")
+    print("  GET  /api/stats?days=   - Statistics")
+    print("  GET  /api/metrics       - Prometheus metrics")
     print("\n" + "="*70)
     print("Server starting on http://localhost:5000")
     print("="*70)
     print("\nPress Ctrl+C to stop\n")
     
+    # Sweep from startup on, not only once the first analysis is used
+    retention.start()
+    
     # Use waitress production server instead of Flask dev server
     # This fixes connection closed errors with large PDF files
     try:
         from waitress import serve
         print("✅ Using Waitress production server")
-        serve(app, host='0.0.0.0', port=8080, threads=4, channel_timeout=300)
+        # channel_request_lookahead lets waitress notice clients that disconnect mid-analysis
+        serve(app, host='0.0.0.0', port=8080, threads=4, channel_timeout=300, channel_request_lookahead=5)
     except ImportError:
         print("⚠️  Waitress not found, falling back to Flask dev server")
         print("   Install waitress: pip install waitress")
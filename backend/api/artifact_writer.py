@@ -0,0 +1,298 @@
+"""
+Background Artifact Writer
+A single writer thread fed by a bounded queue takes JPEG encoding, report files
+and results-index inserts off the request path. Writes are taken from the queue
+in batches; the results-index inserts of a batch share one SQLite transaction.
+Files are written atomically (through the content-addressed blob store when one
+is given) and readers can wait for a file that is still queued. Pending writes
+are flushed at shutdown
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+
+from metrics import REGISTRY, Counter, Gauge, Histogram, span
+
+WRITE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'dentx_artifact_queue_depth', 'Artifact writes waiting for the writer thread'
+))
+WRITE_LAG = REGISTRY.register(Histogram(
+    'dentx_artifact_write_lag_seconds', 'Time from queueing an artifact to having it on disk', ('kind',)
+))
+WRITES = REGISTRY.register(Counter(
+    'dentx_artifact_writes_total', 'Artifact writes by kind and outcome', ('kind', 'outcome')
+))
+
+
+@dataclass
+class _WriteTask:
+    kind: str
+    path: Optional[str]
+    payload: Any
+    on_written: Optional[Callable] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write to a temp file and rename, so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ArtifactWriter:
+    """Writes annotated images and reports on one background thread"""
+
+    def __init__(self, max_queued: int = 256, batch_size: int = 32, flush_timeout: float = 30.0,
+                 store=None):
+        """
+        Args:
+            max_queued: Queue bound; producers block when it is full (backpressure)
+            batch_size: Maximum writes taken from the queue at once
+            flush_timeout: Seconds to wait for pending writes at interpreter exit
+            store: Optional BlobStore; writes to paths in its folder are stored deduplicated
+        """
+        self.store = store
+        self.max_queued = max(1, max_queued)
+        self.batch_size = max(1, batch_size)
+        self.flush_timeout = flush_timeout
+
+        self._queue: "queue.Queue[_WriteTask]" = queue.Queue(maxsize=self.max_queued)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Paths with queued writes, and the number of unfinished tasks (for flush / wait_for)
+        self._cond = threading.Condition()
+        self._pending_paths: Dict[str, int] = {}
+        self._unfinished = 0
+
+        self.counters = {'written': 0, 'failed': 0, 'batches': 0, 'index_transactions': 0}
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+
+        atexit.register(self._flush_at_exit)
+
+    def _ensure_started(self):
+        """Start the writer thread lazily (and again in a forked child)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queued)
+                with self._cond:
+                    self._pending_paths = {}
+                    self._unfinished = 0
+                self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _submit(self, task: _WriteTask):
+        self._ensure_started()
+        if task.path is not None:
+            task.path = os.path.abspath(task.path)
+        with self._cond:
+            self._unfinished += 1
+            if task.path is not None:
+                self._pending_paths[task.path] = self._pending_paths.get(task.path, 0) + 1
+        self._queue.put(task)
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def write_bytes(self, path: str, data: bytes):
+        """Write raw bytes to path"""
+        self._submit(_WriteTask('bytes', path, data))
+
+    def write_text(self, path: str, text: str):
+        """Write a UTF-8 text file"""
+        self._submit(_WriteTask('text', path, text))
+
+    def write_json(self, path: str, obj: Dict):
+        """Write an indented JSON file (serialized on the writer thread - do not modify obj afterwards)"""
+        self._submit(_WriteTask('json', path, obj))
+
+    def write_jpeg(self, path: str, image, quality: int = 95,
+                   on_written: Callable[[bytes], None] = None):
+        """
+        Encode a BGR array as JPEG on the writer thread and save it
+
+        on_written(jpeg_bytes) runs on the writer thread after the file is on disk
+        """
+        self._submit(_WriteTask('jpeg', path, (image, quality), on_written))
+
+    def add_to_index(self, index, results: Dict):
+        """
+        Insert an analysis into a ResultsIndex on the writer thread (do not modify
+        results afterwards); inserts taken in the same batch share one transaction
+        """
+        self._submit(_WriteTask('index', None, (index, results, time.time())))
+
+    def defer(self, fn: Callable[[], None]):
+        """Run fn on the writer thread after all writes queued so far"""
+        self._submit(_WriteTask('call', None, fn))
+
+    def pending(self, path: str) -> bool:
+        """Whether writes to path are still queued"""
+        with self._cond:
+            return os.path.abspath(path) in self._pending_paths
+
+    def _in_store(self, path: str) -> bool:
+        return self.store is not None and self.store.handles(path)
+
+    def exists(self, path: str) -> bool:
+        """The file exists (in the blob store or on disk) or is about to be written"""
+        if self.pending(path):
+            return True
+        return self.store.exists(path) if self._in_store(path) else os.path.exists(path)
+
+    def read(self, path: str) -> bytes:
+        """Contents of a written file, from the blob store for paths in its folder"""
+        if self._in_store(path):
+            return self.store.read(path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def wait_for(self, path: str, timeout: float = 10.0) -> bool:
+        """Block until queued writes to path are done; False on timeout"""
+        path = os.path.abspath(path)
+        with self._cond:
+            return self._cond.wait_for(lambda: path not in self._pending_paths, timeout)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every queued write is done; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def _flush_at_exit(self):
+        if self._pid != os.getpid() or not self._unfinished:
+            return
+        print(f"⏳ Flushing {self._unfinished} pending artifact writes...")
+        if not self.flush(self.flush_timeout):
+            print(f"⚠️ {self._unfinished} artifact writes were not flushed before exit")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[_WriteTask]):
+        """Run a batch in queue order; index inserts are grouped until the next deferred call"""
+        index_tasks = []
+        for task in batch:
+            if task.kind == 'index':
+                index_tasks.append(task)
+                continue
+            if task.kind == 'call':
+                # Deferred calls run after everything queued before them, inserts included
+                self._insert_index_batch(index_tasks)
+                index_tasks = []
+            self._finish(task)
+        self._insert_index_batch(index_tasks)
+        with self._cond:
+            self.counters['batches'] += 1
+
+    def _insert_index_batch(self, tasks: List[_WriteTask]):
+        """Insert the analyses of several index tasks with one transaction per index"""
+        by_index: Dict[int, List[_WriteTask]] = {}
+        for task in tasks:
+            by_index.setdefault(id(task.payload[0]), []).append(task)
+        for group in by_index.values():
+            index = group[0].payload[0]
+            try:
+                with span('index_insert'):
+                    index.add_studies([task.payload[1:] for task in group])
+            except Exception as e:
+                # One bad analysis must not lose the others: retry them one by one
+                print(f"⚠️ Results index batch insert failed ({len(group)} analyses): {e}")
+                for task in group:
+                    self._finish(task)
+                continue
+            with self._cond:
+                self.counters['index_transactions'] += 1
+            for task in group:
+                self._record(task, 'ok')
+
+    def _finish(self, task: _WriteTask):
+        """Run one write, then record its outcome and release waiters"""
+        try:
+            self._run_task(task)
+            outcome = 'ok'
+        except Exception as e:
+            print(f"⚠️ Artifact write failed ({task.kind} {task.path}): {e}")
+            outcome = 'error'
+        self._record(task, outcome)
+
+    def _record(self, task: _WriteTask, outcome: str):
+        lag = time.perf_counter() - task.enqueued_at
+        WRITE_LAG.observe(lag, kind=task.kind)
+        WRITES.inc(kind=task.kind, outcome=outcome)
+        with self._cond:
+            self.counters['written' if outcome == 'ok' else 'failed'] += 1
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+            self._unfinished -= 1
+            if task.path is not None:
+                remaining = self._pending_paths.get(task.path, 1) - 1
+                if remaining > 0:
+                    self._pending_paths[task.path] = remaining
+                else:
+                    self._pending_paths.pop(task.path, None)
+            self._cond.notify_all()
+
+    def _write_file(self, path: str, data: bytes):
+        if self._in_store(path):
+            self.store.write(path, data)
+        else:
+            _atomic_write(path, data)
+
+    def _run_task(self, task: _WriteTask):
+        if task.kind == 'bytes':
+            self._write_file(task.path, task.payload)
+        elif task.kind == 'text':
+            self._write_file(task.path, task.payload.encode('utf-8'))
+        elif task.kind == 'json':
+            self._write_file(task.path, json.dumps(task.payload, indent=2, ensure_ascii=False).encode('utf-8'))
+        elif task.kind == 'jpeg':
+            image, quality = task.payload
+            with span('encode'):
+                ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            data = encoded.tobytes()
+            self._write_file(task.path, data)
+            if task.on_written is not None:
+                task.on_written(data)
+        elif task.kind == 'index':
+            index, results, created_at = task.payload
+            index.add_study(results, created_at)
+            with self._cond:
+                self.counters['index_transactions'] += 1
+        elif task.kind == 'call':
+            task.payload()
+
+    def get_stats(self) -> Dict:
+        """Queue depth, write lag and outcomes"""
+        with self._cond:
+            done = self.counters['written'] + self.counters['failed']
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queued': self.max_queued,
+                'unfinished': self._unfinished,
+                'mean_lag_ms': 1000 * self._lag_total / done if done else 0.0,
+                'max_lag_ms': 1000 * self._lag_max,
+                **self.counters,
+            }
@@ -0,0 +1,184 @@
+"""
+Dynamic Micro-Batching for YOLO Inference
+Gathers inference requests that arrive within a short window and runs them
+as one batched forward pass, handing each caller its own Results object
+"""
+
+import os
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class _PendingRequest:
+    """A single caller waiting for its inference result"""
+    source: Any
+    kwargs: Dict
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def group_key(self):
+        """Requests can only share a forward pass if they share source type and arguments"""
+        return (isinstance(self.source, str), tuple(sorted(self.kwargs.items())))
+
+
+class MicroBatcher:
+    """Collects concurrent inference calls into batched model invocations"""
+
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        """
+        Args:
+            model: Loaded YOLO model (called as model(sources, **kwargs))
+            max_batch_size: Upper bound on images per forward pass
+            max_wait_ms: How long the first request of a batch waits for company
+        """
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._batch_size_counts: Dict[int, int] = {}
+        self._batches = 0
+        self._requests = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _ensure_started(self):
+        """Start the dispatcher thread lazily (and again in a forked child)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._dispatch_loop, name="yolo-batcher", daemon=True
+                )
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def infer(self, source: Any, **kwargs) -> Any:
+        """
+        Run inference for one image through the batching layer
+
+        Args:
+            source: Image path or decoded image array
+            **kwargs: Keyword arguments for the YOLO call (conf, verbose, ...)
+
+        Returns:
+            The ultralytics Results object for this image
+        """
+        self._ensure_started()
+        request = _PendingRequest(source=source, kwargs=kwargs)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def infer_many(self, sources: List[Any], **kwargs) -> List[Any]:
+        """
+        Run inference for several images of one caller (e.g. the tiles of a radiograph)
+
+        All images are queued at once so they share forward passes with each other
+        and with concurrent callers
+
+        Returns:
+            The ultralytics Results objects in the order of sources
+        """
+        self._ensure_started()
+        requests = [_PendingRequest(source=source, kwargs=kwargs) for source in sources]
+        for request in requests:
+            self._queue.put(request)
+        for request in requests:
+            request.done.wait()
+        for request in requests:
+            if request.error is not None:
+                raise request.error
+        return [request.result for request in requests]
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Split the batch into groups that can share one forward pass
+            groups: Dict[Any, List[_PendingRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.group_key, []).append(request)
+
+            for requests in groups.values():
+                self._run_group(requests)
+
+    def _run_group(self, requests: List[_PendingRequest]):
+        started = time.perf_counter()
+        waits = [started - r.enqueued_at for r in requests]
+        try:
+            results = list(self.model(
+                [r.source for r in requests],
+                batch=len(requests),
+                **requests[0].kwargs
+            ))
+            # zip() would silently leave the extra requests without a result
+            if len(results) != len(requests):
+                raise RuntimeError(f"Batched inference returned {len(results)} results for {len(requests)} images")
+            for request, result in zip(requests, results):
+                request.result = result
+        except Exception as e:
+            for request in requests:
+                request.error = e
+        finally:
+            self._record(len(requests), waits)
+            for request in requests:
+                if request.result is None and request.error is None:
+                    # KeyboardInterrupt / SystemExit stop the dispatcher; callers must not hang
+                    request.error = RuntimeError("Batched inference was interrupted")
+                request.done.set()
+
+    def _record(self, batch_size: int, waits: List[float]):
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += batch_size
+            self._batch_size_counts[batch_size] = self._batch_size_counts.get(batch_size, 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def get_stats(self) -> Dict:
+        """Batch size distribution and queue wait times"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self._batches,
+                'requests': self._requests,
+                'mean_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'batch_size_distribution': dict(sorted(self._batch_size_counts.items())),
+                'mean_queue_wait_ms': 1000 * self._wait_total / self._requests if self._requests else 0.0,
+                'max_queue_wait_ms': 1000 * self._wait_max,
+                'queue_depth': self._queue.qsize(),
+            }
@@ -0,0 +1,129 @@
+"""
+Contour Engine Benchmark
+Measures per-tooth latency of every contour engine and its IoU against
+full-resolution GrabCut, on the original input images of the analyses stored in
+results_pridects/ (the annotated outputs are not used: they have the polygons,
+outlines and labels of the analysis drawn on top)
+"""
+
+import os
+import sys
+import glob
+import json
+import ntpath
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from contour_extraction import CONTOUR_ENGINES, crop_tooth_roi, create_tooth_polygon, grabcut_tooth_contour
+
+RESULTS_DIR = str(Path(__file__).parent.parent / "results_pridects")
+UPLOADS_DIR = str(Path(__file__).parent.parent / "uploads")
+
+
+def polygon_iou(poly_a, poly_b, shape) -> float:
+    """IoU of two polygons rasterized on an image of the given shape"""
+    mask_a = np.zeros(shape[:2], np.uint8)
+    mask_b = np.zeros(shape[:2], np.uint8)
+    cv2.fillPoly(mask_a, [np.array(poly_a, np.int32)], 1)
+    cv2.fillPoly(mask_b, [np.array(poly_b, np.int32)], 1)
+    union = np.count_nonzero(mask_a | mask_b)
+    return np.count_nonzero(mask_a & mask_b) / union if union else 1.0
+
+
+def find_input_image(input_image: str, images_dir: str):
+    """Path of the original input image of an analysis, or None if it is not available"""
+    if not input_image:
+        return None
+    # Stored paths may come from Windows hosts; ntpath splits on both separators
+    for path in (input_image, os.path.join(images_dir, ntpath.basename(input_image))):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_samples(results_dir: str, images_dir: str, limit: int):
+    """Yield (image, boxes) for every stored analysis whose original input image is available"""
+    json_paths = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    count = 0
+    for json_path in json_paths:
+        if count >= limit:
+            break
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(results, dict) or 'detections' not in results:
+            continue
+
+        input_path = find_input_image(results.get('input_image'), images_dir)
+        image = cv2.imread(input_path, cv2.IMREAD_COLOR) if input_path else None
+        if image is None:
+            continue
+
+        boxes = []
+        for det in results['detections']:
+            bbox = det['bounding_box']
+            boxes.append((int(bbox['x1']), int(bbox['y1']), int(bbox['x2']), int(bbox['y2'])))
+        if boxes:
+            count += 1
+            yield image, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tooth contour engines")
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help="Folder with stored analyses")
+    parser.add_argument('--images-dir', default=UPLOADS_DIR,
+                        help="Folder with the original input images (matched by file name)")
+    parser.add_argument('--limit', type=int, default=10, help="Maximum number of images")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("CONTOUR ENGINE BENCHMARK")
+    print("=" * 70)
+
+    timings = {name: [] for name in CONTOUR_ENGINES}
+    ious = {name: [] for name in CONTOUR_ENGINES}
+    fallbacks = {name: 0 for name in CONTOUR_ENGINES}
+    images = 0
+
+    for image, boxes in load_samples(args.results_dir, args.images_dir, args.limit):
+        images += 1
+        for box in boxes:
+            roi, x_offset, y_offset = crop_tooth_roi(image, *box)
+            # Reference: GrabCut at full resolution (no ROI side cap)
+            reference = grabcut_tooth_contour(roi, x_offset, y_offset, box, max_side=None)
+            if reference is None:
+                reference = create_tooth_polygon(*box)
+            polygons = {}
+            for name, contour_fn in CONTOUR_ENGINES.items():
+                start = time.perf_counter()
+                polygon = contour_fn(roi, x_offset, y_offset, box)
+                timings[name].append((time.perf_counter() - start) * 1000)
+                if polygon is None:
+                    fallbacks[name] += 1
+                    polygon = create_tooth_polygon(*box)
+                polygons[name] = polygon
+            for name, polygon in polygons.items():
+                ious[name].append(polygon_iou(polygon, reference, image.shape))
+
+    if not images:
+        print(f"\n❌ No stored analyses in {args.results_dir} have their original input image in {args.images_dir}")
+        print("   Annotated outputs are not benchmarked; pass --images-dir with the original uploads")
+        sys.exit(1)
+
+    teeth = len(timings['grabcut'])
+    print(f"\n📊 {images} images, {teeth} teeth\n")
+    print(f"{'Engine':<14}{'mean ms':>10}{'p95 ms':>10}{'IoU vs GrabCut':>17}{'fallbacks':>12}")
+    print("-" * 63)
+    for name in CONTOUR_ENGINES:
+        print(f"{name:<14}{np.mean(timings[name]):>10.2f}{np.percentile(timings[name], 95):>10.2f}"
+              f"{np.mean(ious[name]):>17.3f}{fallbacks[name]:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Inference Engine Benchmark
+Compares CPU latency and accuracy of the PyTorch, ONNX Runtime and OpenVINO
+engines on a local image set (mAP@0.5 when a labelled dataset is available)
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from image_io import load_image
+from inference_engines import INFERENCE_ENGINES, load_engine, hash_weights
+
+MODEL_PATH = str(Path(__file__).parent.parent / "model" / "best.pt")
+IMAGES_DIR = str(Path(__file__).parent.parent / "uploads")
+DATA_YAML = "dataset/data.yaml"
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two (N, 4) / (M, 4) xyxy box arrays"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def agreement(reference, result, iou_threshold: float = 0.5) -> float:
+    """Fraction of reference detections matched by a detection of the same class"""
+    ref_boxes = reference.boxes.xyxy.cpu().numpy()
+    if len(ref_boxes) == 0:
+        return 1.0
+    boxes = result.boxes.xyxy.cpu().numpy()
+    if len(boxes) == 0:
+        return 0.0
+    same_class = reference.boxes.cls.cpu().numpy()[:, None] == result.boxes.cls.cpu().numpy()[None, :]
+    matched = ((box_iou(ref_boxes, boxes) >= iou_threshold) & same_class).any(axis=1)
+    return float(matched.mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO inference engines on CPU")
+    parser.add_argument('--model', default=MODEL_PATH, help="Trained .pt weights")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Folder with radiographs")
+    parser.add_argument('--data', default=DATA_YAML, help="Dataset yaml for mAP@0.5 (optional)")
+    parser.add_argument('--engines', default=",".join(INFERENCE_ENGINES), help="Comma-separated engines")
+    parser.add_argument('--runs', type=int, default=3, help="Timed runs per image")
+    parser.add_argument('--conf', type=float, default=0.25, help="Confidence threshold")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("INFERENCE ENGINE BENCHMARK")
+    print("=" * 70)
+
+    image_paths = sorted(
+        p for ext in ('png', 'jpg', 'jpeg', 'bmp', 'tiff')
+        for p in glob.glob(os.path.join(args.images, f"*.{ext}"))
+    )
+    if not image_paths:
+        print(f"\n❌ No images found in {args.images}")
+        sys.exit(1)
+    images = [load_image(p)[0] for p in image_paths]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    has_dataset = os.path.exists(args.data)
+    if not has_dataset:
+        print(f"\n⚠️ {args.data} not found - reporting agreement with PyTorch instead of mAP@0.5")
+
+    weights_hash = hash_weights(args.model)
+    reference = None
+    rows = []
+    for engine in engines:
+        try:
+            model, loaded_path = load_engine(args.model, engine, weights_hash)
+        except FileNotFoundError as e:
+            print(f"⚠️ Skipping {engine}: {e}")
+            continue
+
+        # Warm up (first call allocates buffers / compiles the graph)
+        model(images[0], conf=args.conf, verbose=False)
+
+        latencies = []
+        outputs = []
+        for image in images:
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                result = model(image, conf=args.conf, verbose=False)[0]
+                latencies.append((time.perf_counter() - start) * 1000)
+            outputs.append(result)
+
+        if has_dataset:
+            metrics = model.val(data=args.data, batch=1, plots=False, verbose=False)
+            accuracy = f"{metrics.box.map50:.4f}"
+        else:
+            if reference is None:
+                reference = outputs
+            accuracy = f"{np.mean([agreement(r, o) for r, o in zip(reference, outputs)]):.1%}"
+
+        rows.append((engine, np.mean(latencies), np.percentile(latencies, 95), accuracy))
+        print(f"✅ {engine}: {loaded_path}")
+
+    metric_name = "mAP@0.5" if has_dataset else f"agree vs {engines[0]}"
+    print(f"\n📊 {len(images)} images, {args.runs} runs each\n")
+    print(f"{'Engine':<14}{'mean ms':>10}{'p95 ms':>10}{metric_name:>18}")
+    print("-" * 52)
+    for engine, mean_ms, p95_ms, accuracy in rows:
+        print(f"{engine:<14}{mean_ms:>10.1f}{p95_ms:>10.1f}{accuracy:>18}")
+
+
+if __name__ == '__main__':
+    main()
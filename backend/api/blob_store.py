@@ -0,0 +1,244 @@
+"""
+Content-Addressed Blob Store
+Artifacts (annotated images, reports, PDFs) are stored once per content under
+their SHA-256 in a two-level fan-out (blobs/ab/cd/<sha256>) and published under
+their analysis name (<uuid>.jpg, report_<uuid>.pdf, ...) as an alias. Identical
+bytes - e.g. the renders of a re-uploaded radiograph - share one blob. The local
+backend uses hard links as aliases, so existing readers keep using plain paths;
+other backends (an S3-compatible store) implement BlobBackend
+"""
+
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from metrics import REGISTRY, Counter
+
+BLOB_WRITES = REGISTRY.register(Counter(
+    'dentx_blob_writes_total', 'Artifact writes by outcome (stored = new blob, deduplicated = existing blob)',
+    ('outcome',)
+))
+BLOB_BYTES = REGISTRY.register(Counter(
+    'dentx_blob_bytes_total', 'Artifact bytes by outcome (deduplicated = bytes not written again)', ('outcome',)
+))
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobBackend:
+    """Storage interface: content-addressed blobs plus named aliases pointing at them"""
+
+    def has_blob(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_blob(self, key: str, data: bytes):
+        """Store data under key atomically (readers never see a partial blob)"""
+        raise NotImplementedError
+
+    def link(self, name: str, key: str):
+        """Point alias name at an existing blob, replacing any previous target atomically"""
+        raise NotImplementedError
+
+    def read(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def local_path(self, name: str) -> Optional[str]:
+        """Filesystem path of an alias, if the backend has one (else read() it)"""
+        return None
+
+    def remove(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def unreferenced_blobs(self, min_age_seconds: float) -> Iterator[Tuple[str, int]]:
+        """(key, size) of blobs no alias points at, older than min_age_seconds"""
+        raise NotImplementedError
+
+    def delete_blob(self, key: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalBlobBackend(BlobBackend):
+    """Blobs in <root>/blobs/ab/cd/<sha256>, aliases as hard links in <root>"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.blob_root = os.path.join(self.root, 'blobs')
+        os.makedirs(self.blob_root, exist_ok=True)
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.blob_root, key[:2], key[2:4], key)
+
+    def _alias_path(self, name: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, name))
+        if os.path.dirname(path) != self.root:
+            raise ValueError(f"Alias must be a file name in {self.root}: {name}")
+        return path
+
+    def has_blob(self, key: str) -> bool:
+        return os.path.exists(self._blob_path(key))
+
+    def put_blob(self, key: str, data: bytes):
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def link(self, name: str, key: str):
+        path = self._alias_path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(self._blob_path(key), tmp_path)
+        except FileNotFoundError:
+            raise  # Blob is gone (garbage-collected) - BlobStore.write stores it again
+        except OSError:
+            # No hard links on this filesystem: fall back to a private copy
+            with open(self._blob_path(key), 'rb') as src, open(tmp_path, 'wb') as dst:
+                dst.write(src.read())
+        os.replace(tmp_path, path)
+
+    def read(self, name: str) -> bytes:
+        with open(self._alias_path(name), 'rb') as f:
+            return f.read()
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._alias_path(name))
+
+    def local_path(self, name: str) -> Optional[str]:
+        return self._alias_path(name)
+
+    def remove(self, name: str) -> bool:
+        try:
+            os.remove(self._alias_path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def unreferenced_blobs(self, min_age_seconds: float) -> Iterator[Tuple[str, int]]:
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self.blob_root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if filename.endswith('.tmp'):
+                    if now - stat.st_mtime > min_age_seconds:
+                        os.remove(path)
+                    continue
+                # A blob's own directory entry is its only link once every alias is gone
+                if stat.st_nlink <= 1 and now - stat.st_mtime > min_age_seconds:
+                    yield filename, stat.st_size
+
+    def delete_blob(self, key: str) -> bool:
+        try:
+            os.remove(self._blob_path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class BlobStore:
+    """Deduplicating artifact store with named aliases"""
+
+    def __init__(self, backend: BlobBackend, root: str):
+        """
+        Args:
+            backend: Where blobs and aliases live
+            root: Folder whose artifact paths the store serves (for the local backend,
+                its root; other backends keep no folder of their own)
+        """
+        self.backend = backend
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self.counters = {'stored': 0, 'deduplicated': 0, 'stored_bytes': 0, 'deduplicated_bytes': 0,
+                         'collected': 0, 'collected_bytes': 0}
+
+    def handles(self, path: str) -> bool:
+        """Whether path is an artifact of this store"""
+        return os.path.dirname(os.path.abspath(path)) == self.root
+
+    def name_of(self, path: str) -> str:
+        """Alias name of an artifact path (paths are kept as the public artifact names)"""
+        return os.path.basename(path)
+
+    def write(self, path: str, data: bytes) -> str:
+        """
+        Store data and publish it under the artifact name of path
+
+        Returns:
+            Content key (SHA-256) of the blob
+        """
+        key = blob_key(data)
+        name = self.name_of(path)
+        for _ in range(2):
+            deduplicated = self.backend.has_blob(key)
+            if not deduplicated:
+                self.backend.put_blob(key, data)
+            try:
+                self.backend.link(name, key)
+                break
+            except FileNotFoundError:
+                # The blob was garbage-collected between the check and the link - store it again
+                continue
+        else:
+            raise OSError(f"Could not publish blob {key} as {name}")
+
+        outcome = 'deduplicated' if deduplicated else 'stored'
+        BLOB_WRITES.inc(outcome=outcome)
+        BLOB_BYTES.inc(len(data), outcome=outcome)
+        with self._lock:
+            self.counters[outcome] += 1
+            self.counters[f"{outcome}_bytes"] += len(data)
+        return key
+
+    def read(self, path: str) -> bytes:
+        return self.backend.read(self.name_of(path))
+
+    def exists(self, path: str) -> bool:
+        return self.backend.exists(self.name_of(path))
+
+    def local_path(self, path: str) -> Optional[str]:
+        return self.backend.local_path(self.name_of(path))
+
+    def remove(self, path: str) -> bool:
+        return self.backend.remove(self.name_of(path))
+
+    def collect_garbage(self, min_age_seconds: float = 300) -> Tuple[int, int]:
+        """
+        Delete blobs that no alias references any more (after retention removed them)
+
+        min_age_seconds protects blobs that are being published right now.
+
+        Returns:
+            (number of blobs, bytes) deleted
+        """
+        count, size = 0, 0
+        for key, blob_size in list(self.backend.unreferenced_blobs(min_age_seconds)):
+            if self.backend.delete_blob(key):
+                count += 1
+                size += blob_size
+        with self._lock:
+            self.counters['collected'] += count
+            self.counters['collected_bytes'] += size
+        return count, size
+
+    def get_stats(self) -> Dict:
+        """Stored vs deduplicated writes and garbage collection"""
+        with self._lock:
+            writes = self.counters['stored'] + self.counters['deduplicated']
+            return {
+                'backend': type(self.backend).__name__,
+                'root': self.root,
+                'dedup_rate': self.counters['deduplicated'] / writes if writes else 0.0,
+                **self.counters,
+            }
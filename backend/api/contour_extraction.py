@@ -0,0 +1,357 @@
+"""
+Tooth Contour Extraction
+Pluggable tooth outline engines (full GrabCut, GrabCut on a downscaled ROI,
+threshold/morphology segmentation), run for many detections in parallel on a
+thread pool (OpenCV releases the GIL) or a per-call process pool, with a
+per-tooth timeout that falls back to the bounding-box tooth polygon
+"""
+
+import os
+import time
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Padding (pixels) around the bounding box given to GrabCut as background
+GRABCUT_PAD = 5
+
+# Start times (time.monotonic) of the teeth of one extract_many call, set in the
+# process pool workers so the caller can time each tooth from when it really started
+_task_starts = None
+
+
+def create_tooth_polygon(x1: int, y1: int, x2: int, y2: int) -> List[tuple]:
+    """Create a tooth-shaped polygon from bounding box coordinates"""
+    # Calculate dimensions
+    width = x2 - x1
+    height = y2 - y1
+
+    # Create a tooth-like polygon (crown + root shape)
+    crown_height = int(height * 0.6)  # Crown is top 60%
+
+    polygon = [
+        # Crown top (rounded)
+        (x1 + width // 4, y1),
+        (x1 + 3 * width // 4, y1),
+        (x2, y1 + crown_height // 3),
+        (x2, y1 + crown_height),
+        # Root (tapers down)
+        (x1 + 3 * width // 4, y1 + height),
+        (x1 + width // 4, y1 + height),
+        (x1, y1 + crown_height),
+        (x1, y1 + crown_height // 3),
+    ]
+
+    return polygon
+
+
+def crop_tooth_roi(image: np.ndarray, x1: int, y1: int, x2: int, y2: int,
+                   pad: int = GRABCUT_PAD) -> Tuple[np.ndarray, int, int]:
+    """Crop the bounding box area with padding, returns (roi, x offset, y offset)"""
+    h, w = image.shape[:2]
+    x1_pad = max(0, x1 - pad)
+    y1_pad = max(0, y1 - pad)
+    x2_pad = min(w, x2 + pad)
+    y2_pad = min(h, y2 + pad)
+    return image[y1_pad:y2_pad, x1_pad:x2_pad], x1_pad, y1_pad
+
+
+def _mask_to_polygon(mask: np.ndarray, x_offset: int, y_offset: int, scale: float = 1.0) -> Optional[List[tuple]]:
+    """
+    Turn a binary foreground mask (0/1) of an ROI into a smoothed outer polygon
+    in image coordinates (ROI coordinates are divided by scale)
+    """
+    # Smooth the mask
+    # Apply morphological closing to fill small holes
+    kernel = np.ones((5, 5), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    # Apply Gaussian blur to smooth edges
+    mask = cv2.GaussianBlur(mask * 255, (9, 9), 0)
+    _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+
+    # Find contours
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return None
+
+    # Find the largest contour
+    largest_contour = max(contours, key=cv2.contourArea)
+
+    # Smooth the contour (approxPolyDP)
+    # Use smaller epsilon for more organic shape (0.002 instead of 0.005)
+    epsilon = 0.002 * cv2.arcLength(largest_contour, True)
+    approx_contour = cv2.approxPolyDP(largest_contour, epsilon, True)
+
+    # Convert to global coordinates
+    polygon = []
+    for point in approx_contour:
+        px, py = point[0]
+        polygon.append((int(x_offset + px / scale), int(y_offset + py / scale)))
+
+    # Ensure polygon is valid
+    if len(polygon) < 3:
+        return None
+
+    return polygon
+
+
+def _grabcut_mask(roi: np.ndarray, pad: int) -> np.ndarray:
+    """Run GrabCut initialised with the box rectangle, returns a 0/1 foreground mask"""
+    # Initialize GrabCut mask and models
+    mask = np.zeros(roi.shape[:2], np.uint8)
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+
+    # Define rectangle for GrabCut (relative to ROI)
+    # We assume the tooth is centered in the box, so we take a slightly smaller rect
+    roi_h, roi_w = roi.shape[:2]
+    rect = (pad, pad, roi_w - 2*pad, roi_h - 2*pad)
+
+    # iterCount=5 gives good balance of speed/quality
+    cv2.grabCut(roi, mask, rect, bgdModel, fgdModel, 5, cv2.GC_INIT_WITH_RECT)
+
+    # Pixels 1 and 3 are foreground/probable foreground
+    return np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+
+
+def grabcut_tooth_contour(roi: np.ndarray, x_offset: int, y_offset: int,
+                          box: Tuple[int, int, int, int], pad: int = GRABCUT_PAD,
+                          max_side: int = None) -> Optional[List[tuple]]:
+    """
+    Extract precise tooth contour from a padded ROI using GrabCut for organic shapes
+    Returns a polygon list of (x, y) tuples in image coordinates, or None if no
+    usable contour was found. GrabCut runs at full resolution unless max_side is
+    given, in which case longer ROIs are downscaled to it (opt-in work cap)
+    """
+    if max_side and roi.size and max(roi.shape[:2]) > max_side:
+        return fast_grabcut_tooth_contour(roi, x_offset, y_offset, box, pad, max_side=max_side)
+    try:
+        if roi.size == 0:
+            return None
+        return _mask_to_polygon(_grabcut_mask(roi, pad), x_offset, y_offset)
+    except Exception as e:
+        print(f"Error extracting contour: {e}")
+        return None
+
+
+def fast_grabcut_tooth_contour(roi: np.ndarray, x_offset: int, y_offset: int,
+                               box: Tuple[int, int, int, int], pad: int = GRABCUT_PAD,
+                               max_side: int = 96) -> Optional[List[tuple]]:
+    """
+    GrabCut on a downscaled ROI (longest side max_side pixels), with the
+    resulting contour scaled back up to image coordinates
+    """
+    try:
+        if roi.size == 0:
+            return None
+        scale = min(1.0, max_side / max(roi.shape[:2]))
+        if scale < 1.0:
+            small = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = roi
+        small_pad = max(1, int(round(pad * scale)))
+        if min(small.shape[:2]) <= 2 * small_pad + 1:
+            return None
+        return _mask_to_polygon(_grabcut_mask(small, small_pad), x_offset, y_offset, scale)
+    except Exception as e:
+        print(f"Error extracting contour: {e}")
+        return None
+
+
+def threshold_tooth_contour(roi: np.ndarray, x_offset: int, y_offset: int,
+                            box: Tuple[int, int, int, int], pad: int = GRABCUT_PAD) -> Optional[List[tuple]]:
+    """
+    Cheap segmentation: Otsu threshold of the (bright) tooth inside the ROI,
+    cleaned up with morphology. Intended for fast triage previews
+    """
+    try:
+        if roi.size == 0:
+            return None
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Teeth are radio-opaque (bright); everything outside the box is background
+        outside = np.ones(mask.shape, bool)
+        outside[pad:mask.shape[0] - pad, pad:mask.shape[1] - pad] = False
+        mask[outside] = 0
+
+        kernel = np.ones((3, 3), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        return _mask_to_polygon(mask, x_offset, y_offset)
+    except Exception as e:
+        print(f"Error extracting contour: {e}")
+        return None
+
+
+# Available contour engines (name -> ROI contour function)
+CONTOUR_ENGINES = {
+    'grabcut': grabcut_tooth_contour,
+    'grabcut_fast': fast_grabcut_tooth_contour,
+    'threshold': threshold_tooth_contour,
+}
+
+
+def extract_tooth_contour(image: np.ndarray, x1: int, y1: int, x2: int, y2: int,
+                          engine: str = 'grabcut') -> List[tuple]:
+    """Extract the contour of one tooth from the full image"""
+    if image is None:
+        return create_tooth_polygon(x1, y1, x2, y2)
+    roi, x_offset, y_offset = crop_tooth_roi(image, x1, y1, x2, y2)
+    polygon = CONTOUR_ENGINES[engine](roi, x_offset, y_offset, (x1, y1, x2, y2))
+    return polygon if polygon is not None else create_tooth_polygon(x1, y1, x2, y2)
+
+
+def _init_process_worker(starts):
+    global _task_starts
+    _task_starts = starts
+
+
+def _run_timed(contour_fn, idx: int, roi: np.ndarray, x_offset: int, y_offset: int,
+               box: Tuple[int, int, int, int]) -> Optional[List[tuple]]:
+    """Process pool task: record when tooth idx started, then extract its contour"""
+    _task_starts[idx] = time.monotonic()
+    return contour_fn(roi, x_offset, y_offset, box)
+
+
+class ContourExtractor:
+    """Runs contour extraction for many teeth on a worker pool"""
+
+    def __init__(self, workers: int = None, timeout: float = 2.0, executor: str = 'thread',
+                 grabcut_max_side: int = None):
+        """
+        Args:
+            workers: Pool size (default: number of CPU cores)
+            timeout: Seconds a single tooth may run before falling back to the box polygon.
+                A timed-out tooth is not interrupted on a thread pool: it keeps its
+                thread busy until GrabCut returns. A process pool belongs to one
+                call and is terminated after a timeout, stopping only that call's teeth
+            executor: 'thread' (shared pool, OpenCV releases the GIL) or 'process'
+                (a private pool per call, which costs a few process starts per request)
+            grabcut_max_side: Optional cap on the ROI side the 'grabcut' engine works
+                on; larger teeth are downscaled. Off by default (full resolution)
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown contour executor: {executor}")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.executor_type = executor
+        self.grabcut_max_side = grabcut_max_side or None
+
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.counters = {'extracted': 0, 'timeouts': 0, 'terminated_pools': 0}
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        """Create the shared thread pool lazily (and again in a forked child)"""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='grabcut')
+                self._pid = os.getpid()
+            return self._pool
+
+    def _contour_fn(self, engine: str):
+        if engine == 'grabcut' and self.grabcut_max_side:
+            return functools.partial(grabcut_tooth_contour, max_side=self.grabcut_max_side)
+        return CONTOUR_ENGINES[engine]
+
+    def extract_many(self, image: np.ndarray, boxes: Sequence[Tuple[int, int, int, int]],
+                     engine: str = 'grabcut') -> List[Tuple[List[tuple], bool]]:
+        """
+        Extract contours for all boxes in parallel with the given contour engine
+
+        Returns:
+            (polygon, exact) pairs in the same order as boxes. Teeth that failed or
+            timed out get the box-derived polygon with exact=False
+        """
+        if image is None or not boxes:
+            return [(create_tooth_polygon(*box), False) for box in boxes]
+
+        contour_fn = self._contour_fn(engine)
+        starts = None
+        if self.executor_type == 'process':
+            # Shared start markers (0 = not started) filled in by the workers
+            starts = multiprocessing.RawArray('d', len(boxes))
+            pool = ProcessPoolExecutor(max_workers=min(self.workers, len(boxes)),
+                                       initializer=_init_process_worker, initargs=(starts,))
+        else:
+            pool = self._ensure_pool()
+        futures = {}
+        for idx, box in enumerate(boxes):
+            # Only the padded ROI is shipped to the worker
+            roi, x_offset, y_offset = crop_tooth_roi(image, *box)
+            if starts is not None:
+                future = pool.submit(_run_timed, contour_fn, idx, roi, x_offset, y_offset, tuple(box))
+            else:
+                future = pool.submit(contour_fn, roi, x_offset, y_offset, tuple(box))
+            futures[future] = idx
+
+        polygons: List[Optional[List[tuple]]] = [None] * len(boxes)
+        started_at: Dict = {}
+        pending = set(futures)
+        timeouts = 0
+        while pending:
+            done, pending = wait(pending, timeout=0.02, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = futures[future]
+                try:
+                    polygons[idx] = future.result()
+                except Exception as e:
+                    print(f"Error extracting contour: {e}")
+
+            # Per-tooth timeout, measured from when a worker picked the tooth up. A
+            # process pool reports futures as running once they enter its call
+            # queue, so there the workers' own start markers are used
+            now = time.monotonic()
+            for future in list(pending):
+                if starts is not None:
+                    started = starts[futures[future]] or None
+                elif future.running():
+                    started = started_at.setdefault(future, now)
+                else:
+                    started = None
+                if started is not None and now - started > self.timeout:
+                    # The tooth keeps running (see timeout); its result is ignored
+                    pending.discard(future)
+                    timeouts += 1
+
+        if starts is not None:
+            self._close_process_pool(pool, terminate=timeouts > 0)
+        self._count(extracted=len(boxes) - timeouts, timeouts=timeouts)
+        return [
+            (polygon, True) if polygon is not None else (create_tooth_polygon(*box), False)
+            for polygon, box in zip(polygons, boxes)
+        ]
+
+    def _close_process_pool(self, pool: ProcessPoolExecutor, terminate: bool):
+        """Shut down the private pool of one call, killing workers stuck on timed-out teeth"""
+        if terminate:
+            # No public API stops a running task; the pool is private to this call,
+            # so no other request loses work
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+            with self._lock:
+                self.counters['terminated_pools'] += 1
+        pool.shutdown(wait=not terminate, cancel_futures=True)
+
+    def _count(self, extracted: int = 0, timeouts: int = 0):
+        with self._lock:
+            self.counters['extracted'] += extracted
+            self.counters['timeouts'] += timeouts
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'executor': self.executor_type,
+                'timeout_s': self.timeout,
+                'grabcut_max_side': self.grabcut_max_side,
+                **self.counters,
+            }
@@ -0,0 +1,219 @@
+"""
+Columnar Detections
+The detections of one analysis as NumPy columns (boxes, confidences, classes,
+tooth numbers, enum codes) with all polygons packed into one flat int32 buffer
+plus offsets. Filtering, sorting and summary counts are vectorized; the dict
+per detection of the API / JSON schema is only built by to_dicts()
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from disease_classifier import DiseaseClassifier, DiseaseType, SeverityLevel, ToothArea
+
+# Enum members in code order (the codes stored in the columns are indexes into these)
+DISEASE_TYPES = list(DiseaseType)
+SEVERITY_LEVELS = list(SeverityLevel)
+TOOTH_AREAS = list(ToothArea)
+POLYGON_STATUSES = ('pending', 'mask', 'exact', 'approximate')
+URGENCY_LEVELS = ('URGENT', 'HIGH', 'MODERATE', 'LOW')
+
+HEALTHY = DISEASE_TYPES.index(DiseaseType.HEALTHY)
+PENDING = POLYGON_STATUSES.index('pending')
+
+# Fixed rainbow color by tooth number (Green, Yellow, Cyan, Purple, Blue, Orange, Magenta, Red, Teal, Pink)
+RAINBOW_COLORS = ('#00FF00', '#FFFF00', '#00FFFF', '#800080', '#0000FF',
+                  '#FFA500', '#FF00FF', '#FF0000', '#008080', '#FFC0CB')
+
+# Lookups that only depend on the codes, built once
+_URGENCY_TEXT = [[DiseaseClassifier.get_urgency_level(disease, severity) for severity in SEVERITY_LEVELS]
+                 for disease in DISEASE_TYPES]
+URGENCY_CODES = np.array([[URGENCY_LEVELS.index(text.split(' - ')[0]) for text in row]
+                          for row in _URGENCY_TEXT], dtype=np.uint8)
+_RECOMMENDATIONS = [DiseaseClassifier.get_recommendations(disease)[:3] for disease in DISEASE_TYPES]
+
+_DISEASE_CODE = {disease.value: code for code, disease in enumerate(DISEASE_TYPES)}
+_SEVERITY_CODE = {severity.value: code for code, severity in enumerate(SEVERITY_LEVELS)}
+_AREA_CODE = {area.value: code for code, area in enumerate(TOOTH_AREAS)}
+
+
+def _pack_polygons(polygons: Sequence[Optional[Sequence]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat (n_points, 2) int32 buffer and n + 1 offsets; None packs as an empty polygon"""
+    lengths = [len(polygon) if polygon is not None else 0 for polygon in polygons]
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    points = np.zeros((int(offsets[-1]), 2), dtype=np.int32)
+    for polygon, start, length in zip(polygons, offsets[:-1], lengths):
+        if length:
+            points[start:start + length] = np.asarray(polygon).reshape(-1, 2)
+    return points, offsets
+
+
+class DetectionSet:
+    """Detections of one analysis, one NumPy array per field"""
+
+    def __init__(self, detection_ids: np.ndarray, boxes: np.ndarray, confidences: np.ndarray,
+                 classes: np.ndarray, tooth_numbers: np.ndarray, disease_codes: np.ndarray,
+                 severity_codes: np.ndarray, area_codes: np.ndarray, polygon_status: np.ndarray,
+                 polygon_points: np.ndarray, polygon_offsets: np.ndarray):
+        """
+        Args:
+            detection_ids: Index of each detection in the raw detections of its study
+            boxes: (n, 4) x1, y1, x2, y2
+            confidences: Model confidences
+            classes: Model class indexes
+            tooth_numbers: Parsed tooth numbers (0 = unknown)
+            disease_codes / severity_codes / area_codes: Indexes into DISEASE_TYPES,
+                SEVERITY_LEVELS and TOOTH_AREAS
+            polygon_status: Indexes into POLYGON_STATUSES ('pending' = no polygon)
+            polygon_points: (n_points, 2) int32, all polygons back to back
+            polygon_offsets: n + 1 offsets; polygon i is points[offsets[i]:offsets[i + 1]]
+        """
+        self.detection_ids = detection_ids
+        self.boxes = boxes
+        self.confidences = confidences
+        self.classes = classes
+        self.tooth_numbers = tooth_numbers
+        self.disease_codes = disease_codes
+        self.severity_codes = severity_codes
+        self.area_codes = area_codes
+        self.polygon_status = polygon_status
+        self.polygon_points = polygon_points
+        self.polygon_offsets = polygon_offsets
+
+    @classmethod
+    def build(cls, detection_ids: Sequence[int], boxes: Sequence[Sequence[int]], confidences: Sequence[float],
+              classes: Sequence[int], tooth_numbers: Sequence[int], diseases: Sequence[DiseaseType],
+              severities: Sequence[SeverityLevel], areas: Sequence[ToothArea],
+              polygons: Sequence[Optional[Sequence]], polygon_status: Sequence[str]) -> 'DetectionSet':
+        """Pack per-detection values (enums and status names are encoded)"""
+        points, offsets = _pack_polygons(polygons)
+        return cls(
+            detection_ids=np.asarray(detection_ids, dtype=np.int32),
+            boxes=np.asarray(boxes, dtype=np.int32).reshape(-1, 4),
+            confidences=np.asarray(confidences, dtype=np.float64),
+            classes=np.asarray(classes, dtype=np.int32),
+            tooth_numbers=np.asarray(tooth_numbers, dtype=np.int32),
+            disease_codes=np.array([DISEASE_TYPES.index(d) for d in diseases], dtype=np.uint8),
+            severity_codes=np.array([SEVERITY_LEVELS.index(s) for s in severities], dtype=np.uint8),
+            area_codes=np.array([TOOTH_AREAS.index(a) for a in areas], dtype=np.uint8),
+            polygon_status=np.array([POLYGON_STATUSES.index(s) for s in polygon_status], dtype=np.uint8),
+            polygon_points=points,
+            polygon_offsets=offsets,
+        )
+
+    @classmethod
+    def from_dicts(cls, detections: List[Dict]) -> 'DetectionSet':
+        """Columns of detections in the JSON schema (e.g. a saved or cached result)"""
+        points, offsets = _pack_polygons([d.get('polygon') for d in detections])
+        return cls(
+            detection_ids=np.array([d.get('detection_id', i) for i, d in enumerate(detections)], dtype=np.int32),
+            boxes=np.array([[d['bounding_box'][k] for k in ('x1', 'y1', 'x2', 'y2')] for d in detections],
+                           dtype=np.int32).reshape(-1, 4),
+            confidences=np.array([d['confidence'] for d in detections], dtype=np.float64),
+            classes=np.full(len(detections), -1, dtype=np.int32),  # Not part of the schema
+            tooth_numbers=np.array([d['tooth_number'] for d in detections], dtype=np.int32),
+            disease_codes=np.array([_DISEASE_CODE[d['disease_type']] for d in detections], dtype=np.uint8),
+            severity_codes=np.array([_SEVERITY_CODE[d['severity']] for d in detections], dtype=np.uint8),
+            area_codes=np.array([_AREA_CODE[d['affected_area']] for d in detections], dtype=np.uint8),
+            polygon_status=np.array([POLYGON_STATUSES.index(d.get('polygon_status') or 'pending')
+                                     for d in detections], dtype=np.uint8),
+            polygon_points=points,
+            polygon_offsets=offsets,
+        )
+
+    def __len__(self) -> int:
+        return len(self.detection_ids)
+
+    # --- Vectorized selection ---
+
+    def select(self, which) -> 'DetectionSet':
+        """Subset by boolean mask or index array (in the given order)"""
+        indexes = np.flatnonzero(which) if np.asarray(which).dtype == bool else np.asarray(which, dtype=np.int64)
+        starts = self.polygon_offsets[indexes]
+        lengths = self.polygon_offsets[indexes + 1] - starts
+        offsets = np.zeros(len(indexes) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Gather all selected point ranges at once: start of its polygon + position within it
+        point_index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return DetectionSet(
+            self.detection_ids[indexes], self.boxes[indexes], self.confidences[indexes],
+            self.classes[indexes], self.tooth_numbers[indexes], self.disease_codes[indexes],
+            self.severity_codes[indexes], self.area_codes[indexes], self.polygon_status[indexes],
+            self.polygon_points[point_index], offsets,
+        )
+
+    def filter_confidence(self, conf_threshold: float) -> 'DetectionSet':
+        return self.select(self.confidences >= conf_threshold)
+
+    def sort_by_tooth(self) -> 'DetectionSet':
+        """Ordered by tooth number (stable, so equal teeth keep their detection order)"""
+        return self.select(np.argsort(self.tooth_numbers, kind='stable'))
+
+    def rendered(self) -> np.ndarray:
+        """Mask of the detections drawn on the annotated image (diseased teeth)"""
+        return self.disease_codes != HEALTHY
+
+    def urgency_codes(self) -> np.ndarray:
+        """Indexes into URGENCY_LEVELS"""
+        return URGENCY_CODES[self.disease_codes, self.severity_codes]
+
+    # --- Vectorized counts ---
+
+    @staticmethod
+    def _count(codes: np.ndarray, names: Sequence[str]) -> Dict[str, int]:
+        """{name: count} in order of first occurrence"""
+        values, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        return {names[values[i]]: int(counts[i]) for i in order}
+
+    def disease_counts(self) -> Dict[str, int]:
+        return self._count(self.disease_codes, [d.value for d in DISEASE_TYPES])
+
+    def severity_counts(self) -> Dict[str, int]:
+        return self._count(self.severity_codes, [s.value for s in SEVERITY_LEVELS])
+
+    def urgency_counts(self) -> Dict[str, int]:
+        return self._count(self.urgency_codes(), URGENCY_LEVELS)
+
+    def findings(self) -> List[Tuple[int, str, str]]:
+        """Sorted (tooth number, disease type, severity) - what the AI insights depend on"""
+        return sorted(zip(self.tooth_numbers.tolist(),
+                          [DISEASE_TYPES[c].value for c in self.disease_codes],
+                          [SEVERITY_LEVELS[c].value for c in self.severity_codes]))
+
+    # --- JSON boundary ---
+
+    def polygon(self, i: int) -> Optional[List[tuple]]:
+        if self.polygon_status[i] == PENDING:
+            return None
+        points = self.polygon_points[self.polygon_offsets[i]:self.polygon_offsets[i + 1]]
+        return [tuple(point) for point in points.tolist()]
+
+    def to_dicts(self, polygons: bool = True) -> List[Dict]:
+        """Detections in the API / JSON schema (polygons=False leaves out the polygon, e.g. for text reports)"""
+        detections = []
+        for i, (det_id, (x1, y1, x2, y2), conf, tooth, disease, severity, area, status) in enumerate(zip(
+                self.detection_ids.tolist(), self.boxes.tolist(), self.confidences.tolist(),
+                self.tooth_numbers.tolist(), self.disease_codes.tolist(), self.severity_codes.tolist(),
+                self.area_codes.tolist(), self.polygon_status.tolist())):
+            detections.append({
+                "detection_id": det_id,
+                "tooth_number": tooth,
+                "tooth_name": DiseaseClassifier.get_tooth_name(tooth),
+                "disease_type": DISEASE_TYPES[disease].value,
+                "severity": SEVERITY_LEVELS[severity].value,
+                "affected_area": TOOTH_AREAS[area].value,
+                "confidence": conf,
+                "bounding_box": {
+                    "x1": x1, "y1": y1,
+                    "x2": x2, "y2": y2
+                },
+                "polygon": self.polygon(i) if polygons else None,
+                "polygon_status": POLYGON_STATUSES[status],
+                "color": RAINBOW_COLORS[tooth % len(RAINBOW_COLORS)],
+                "recommendations": list(_RECOMMENDATIONS[disease]),
+                "urgency": _URGENCY_TEXT[disease][severity]
+            })
+        return detections
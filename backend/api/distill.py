@@ -0,0 +1,257 @@
+"""
+Knowledge Distillation Training (python train.py --distill)
+Trains a small yolov8n/s student on the tooth dataset re-labelled by the trained
+yolov8m teacher (best.pt), compares size, CPU latency and per-class AP, and
+publishes the student as the fast preview model if its mAP@0.5 stays within
+tolerance of the teacher and does not fall below the current preview model.
+
+Ultralytics detection training has no soft-target (logit) loss, so the student
+learns from the teacher's hard predictions: by default its training labels are
+the teacher boxes only. '--labels union' (ground truth plus unmatched teacher
+boxes) is pseudo-label augmentation rather than distillation and is opt-in
+"""
+
+import os
+import glob
+import time
+import sys
+import shutil
+import argparse
+from pathlib import Path
+
+import numpy as np
+import yaml
+from ultralytics import YOLO
+from ultralytics.data.utils import check_det_dataset, img2label_paths, IMG_FORMATS
+
+TEACHER_PATH = str(Path(__file__).parent.parent / "model" / "best.pt")
+PREVIEW_PATH = str(Path(__file__).parent.parent / "model" / "preview.pt")
+DATA_YAML = "dataset/data.yaml"
+DISTILL_DIR = "dataset_distill"
+
+
+def list_images(split) -> list:
+    """Image files of a dataset split (folder, list file or list of either)"""
+    sources = split if isinstance(split, (list, tuple)) else [split]
+    images = []
+    for source in sources:
+        source = str(source)
+        if os.path.isdir(source):
+            images += [p for p in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+                       if p.rsplit('.', 1)[-1].lower() in IMG_FORMATS]
+        elif os.path.isfile(source):
+            base = os.path.dirname(source)
+            with open(source, 'r', encoding='utf-8') as f:
+                images += [os.path.join(base, line.strip()) for line in f if line.strip()]
+    return sorted(images)
+
+
+def read_labels(label_path: str) -> np.ndarray:
+    """YOLO labels (cls, cx, cy, w, h normalized) of one image"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5), np.float32)
+    labels = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    return labels[:, :5] if labels.size else np.zeros((0, 5), np.float32)
+
+
+def xywh_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of normalized (cx, cy, w, h) boxes"""
+    a1, a2 = a[:, None, :2] - a[:, None, 2:] / 2, a[:, None, :2] + a[:, None, 2:] / 2
+    b1, b2 = b[None, :, :2] - b[None, :, 2:] / 2, b[None, :, :2] + b[None, :, 2:] / 2
+    inter = np.prod(np.clip(np.minimum(a2, b2) - np.maximum(a1, b1), 0, None), axis=2)
+    union = np.prod(a[:, None, 2:], axis=2) + np.prod(b[None, :, 2:], axis=2) - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def link_or_copy(src: str, dst: str):
+    """Symlink an image into the distillation dataset (copy where symlinks are not allowed)"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.symlink(os.path.abspath(src), dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def build_distill_dataset(teacher: YOLO, data: dict, out_dir: str, teacher_conf: float, label_mode: str) -> str:
+    """
+    Re-label the training split with teacher predictions
+
+    label_mode 'teacher' (distillation) uses only the teacher boxes, 'union' keeps the
+    ground truth and adds teacher boxes that match no ground-truth box (pseudo-label
+    augmentation). The validation split keeps
+    its ground truth so the comparison stays honest.
+
+    Returns:
+        Path of the generated dataset yaml
+    """
+    images_dir = os.path.join(out_dir, "images", "train")
+    labels_dir = os.path.join(out_dir, "labels", "train")
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(labels_dir, exist_ok=True)
+
+    train_images = list_images(data['train'])
+    # Images keep their path below the split's common folder, so equal file names
+    # in different subfolders do not overwrite each other
+    source_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in train_images]) \
+        if train_images else ''
+    print(f"\n🧑‍🏫 Teacher labelling {len(train_images)} training images (conf >= {teacher_conf})...")
+    added = 0
+    for image_path, gt_label_path in zip(train_images, img2label_paths(train_images)):
+        result = teacher(image_path, conf=teacher_conf, verbose=False)[0]
+        teacher_labels = np.concatenate([
+            result.boxes.cls.cpu().numpy()[:, None],
+            result.boxes.xywhn.cpu().numpy()
+        ], axis=1) if len(result.boxes) else np.zeros((0, 5), np.float32)
+
+        if label_mode == 'union':
+            gt_labels = read_labels(gt_label_path)
+            if len(gt_labels) and len(teacher_labels):
+                covered = (xywh_iou(teacher_labels[:, 1:], gt_labels[:, 1:]) >= 0.5).any(axis=1)
+                teacher_labels = teacher_labels[~covered]
+            added += len(teacher_labels)
+            labels = np.concatenate([gt_labels, teacher_labels])
+        else:
+            labels = teacher_labels
+
+        name = os.path.relpath(os.path.abspath(image_path), source_root)
+        os.makedirs(os.path.dirname(os.path.join(images_dir, name)), exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.join(labels_dir, name)), exist_ok=True)
+        link_or_copy(image_path, os.path.join(images_dir, name))
+        with open(os.path.join(labels_dir, os.path.splitext(name)[0] + ".txt"), 'w') as f:
+            for cls, cx, cy, w, h in labels:
+                f.write(f"{int(cls)} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+
+    if label_mode == 'union':
+        print(f"   Teacher added {added} boxes not in the ground truth")
+
+    distill_yaml = os.path.join(out_dir, "data.yaml")
+    with open(distill_yaml, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({
+            'path': os.path.abspath(out_dir),
+            'train': "images/train",
+            'val': data['val'],
+            'nc': data['nc'],
+            'names': data['names'],
+        }, f, sort_keys=False)
+    return distill_yaml
+
+
+def cpu_latency_ms(model: YOLO, images: list, imgsz: int) -> float:
+    """Mean CPU inference latency per image (after one warm-up run)"""
+    model(images[0], imgsz=imgsz, device='cpu', verbose=False)
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        model(image, imgsz=imgsz, device='cpu', verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.mean(latencies))
+
+
+def main(argv: list = None):
+    """Distillation mode of train.py (argv: its options, default sys.argv)"""
+    parser = argparse.ArgumentParser(prog="train.py --distill",
+                                     description="Distill the tooth detector into a small student model")
+    parser.add_argument('--teacher', default=TEACHER_PATH, help="Trained teacher weights")
+    parser.add_argument('--student', default='yolov8n.pt', choices=['yolov8n.pt', 'yolov8s.pt'],
+                        help="Pretrained student architecture")
+    parser.add_argument('--data', default=DATA_YAML, help="Dataset yaml")
+    parser.add_argument('--labels', default='teacher', choices=['teacher', 'union'],
+                        help="Teacher boxes only (distillation), or ground truth plus teacher boxes "
+                             "(pseudo-label augmentation)")
+    parser.add_argument('--teacher-conf', type=float, default=0.25, help="Teacher confidence threshold")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch', type=int, default=4)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--latency-images', type=int, default=20, help="Validation images used for timing")
+    parser.add_argument('--no-publish', action='store_true', help="Do not copy the student to model/preview.pt")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Maximum allowed mAP@0.5 drop (absolute) of the student versus the teacher")
+    args = parser.parse_args(argv)
+
+    print("=" * 70)
+    print("TOOTH DETECTOR DISTILLATION")
+    print("=" * 70)
+
+    if not os.path.exists(args.teacher):
+        print(f"\n❌ ERROR: Teacher model not found at {args.teacher}")
+        print("   Please train the model first using: python train.py")
+        return
+    if not os.path.exists(args.data):
+        print(f"\n❌ ERROR: Dataset configuration not found at {args.data}")
+        print("   Please run prepare_dataset.py first to prepare your dataset")
+        return
+
+    data = check_det_dataset(args.data)
+    teacher = YOLO(args.teacher)
+    distill_yaml = build_distill_dataset(teacher, data, DISTILL_DIR, args.teacher_conf, args.labels)
+
+    print(f"\n🚀 Training student {args.student} on {distill_yaml}...")
+    student = YOLO(args.student)
+    student.train(
+        data=distill_yaml,
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch=args.batch,
+        device=args.device,
+        optimizer='AdamW',
+        lr0=0.001,
+        flipud=0.0,                 # Vertical flip (0 for X-rays)
+        project="runs/distill",
+        name=f"student_{Path(args.student).stem}",
+        exist_ok=True,
+        plots=False,
+    )
+    student_path = str(student.trainer.best)
+    student = YOLO(student_path)
+
+    # Compare teacher and student on the original validation split
+    print("\n📊 Evaluating teacher and student...")
+    val_images = list_images(data['val'])[:args.latency_images]
+    rows = []
+    per_class = {}
+    for label, model, path in (('teacher', teacher, args.teacher), ('student', student, student_path)):
+        metrics = model.val(data=args.data, imgsz=args.imgsz, batch=1, device=args.device,
+                            plots=False, verbose=False)
+        latency = cpu_latency_ms(model, val_images, args.imgsz) if val_images else float('nan')
+        rows.append((label, os.path.getsize(path) / 1024 ** 2, latency, metrics.box.map50))
+        for cls, ap50 in zip(metrics.ap_class_index, metrics.box.ap50):
+            per_class.setdefault(int(cls), {})[label] = ap50
+
+    print(f"\n{'Model':<10}{'Size MB':>10}{'CPU ms':>10}{'mAP@0.5':>10}")
+    print("-" * 40)
+    for label, size_mb, latency, map50 in rows:
+        print(f"{label:<10}{size_mb:>10.1f}{latency:>10.1f}{map50:>10.4f}")
+
+    print(f"\n{'Class':<10}{'Teacher AP50':>14}{'Student AP50':>14}")
+    print("-" * 38)
+    for cls in sorted(per_class):
+        aps = per_class[cls]
+        print(f"{data['names'][cls]:<10}{aps.get('teacher', 0.0):>14.4f}{aps.get('student', 0.0):>14.4f}")
+
+    if args.no_publish:
+        return
+
+    teacher_map50, student_map50 = rows[0][3], rows[1][3]
+    drop = teacher_map50 - student_map50
+    print(f"\n   Drop versus teacher: {drop:+.4f} (tolerance: {args.tolerance:.4f})")
+    if drop > args.tolerance:
+        print("\n❌ Student rejected: accuracy drop exceeds tolerance, preview model unchanged")
+        sys.exit(1)
+    if os.path.exists(PREVIEW_PATH):
+        previous = YOLO(PREVIEW_PATH).val(data=args.data, imgsz=args.imgsz, batch=1, device=args.device,
+                                          plots=False, verbose=False)
+        previous_map50 = previous.box.map50
+        print(f"   Current preview model mAP@0.5: {previous_map50:.4f}")
+        if student_map50 < previous_map50:
+            print("\n❌ Student rejected: less accurate than the current preview model, preview model unchanged")
+            sys.exit(1)
+
+    shutil.copy2(student_path, PREVIEW_PATH)
+    print(f"\n✅ Student published as preview model: {PREVIEW_PATH}")
+    print("   Request previews with the form field preview=true")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Image Ingestion Helpers
+Decodes an X-ray exactly once into a BGR ndarray that is shared by
+the model, the contour extraction and the annotator
+"""
+
+import os
+from typing import Tuple, Union
+
+import cv2
+import numpy as np
+
+ImageSource = Union[str, bytes, np.ndarray]
+
+
+def decode_image_bytes(data: bytes) -> np.ndarray:
+    """
+    Decode encoded image bytes (PNG, JPEG, BMP, TIFF) in memory
+
+    Returns:
+        BGR uint8 image array
+
+    Raises:
+        ValueError: If the bytes are not a decodable image
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+    if image is None:
+        raise ValueError("Could not decode image data")
+    return image
+
+
+def load_image(source: ImageSource) -> Tuple[np.ndarray, str]:
+    """
+    Turn any supported image source into a decoded BGR array
+
+    Args:
+        source: File path (CLI), raw upload bytes (API) or an already decoded array
+
+    Returns:
+        Tuple of (BGR image array, display name)
+    """
+    if isinstance(source, np.ndarray):
+        return source, "image"
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image_bytes(bytes(source)), "upload"
+
+    image = cv2.imread(str(source), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image: {source}")
+    return image, os.path.basename(str(source))
@@ -0,0 +1,116 @@
+"""
+Results Index Importer
+One-shot import of the analyses saved before the SQLite results index existed:
+every <uuid>.json in results_pridects/ plus the rows of the legacy report.csv
+that have no JSON file (those only carry tooth numbers and disease types)
+"""
+
+import os
+import ast
+import csv
+import glob
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from results_index import ResultsIndex
+
+RESULTS_DIR = str(Path(__file__).parent.parent / "results_pridects")
+
+
+def read_json_results(results_dir: str) -> Iterator[Tuple[Dict, float]]:
+    """Yield (results, saved at) for every JSON report in the folder"""
+    for json_path in sorted(glob.glob(os.path.join(results_dir, "*.json"))):
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping {os.path.basename(json_path)}: {e}")
+            continue
+        if not isinstance(results, dict) or 'unique_id' not in results:
+            continue
+        yield results, os.path.getmtime(json_path)
+
+
+def read_csv_results(csv_path: str) -> Iterator[Tuple[Dict, float]]:
+    """Yield (partial results, file time) for every row of a legacy report.csv"""
+    saved_at = os.path.getmtime(csv_path)
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            tooth_numbers = [t.strip() for t in (row.get('tooth_numbers') or '').split(',') if t.strip()]
+            diseases = [d.strip() for d in (row.get('diseases') or '').split(',') if d.strip()]
+            try:
+                summary = ast.literal_eval(row.get('report_summary') or '{}')
+            except (ValueError, SyntaxError):
+                summary = {}
+            yield {
+                'unique_id': row['unique_id'],
+                'input_image': row.get('input_image'),
+                'output_image': row.get('output_image'),
+                'total_detections': int(row.get('total_detections') or len(tooth_numbers)),
+                'detections': [
+                    {'tooth_number': int(tooth), 'disease_type': disease}
+                    for tooth, disease in zip(tooth_numbers, diseases) if tooth.isdigit()
+                ],
+                'summary': summary if isinstance(summary, dict) else {},
+            }, saved_at
+
+
+def import_results(index: ResultsIndex, results_dir: str, csv_path: Optional[str] = None,
+                   batch_size: int = 200) -> Dict[str, int]:
+    """
+    Import the JSON reports of a folder (and a legacy CSV) into the index
+
+    Analyses that are already indexed are left alone, so the import can be re-run.
+
+    Returns:
+        Number of imported and skipped analyses per source
+    """
+    counts = {'json': 0, 'csv': 0, 'skipped': 0}
+    seen = set()
+    batch = []
+
+    def add(results: Dict, saved_at: float, source: str):
+        unique_id = results['unique_id']
+        if unique_id in seen or index.has_study(unique_id):
+            counts['skipped'] += 1
+            return
+        seen.add(unique_id)
+        batch.append((results, saved_at))
+        counts[source] += 1
+        if len(batch) >= batch_size:
+            index.add_studies(batch)
+            batch.clear()
+
+    for results, saved_at in read_json_results(results_dir):
+        add(results, saved_at, 'json')
+    if csv_path and os.path.exists(csv_path):
+        for results, saved_at in read_csv_results(csv_path):
+            add(results, saved_at, 'csv')
+    if batch:
+        index.add_studies(batch)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import saved analyses into the SQLite results index")
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help="Folder with <uuid>.json reports")
+    parser.add_argument('--csv', default=None, help="Legacy report.csv (default: <results-dir>/report.csv)")
+    parser.add_argument('--db', default=None, help="Index database (default: <results-dir>/results.db)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(args.results_dir, "results.db")
+    csv_path = args.csv or os.path.join(args.results_dir, "report.csv")
+    index = ResultsIndex(db_path)
+
+    print(f"📂 Importing {args.results_dir} into {db_path}")
+    counts = import_results(index, args.results_dir, csv_path)
+    print(f"✅ Imported {counts['json']} JSON reports and {counts['csv']} CSV-only rows "
+          f"({counts['skipped']} already indexed)")
+    stats = index.get_stats()
+    print(f"📊 Index: {stats['studies']} studies, {stats['detections']} detections")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Inference Engines
+Loads the trained YOLO weights on PyTorch, ONNX Runtime or OpenVINO (FP32, or the
+INT8 model published by quantize.py). Exported models are cached next to best.pt
+and re-exported when the weights change; every engine returns the same
+ultralytics Results objects
+"""
+
+import os
+import hashlib
+from typing import Tuple
+
+from ultralytics import YOLO
+
+# Engine name -> ultralytics export format (None = load the .pt directly)
+INFERENCE_ENGINES = {
+    'torch': None,
+    'onnx': 'onnx',
+    'openvino': 'openvino',
+    'openvino_int8': 'openvino',
+}
+
+# Engines whose model is built offline (needs calibration data) -> script that builds it
+PREBUILT_ENGINES = {
+    'openvino_int8': 'quantize.py',
+}
+
+
+def hash_weights(path: str) -> str:
+    """Short content hash of a weights file (versions exports and cached predictions)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def exported_model_path(model_path: str, engine: str) -> str:
+    """Where ultralytics writes the exported model for an engine"""
+    stem, _ = os.path.splitext(model_path)
+    if engine == 'onnx':
+        return f"{stem}.onnx"
+    if engine == 'openvino':
+        return f"{stem}_openvino_model"
+    if engine == 'openvino_int8':
+        return f"{stem}_int8_openvino_model"
+    return model_path
+
+
+def _source_marker(artifact_path: str) -> str:
+    return f"{artifact_path.rstrip(os.sep)}.source"
+
+
+def read_source_marker(artifact_path: str) -> str:
+    """Weights hash an exported model was built from ('' if unknown)"""
+    try:
+        with open(_source_marker(artifact_path), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def write_source_marker(artifact_path: str, source_hash: str):
+    """Record which weights an exported model was built from"""
+    with open(_source_marker(artifact_path), 'w', encoding='utf-8') as f:
+        f.write(source_hash)
+
+
+def export_model(model_path: str, engine: str, source_hash: str, imgsz: int = 640) -> str:
+    """
+    Export the weights for an engine, reusing a cached export of the same weights
+
+    Args:
+        model_path: Path to the trained .pt weights
+        engine: One of INFERENCE_ENGINES
+        source_hash: Content hash of the weights, recorded next to the export
+        imgsz: Export image size
+
+    Returns:
+        Path of the exported model
+    """
+    artifact_path = exported_model_path(model_path, engine)
+    if os.path.exists(artifact_path) and read_source_marker(artifact_path) == source_hash:
+        print(f"✅ Using cached {engine} model: {artifact_path}")
+        return artifact_path
+
+    print(f"⚙️ Exporting model for {engine} (first load)...")
+    # Dynamic shapes so the micro-batcher can run several images per forward pass
+    exported = YOLO(model_path).export(format=INFERENCE_ENGINES[engine], imgsz=imgsz,
+                                       dynamic=True, verbose=False)
+    artifact_path = str(exported).rstrip(os.sep)
+    write_source_marker(artifact_path, source_hash)
+    print(f"✅ Exported {engine} model: {artifact_path}")
+    return artifact_path
+
+
+def load_engine(model_path: str, engine: str, source_hash: str, imgsz: int = 640) -> Tuple[YOLO, str]:
+    """
+    Load the detector on the requested inference engine
+
+    Returns:
+        Tuple of (YOLO model, path of the loaded model file)
+
+    Raises:
+        ValueError: If the engine is unknown
+        FileNotFoundError: If a prebuilt model is missing or was built from other weights
+    """
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"inference engine must be one of {tuple(INFERENCE_ENGINES)}")
+    if INFERENCE_ENGINES[engine] is None:
+        return YOLO(model_path), model_path
+    if engine in PREBUILT_ENGINES:
+        artifact_path = exported_model_path(model_path, engine)
+        if not os.path.exists(artifact_path) or read_source_marker(artifact_path) != source_hash:
+            raise FileNotFoundError(
+                f"No {engine} model for the current weights at {artifact_path} - "
+                f"run: python {PREBUILT_ENGINES[engine]}"
+            )
+        return YOLO(artifact_path, task='detect'), artifact_path
+    artifact_path = export_model(model_path, engine, source_hash, imgsz)
+    return YOLO(artifact_path, task='detect'), artifact_path
@@ -0,0 +1,258 @@
+"""
+Asynchronous AI Insights
+Generates the LLM insights of a report in the background, after the core result
+has been returned. Findings come from the deterministic DiseaseClassifier rules,
+so identical finding sets share one cached insight text (keyed by a normalized
+detection signature, TTL + LRU). Backends: Gemini, or a local stub for offline
+testing and load tests
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import span
+
+INSIGHT_BACKENDS = ('gemini', 'stub', 'off')
+
+Finding = Tuple[int, str, str]  # tooth number, disease type, severity
+
+
+def normalize_findings(detections: List[Dict]) -> List[Finding]:
+    """The parts of the detections the insights depend on, in a canonical order"""
+    return sorted(
+        (int(det['tooth_number']), str(det['disease_type']), str(det['severity']))
+        for det in detections
+    )
+
+
+def findings_signature(findings: List[Finding]) -> str:
+    """Short hash of normalized findings (same findings -> same insights)"""
+    digest = hashlib.sha256()
+    for finding in findings:
+        digest.update(repr(finding).encode('utf-8'))
+    return digest.hexdigest()[:24]
+
+
+def detection_signature(detections: List[Dict]) -> str:
+    """Short hash of the normalized findings of detections"""
+    return findings_signature(normalize_findings(detections))
+
+
+def build_prompt(findings: List[Finding]) -> str:
+    """Insights prompt for a set of normalized findings"""
+    prompt = "Based on the following dental X-ray analysis, provide professional insights and recommendations:\n\n"
+
+    for tooth_number, disease_type, severity in findings:
+        prompt += f"- Tooth #{tooth_number}: {disease_type} ({severity})\n"
+
+    prompt += "\nPlease provide:\n"
+    prompt += "1. Overall oral health assessment\n"
+    prompt += "2. Priority treatment recommendations\n"
+    prompt += "3. Preventive care suggestions\n"
+    prompt += "Keep the response concise and professional."
+    return prompt
+
+
+class GeminiBackend:
+    """Insights from the Gemini API"""
+    name = 'gemini'
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, findings: List[Finding]) -> str:
+        return self.model.generate_content(build_prompt(findings)).text
+
+
+class StubBackend:
+    """Deterministic offline insights with an optional simulated round-trip"""
+    name = 'stub'
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def generate(self, findings: List[Finding]) -> str:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        diseased = [f for f in findings if f[1] != 'Healthy']
+        lines = [
+            f"1. Overall assessment: {len(findings) - len(diseased)} of {len(findings)} teeth appear healthy.",
+            "2. Priority treatment: " + (
+                ", ".join(f"tooth #{tooth} ({disease}, {severity})" for tooth, disease, severity in diseased[:5])
+                if diseased else "none required"
+            ) + ".",
+            "3. Prevention: brush twice daily, floss and schedule regular check-ups.",
+            "(Offline stub insights - not generated by an AI model)",
+        ]
+        return "\n".join(lines)
+
+
+class InsightsService:
+    """Background generation, signature cache and ready callbacks for AI insights"""
+
+    def __init__(self, backend, max_entries: int = 512, ttl_seconds: float = 24 * 3600, workers: int = 2):
+        """
+        Args:
+            backend: Object with name and generate(findings) -> str
+            max_entries: Cached insight texts, and remembered failures (LRU beyond that)
+            ttl_seconds: Age after which cached insights are generated again (and
+                failures are forgotten)
+            workers: Concurrent backend calls
+        """
+        self.backend = backend
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.workers = max(1, workers)
+
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._pending: Dict[str, List[Callable[[str], None]]] = {}
+        self._failed: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.counters = {'hits': 0, 'misses': 0, 'generated': 0, 'failures': 0, 'evictions': 0}
+        self._latency_total = 0.0
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        """Create the worker pool lazily (and again in a forked child)"""
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='insights')
+            self._pid = os.getpid()
+            self._pending = {}
+        return self._pool
+
+    def _lookup_locked(self, signature: str) -> Optional[str]:
+        entry = self._cache.get(signature)
+        if entry is None:
+            return None
+        created_at, text = entry
+        if time.time() - created_at > self.ttl_seconds:
+            del self._cache[signature]
+            return None
+        self._cache.move_to_end(signature)
+        return text
+
+    def lookup(self, signature: str) -> Optional[str]:
+        """Cached insights for a signature, or None"""
+        with self._lock:
+            text = self._lookup_locked(signature)
+            self.counters['hits' if text is not None else 'misses'] += 1
+            return text
+
+    def request(self, signature: str, detections: List[Dict],
+                on_ready: Callable[[str], None] = None) -> str:
+        """
+        Make sure insights for these detections are (being) generated
+
+        on_ready(text) is called once they are available - right away if cached,
+        otherwise from the worker thread. Requests for a signature that is already
+        being generated share that backend call.
+
+        Returns:
+            'ready' or 'pending'
+        """
+        with self._lock:
+            text = self._lookup_locked(signature)
+            if text is None:
+                pool = self._ensure_pool()
+                callbacks = self._pending.get(signature)
+                if callbacks is None:
+                    self._pending[signature] = [on_ready] if on_ready else []
+                    self._failed.pop(signature, None)
+                    pool.submit(self._generate, signature, normalize_findings(detections))
+                elif on_ready:
+                    callbacks.append(on_ready)
+                return 'pending'
+        if on_ready:
+            on_ready(text)
+        return 'ready'
+
+    def generate_now(self, detections: List[Dict]) -> str:
+        """Synchronous insights (cached), for scripts and the command line"""
+        signature = detection_signature(detections)
+        text = self.lookup(signature)
+        if text is None:
+            with span('ai_insights'):
+                text = self.backend.generate(normalize_findings(detections))
+            self._store(signature, text)
+        return text
+
+    def _failure_locked(self, signature: str) -> Optional[str]:
+        """Error of a recent failed generation, or None (expired failures are forgotten)"""
+        entry = self._failed.get(signature)
+        if entry is None:
+            return None
+        failed_at, error = entry
+        if time.time() - failed_at > self.ttl_seconds:
+            del self._failed[signature]
+            return None
+        return error
+
+    def _store(self, signature: str, text: str):
+        with self._lock:
+            self._cache[signature] = (time.time(), text)
+            self._cache.move_to_end(signature)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _generate(self, signature: str, findings: List[Finding]):
+        start = time.perf_counter()
+        try:
+            with span('ai_insights'):
+                text = self.backend.generate(findings)
+        except Exception as e:
+            print(f"⚠️ AI insights failed ({self.backend.name}): {e}")
+            with self._lock:
+                self.counters['failures'] += 1
+                self._failed[signature] = (time.time(), str(e))
+                self._failed.move_to_end(signature)
+                while len(self._failed) > self.max_entries:
+                    self._failed.popitem(last=False)
+                self._pending.pop(signature, None)
+            return
+
+        self._store(signature, text)
+        with self._lock:
+            self.counters['generated'] += 1
+            self._latency_total += time.perf_counter() - start
+            callbacks = self._pending.pop(signature, [])
+        for callback in callbacks:
+            try:
+                callback(text)
+            except Exception as e:
+                print(f"⚠️ Attaching AI insights failed: {e}")
+
+    def status(self, signature: str) -> Dict:
+        """State of the insights for a signature: ready, pending, failed or unknown"""
+        with self._lock:
+            text = self._lookup_locked(signature)
+            if text is not None:
+                return {'status': 'ready', 'signature': signature, 'text': text}
+            if signature in self._pending:
+                return {'status': 'pending', 'signature': signature, 'text': None}
+            error = self._failure_locked(signature)
+            if error is not None:
+                return {'status': 'failed', 'signature': signature, 'text': None, 'error': error}
+            return {'status': 'unknown', 'signature': signature, 'text': None}
+
+    def get_stats(self) -> Dict:
+        """Cache occupancy, hit rate and backend latency"""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                'backend': self.backend.name,
+                'cached': len(self._cache),
+                'max_entries': self.max_entries,
+                'pending': len(self._pending),
+                'failed': len(self._failed),
+                'hit_rate': self.counters['hits'] / lookups if lookups else 0.0,
+                'mean_generation_ms': 1000 * self._latency_total / self.counters['generated']
+                if self.counters['generated'] else 0.0,
+                **self.counters,
+            }
@@ -0,0 +1,153 @@
+"""
+Asynchronous Analysis Job Queue
+Runs X-ray analyses on a bounded background worker pool so that
+HTTP request threads return a job ID immediately and never block on inference
+"""
+
+import os
+import uuid
+import time
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+
+class JobStatus(Enum):
+    """Lifecycle states of an analysis job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free slot for a new job"""
+
+
+@dataclass
+class Job:
+    """Container for a single analysis job"""
+    job_id: str
+    status: JobStatus = JobStatus.QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """Public status view of the job (without the result payload)"""
+        return {
+            'job_id': self.job_id,
+            'status': self.status.value,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """Bounded in-process worker pool with job tracking"""
+
+    def __init__(self, worker_fn: Callable[..., Dict], max_workers: int = 2,
+                 max_queued: int = 16, max_finished: int = 256):
+        """
+        Args:
+            worker_fn: Function executed for each job, returns the job result
+            max_workers: Number of jobs processed concurrently
+            max_queued: Number of jobs allowed to wait for a free worker
+            max_finished: Number of finished jobs kept for polling
+        """
+        self.worker_fn = worker_fn
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _ensure_executor(self):
+        """Create the worker pool lazily (and again in a forked child)"""
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="analysis-job"
+            )
+            self._pid = os.getpid()
+
+    def submit(self, *args: Any, **kwargs: Any) -> Job:
+        """
+        Queue a new job
+
+        Args:
+            *args, **kwargs: Arguments forwarded to worker_fn
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If all workers are busy and the wait queue is full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queued:
+                raise QueueFullError(
+                    f"Job queue is full ({self._pending} jobs pending)"
+                )
+            self._ensure_executor()
+            job = Job(job_id=str(uuid.uuid4()))
+            self._jobs[job.job_id] = job
+            self._pending += 1
+
+        self._executor.submit(self._run, job, args, kwargs)
+        return job
+
+    def _run(self, job: Job, args, kwargs):
+        """Execute a job on a worker thread and record its outcome"""
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = self.worker_fn(*args, **kwargs)
+            job.status = JobStatus.DONE
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                self._evict_finished()
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in (JobStatus.DONE, JobStatus.FAILED)
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by ID"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_stats(self) -> Dict:
+        """Current queue occupancy"""
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+            return {
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'pending': self._pending,
+                'jobs': counts,
+            }
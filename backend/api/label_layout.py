@@ -0,0 +1,108 @@
+"""
+Label Layout Engine
+Deterministic placement of annotation labels: a fixed candidate search around
+each tooth box, checked against already placed labels through a uniform grid
+index instead of comparing with every label
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+Rect = Tuple[int, int, int, int]  # x0, y0, x1, y1 (exclusive)
+
+
+class LabelLayout:
+    """Places label rectangles on an image without overlapping earlier labels"""
+
+    def __init__(self, width: int, height: int, margin: int = 4, cell_size: int = 64,
+                 search_rings: int = 8, search_step: int = 12):
+        """
+        Args:
+            width, height: Image size (labels are kept inside)
+            margin: Space kept free around every label (its background padding)
+            cell_size: Grid cell size of the spatial index in pixels
+            search_rings: Number of offset rings tried after the fixed anchor positions
+            search_step: Distance in pixels between two rings
+        """
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.cell_size = cell_size
+        self.search_rings = search_rings
+        self.search_step = search_step
+
+        self._rects: List[Rect] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def _cells(self, rect: Rect) -> Iterator[Tuple[int, int]]:
+        x0, y0, x1, y1 = rect
+        for cy in range(y0 // self.cell_size, (y1 - 1) // self.cell_size + 1):
+            for cx in range(x0 // self.cell_size, (x1 - 1) // self.cell_size + 1):
+                yield cx, cy
+
+    def _padded(self, x: int, y: int, w: int, h: int) -> Rect:
+        return x - self.margin, y - self.margin, x + w + self.margin, y + h + self.margin
+
+    def overlap_area(self, rect: Rect) -> int:
+        """Total area of rect covered by placed labels"""
+        seen = set()
+        area = 0
+        for cell in self._cells(rect):
+            for idx in self._grid.get(cell, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                ox0, oy0, ox1, oy1 = self._rects[idx]
+                dx = min(rect[2], ox1) - max(rect[0], ox0)
+                dy = min(rect[3], oy1) - max(rect[1], oy0)
+                if dx > 0 and dy > 0:
+                    area += dx * dy
+        return area
+
+    def _add(self, rect: Rect):
+        self._rects.append(rect)
+        for cell in self._cells(rect):
+            self._grid[cell].append(len(self._rects) - 1)
+
+    def _clamp(self, x: int, y: int, w: int, h: int) -> Tuple[int, int]:
+        return max(0, min(x, self.width - w)), max(0, min(y, self.height - h))
+
+    def candidates(self, box: Tuple[int, int, int, int], w: int, h: int) -> Iterator[Tuple[int, int]]:
+        """Candidate label positions for a tooth box, in order of preference"""
+        x1, y1, x2, y2 = box
+        above = (x1, y1 - h - 8)
+        anchors = [
+            above,                              # Above the box
+            (x1, y2 + 5),                       # Below the box
+            (x2 - w, y1 - h - 8),               # Right-aligned above
+            (x2 + 5, y1 + (y2 - y1) // 2),      # Right side
+            (x1 - w - 5, y1 + (y2 - y1) // 2),  # Left side
+        ]
+        for x, y in anchors:
+            yield self._clamp(x, y, w, h)
+
+        # Rings of offsets around the two preferred anchors (above, then below)
+        for ring in range(1, self.search_rings + 1):
+            d = ring * self.search_step
+            for ax, ay in anchors[:2]:
+                for dx, dy in ((0, -d), (0, d), (d, 0), (-d, 0), (d, -d), (-d, -d), (d, d), (-d, d)):
+                    yield self._clamp(ax + dx, ay + dy, w, h)
+
+    def place(self, box: Tuple[int, int, int, int], w: int, h: int) -> Tuple[int, int]:
+        """
+        Place a w x h label for a tooth box
+
+        Returns the first free candidate position, or the candidate with the least
+        overlap if every candidate collides (first one wins ties)
+        """
+        best = None
+        best_area = None
+        for x, y in self.candidates(box, w, h):
+            rect = self._padded(x, y, w, h)
+            area = self.overlap_area(rect)
+            if best_area is None or area < best_area:
+                best, best_area = (x, y), area
+            if area == 0:
+                break
+        self._add(self._padded(best[0], best[1], w, h))
+        return best
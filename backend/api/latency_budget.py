@@ -0,0 +1,78 @@
+"""
+Per-Request Latency Budget
+Tracks the deadline of one analysis and switches off optional work when the
+remaining stages are not expected to fit: first exact contours (box-derived tooth
+polygons instead), then annotation quality. AI insights are generated in the
+background (insights.py) and never count against the budget
+"""
+
+import time
+from typing import Dict, List
+
+from metrics import REGISTRY, Counter, stage_estimate_ms
+
+# Degradations in the order they are applied, with the stage each one removes
+DEGRADATION_STEPS = (
+    ('approximate_contours', 'contours'),
+    ('low_quality_annotation', 'render'),
+)
+
+# Assumed stage durations (ms) until a stage has been measured on this server
+DEFAULT_STAGE_MS = {
+    'contours': 2000.0,
+    'render': 300.0,
+    'save_reports': 20.0,
+}
+
+DEGRADATIONS = REGISTRY.register(Counter(
+    'dentx_degradations_total', 'Optional stages dropped to meet a latency budget', ('degradation',)
+))
+
+
+def expected_stage_ms(stage: str) -> float:
+    """Recent duration of a stage, or its assumed default"""
+    return stage_estimate_ms(stage, DEFAULT_STAGE_MS.get(stage, 0.0))
+
+
+class LatencyBudget:
+    """Deadline of one request and the degradations applied to meet it"""
+
+    def __init__(self, budget_ms: float, started: float = None):
+        """
+        Args:
+            budget_ms: Total time the client allows for the request
+            started: time.perf_counter() of the request start (default: now)
+        """
+        if budget_ms <= 0:
+            raise ValueError("Latency budget must be positive")
+        self.budget_ms = budget_ms
+        self.deadline = (started if started is not None else time.perf_counter()) + budget_ms / 1000
+        self.degradations: List[str] = []
+
+    def remaining_ms(self) -> float:
+        return (self.deadline - time.perf_counter()) * 1000
+
+    def degraded(self, degradation: str) -> bool:
+        return degradation in self.degradations
+
+    def degrade(self, degradation: str):
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
+            DEGRADATIONS.inc(degradation=degradation)
+            print(f"⏱️ Latency budget: {degradation} ({self.remaining_ms():.0f} ms left)")
+
+    def plan(self, expected_ms: Dict[str, float]):
+        """
+        Apply degradations in order until the remaining stages are expected to fit
+
+        Args:
+            expected_ms: Expected duration of every stage still to run, by stage name
+        """
+        expected_ms = dict(expected_ms)
+        remaining = self.remaining_ms()
+        for degradation, stage in DEGRADATION_STEPS:
+            if sum(expected_ms.values()) <= remaining:
+                break
+            if expected_ms.get(stage):
+                self.degrade(degradation)
+                expected_ms[stage] = 0.0
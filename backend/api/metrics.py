@@ -0,0 +1,259 @@
+"""
+Latency Metrics
+Per-stage timing spans, request counters and in-flight gauges, exported in the
+Prometheus text exposition format for /api/metrics
+"""
+
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Stage / request latency buckets in seconds (GrabCut and Gemini calls can take many seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class: one value (or histogram state) per label combination"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return '\n'.join(lines + self._samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (e.g. requests in flight)"""
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf) and the sum of observations
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'dentx_stage_duration_seconds', 'Duration of analysis pipeline stages', ('stage',)
+))
+REQUESTS = REGISTRY.register(Counter(
+    'dentx_http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'dentx_http_request_duration_seconds', 'HTTP request latency by route', ('route',)
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'dentx_http_requests_in_flight', 'HTTP requests currently being handled', ('route',)
+))
+ANALYSES_IN_FLIGHT = REGISTRY.register(Gauge(
+    'dentx_analyses_in_flight', 'Image analyses currently running (requests and queued jobs)'
+))
+
+
+class Trace:
+    """Spans recorded while handling one request or job"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, parent: Optional[str], start: float, duration_ms: float):
+        with self._lock:
+            self.spans.append({
+                'stage': stage,
+                'parent': parent,
+                'start_ms': round((start - self.started) * 1000, 2),
+                'duration_ms': round(duration_ms, 2),
+            })
+
+    def to_list(self) -> List[Dict]:
+        """Spans ordered by start time"""
+        with self._lock:
+            return sorted(self.spans, key=lambda s: (s['start_ms'], s['parent'] is not None))
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (top-level spans only)"""
+        return ', '.join(
+            f"{s['stage']};dur={s['duration_ms']}" for s in self.to_list() if s['parent'] is None
+        )
+
+
+# Moving average of recent durations per stage (ms), used to predict remaining work
+_stage_estimates: Dict[str, float] = {}
+_estimates_lock = threading.Lock()
+
+
+def _update_estimate(stage: str, duration_ms: float):
+    with _estimates_lock:
+        previous = _stage_estimates.get(stage)
+        _stage_estimates[stage] = duration_ms if previous is None else 0.8 * previous + 0.2 * duration_ms
+
+
+def stage_estimate_ms(stage: str, default: float = 0.0) -> float:
+    """Recent typical duration of a stage in ms (default if it never ran)"""
+    with _estimates_lock:
+        return _stage_estimates.get(stage, default)
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('dentx_trace', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('dentx_span', default=None)
+
+
+def start_trace() -> Tuple[Trace, contextvars.Token]:
+    """Begin collecting spans in the current thread / context"""
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, timings: Dict[str, float] = None):
+    """
+    Time one pipeline stage
+
+    The duration is observed in the stage histogram, added to the active trace
+    (if any) and, when given, stored in timings[stage] as milliseconds
+    """
+    parent = _current_span.get()
+    parent_token = _current_span.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(parent_token)
+        STAGE_SECONDS.observe(duration, stage=stage)
+        _update_estimate(stage, duration * 1000)
+        if timings is not None:
+            timings[stage] = duration * 1000
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, parent, start, duration * 1000)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text format (version 0.0.4)"""
+    return REGISTRY.render()
@@ -11,14 +11,16 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 from datetime import datetime
+from io import BytesIO
 import os
 
 
 class PDFReportGenerator:
     """Generate comprehensive PDF reports for dental X-ray analysis"""
     
-    def __init__(self, output_dir="results_pridects"):
+    def __init__(self, output_dir="results_pridects", blob_store=None):
         self.output_dir = output_dir
+        self.blob_store = blob_store
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
     
@@ -80,9 +82,10 @@ class PDFReportGenerator:
         
         pdf_path = os.path.join(self.output_dir, output_filename)
         
-        # Create PDF document
+        # Create PDF document (in memory, then stored in one atomic write)
+        buffer = BytesIO()
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=letter,
             rightMargin=0.75*inch,
             leftMargin=0.75*inch,
@@ -114,6 +117,12 @@ class PDFReportGenerator:
         # Build PDF
         doc.build(story)
         
+        if self.blob_store is not None and self.blob_store.handles(pdf_path):
+            self.blob_store.write(pdf_path, buffer.getvalue())
+        else:
+            with open(pdf_path, 'wb') as f:
+                f.write(buffer.getvalue())
+        
         return pdf_path
     
     def _create_header(self, results: dict):
@@ -204,10 +213,12 @@ class PDFReportGenerator:
         
         # Add image
         image_path = results.get('output_image')
-        if image_path and os.path.exists(image_path):
+        in_store = bool(image_path) and self.blob_store is not None and self.blob_store.handles(image_path)
+        if image_path and (self.blob_store.exists(image_path) if in_store else os.path.exists(image_path)):
             try:
                 # Scale image to fit page width
-                img = Image(image_path, width=6.5*inch, height=4*inch, kind='proportional')
+                source = BytesIO(self.blob_store.read(image_path)) if in_store else image_path
+                img = Image(source, width=6.5*inch, height=4*inch, kind='proportional')
                 elements.append(img)
             except Exception as e:
                 print(f"❌ PDF Image Load Error: {e} | Path: {image_path}")
@@ -367,7 +378,8 @@ class PDFReportGenerator:
         return elements
 
 
-def generate_pdf_report(prediction_results: dict, output_filename: str = None, output_dir: str = "results_pridects") -> str:
+def generate_pdf_report(prediction_results: dict, output_filename: str = None, output_dir: str = "results_pridects",
+                        blob_store=None) -> str:
     """
     Convenience function to generate PDF report
     
@@ -375,9 +387,10 @@ def generate_pdf_report(prediction_results: dict, output_filename: str = None, o
         prediction_results: Dictionary with prediction results
         output_filename: Optional custom filename
         output_dir: Directory to save the PDF report
+        blob_store: Optional BlobStore the report and annotated image are stored in
         
     Returns:
         Path to generated PDF file
     """
-    generator = PDFReportGenerator(output_dir=output_dir)
+    generator = PDFReportGenerator(output_dir=output_dir, blob_store=blob_store)
     return generator.generate_report(prediction_results, output_filename)
@@ -5,20 +5,34 @@ Generates color-coded bounding boxes and comprehensive reports
 """
 
 import os
+import time
 import uuid
-import csv
-import json
 import tkinter as tk
 from tkinter import filedialog
-from PIL import Image, ImageDraw, ImageFont
-import cv2
 import numpy as np
-from ultralytics import YOLO
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from disease_classifier import DiseaseClassifier, DiseaseInfo, DiseaseType
+from batching import MicroBatcher
+from image_io import ImageSource, load_image
+from prediction_cache import PredictionCache, hash_image_source
+from study_store import Study, StudyStore
+from contour_extraction import ContourExtractor, CONTOUR_ENGINES, extract_tooth_contour, create_tooth_polygon
+from annotation_renderer import render_annotations
+from inference_engines import load_engine, hash_weights
+from tiling import plan_tiles, shift_tile_detections, merge_detections
+from metrics import span
+from admission import AnalysisCancelled
+from latency_budget import LatencyBudget, expected_stage_ms
+from insights import (InsightsService, GeminiBackend, StubBackend, INSIGHT_BACKENDS,
+                      findings_signature)
+from artifact_writer import ArtifactWriter
+from blob_store import BlobStore, LocalBlobBackend
+from results_index import ResultsIndex
+from aggregate_stats import AggregateStats
+from detection_set import DetectionSet, URGENCY_LEVELS
 
 # --- Configuration ---
 load_dotenv()
@@ -26,30 +40,121 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")  # Load from .env file
 MODEL_PATH = "runs/train/multi_param_dental/weights/best.pt"  # Updated model path
 
 OUTPUT_DIR = str(Path(__file__).parent.parent / "results_pridects")
-CSV_REPORT_PATH = os.path.join(OUTPUT_DIR, "report.csv")
-JSON_REPORT_PATH = os.path.join(OUTPUT_DIR, "report.json")
+
+# Which detections get a polygon: only the drawn (diseased) teeth, or all of them
+POLYGON_MODES = ('drawn', 'all')
+RESULTS_DB_PATH = os.path.join(OUTPUT_DIR, "results.db")
+AGGREGATE_STATS_PATH = os.path.join(OUTPUT_DIR, "aggregate_stats.json")
 
 
 class ToothDiseasePredictor:
     """Multi-parameter tooth disease prediction system"""
     
-    def __init__(self, model_path: str = None, gemini_api_key: str = None):
-        """Initialize predictor with model and optional Gemini AI"""
+    def __init__(self, model_path: str = None, gemini_api_key: str = None,
+                 batching: bool = False, max_batch_size: int = 8, batch_window_ms: float = 10.0,
+                 cache: PredictionCache = None, raw_conf_floor: float = 0.05,
+                 study_store: StudyStore = None, contour_workers: int = None,
+                 contour_timeout: float = 2.0, contour_executor: str = 'thread',
+                 contour_engine: str = 'grabcut', grabcut_max_side: int = None, inference_engine: str = 'torch',
+                 preview_model_path: str = None, tile_threshold_px: int = 3_000_000,
+                 tile_size: int = 1280, tile_overlap: int = 256, insights_backend: str = 'gemini',
+                 insights_cache_size: int = 512, insights_ttl: float = 24 * 3600,
+                 insights_stub_latency_ms: float = 0.0, artifact_writer: ArtifactWriter = None,
+                 results_index: ResultsIndex = None, aggregate_stats: AggregateStats = None):
+        """
+        Initialize predictor with model and optional Gemini AI
+
+        Args:
+            model_path: Path to trained YOLO weights
+            gemini_api_key: Optional Gemini API key for AI insights
+            batching: Group concurrent predict() calls into batched forward passes
+            max_batch_size: Maximum number of images per batched forward pass
+            batch_window_ms: How long a request waits for others to join its batch
+            cache: Optional prediction cache for repeated uploads of the same image
+            raw_conf_floor: Threshold of the single model pass; results for any higher
+                threshold are produced by re-filtering its detections
+            study_store: Store of recent studies used for re-filtering (default: in-memory LRU)
+            contour_workers: Parallel contour extraction workers (default: number of CPU cores)
+            contour_timeout: Seconds per tooth before falling back to the box polygon
+            contour_executor: 'thread' or 'process' pool for contour extraction
+            contour_engine: Default contour engine ('grabcut', 'grabcut_fast' or 'threshold')
+            grabcut_max_side: Optional ROI side cap for 'grabcut' (None = full resolution)
+            inference_engine: Model runtime ('torch', 'onnx', 'openvino' or 'openvino_int8')
+            preview_model_path: Optional distilled student weights (train.py --distill) used for
+                fast previews, loaded if the file exists
+            tile_threshold_px: Images with more pixels are analysed in overlapping tiles (0 = never)
+            tile_size: Tile edge length in pixels for tiled inference
+            tile_overlap: Overlap between neighbouring tiles in pixels
+            insights_backend: 'gemini' (needs the API key), 'stub' (offline) or 'off'
+            insights_cache_size: AI insight texts cached by finding signature (LRU)
+            insights_ttl: Seconds a cached insight text stays valid
+            insights_stub_latency_ms: Simulated round-trip of the stub backend
+            artifact_writer: Background writer for annotated images and reports
+                (default: a new ArtifactWriter storing into a blob store in the results folder)
+            results_index: SQLite index the saved analyses are added to
+                (default: results.db in the results folder)
+            aggregate_stats: Population counters updated by every new analysis
+                (default: snapshot aggregate_stats.json in the results folder)
+        """
         # Calculate default model path if not provided
         if model_path is None:
             model_path = str(Path(__file__).parent.parent / "model" / "best.pt")
         
         self.model_path = model_path
+        self.inference_engine = inference_engine
         self.model = None
+        self.model_version = None
+        self.preview_model = None
+        self.preview_model_version = None
+        self.cache = cache
+        self.raw_conf_floor = raw_conf_floor
+        self.tile_threshold_px = tile_threshold_px
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.studies = study_store if study_store is not None else StudyStore()
+        self.writer = artifact_writer if artifact_writer is not None else \
+            ArtifactWriter(store=BlobStore(LocalBlobBackend(OUTPUT_DIR), OUTPUT_DIR))
+        self.index = results_index if results_index is not None else ResultsIndex(RESULTS_DB_PATH)
+        self.stats = aggregate_stats if aggregate_stats is not None else \
+            AggregateStats(AGGREGATE_STATS_PATH, writer=self.writer)
+        if contour_engine not in CONTOUR_ENGINES:
+            raise ValueError(f"contour_engine must be one of {tuple(CONTOUR_ENGINES)}")
+        if insights_backend not in INSIGHT_BACKENDS:
+            raise ValueError(f"insights_backend must be one of {INSIGHT_BACKENDS}")
+        self.contour_engine = contour_engine
+        self.contour_extractor = ContourExtractor(
+            workers=contour_workers, timeout=contour_timeout, executor=contour_executor,
+            grabcut_max_side=grabcut_max_side
+        )
         self.gemini_model = None
+        self.insights = None
+        self.batcher = None
         
         # Load YOLO model
         self.load_model()
+        if preview_model_path and os.path.exists(preview_model_path):
+            self.load_preview_model(preview_model_path)
+        
+        # Batch concurrent requests in front of the model (useful under server load)
+        if batching:
+            self.batcher = MicroBatcher(self.model, max_batch_size=max_batch_size, max_wait_ms=batch_window_ms)
         
         # Initialize Gemini if API key provided
         if gemini_api_key:
             self.initialize_gemini(gemini_api_key)
         
+        # AI insights are generated in the background, cached by finding signature
+        insights_source = None
+        if insights_backend == 'gemini' and self.gemini_model is not None:
+            insights_source = GeminiBackend(self.gemini_model)
+        elif insights_backend == 'stub':
+            insights_source = StubBackend(insights_stub_latency_ms)
+        if insights_source is not None:
+            self.insights = InsightsService(
+                insights_source, max_entries=insights_cache_size, ttl_seconds=insights_ttl
+            )
+            print(f"✅ AI insights: {insights_source.name} backend (asynchronous)")
+        
         # Create output directory
         os.makedirs(OUTPUT_DIR, exist_ok=True)
     
@@ -59,14 +164,36 @@ class ToothDiseasePredictor:
             if not os.path.exists(self.model_path):
                 raise FileNotFoundError(f"Model not found at {self.model_path}")
             
-            self.model = YOLO(self.model_path)
-            print(f"✅ Model loaded from: {self.model_path}")
+            weights_hash = self._hash_file(self.model_path)
+            self.model, loaded_path = load_engine(self.model_path, self.inference_engine, weights_hash)
+            # Exported runtimes may differ slightly from PyTorch, so they get their own cache namespace
+            self.model_version = weights_hash if self.inference_engine == 'torch' else \
+                f"{weights_hash}-{self.inference_engine}"
+            print(f"✅ Model loaded from: {loaded_path} ({self.inference_engine})")
             print(f"   Classes: {len(self.model.names)} - {list(self.model.names.values())}")
         except Exception as e:
             print(f"❌ Failed to load model: {e}")
             print("   Please train the model first using: python train.py")
             raise
     
+    def load_preview_model(self, preview_model_path: str):
+        """Load the distilled student model used for fast previews"""
+        try:
+            preview_model, _ = load_engine(preview_model_path, 'torch', '')
+            if preview_model.names != self.model.names:
+                print("⚠️ Preview model classes differ from the main model - preview disabled")
+                return
+            self.preview_model = preview_model
+            self.preview_model_version = f"{self._hash_file(preview_model_path)}-preview"
+            print(f"✅ Preview model loaded from: {preview_model_path}")
+        except Exception as e:
+            print(f"⚠️ Preview model loading failed: {e}")
+    
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """Short content hash used to version cached predictions"""
+        return hash_weights(path)
+    
     def initialize_gemini(self, api_key: str):
         """Initialize Gemini AI for report generation"""
         try:
@@ -77,75 +204,379 @@ class ToothDiseasePredictor:
             print(f"⚠️ Gemini AI initialization failed: {e}")
             self.gemini_model = None
     
-    def predict(self, image_path: str, conf_threshold: float = 0.25) -> Dict:
+    def predict(self, image: ImageSource, conf_threshold: float = 0.25, image_name: str = None,
+                include_polygons: str = 'drawn', contour_engine: str = None, preview: bool = False,
+                tiling: Optional[bool] = None, is_cancelled: Callable[[], bool] = None,
+                budget: LatencyBudget = None) -> Dict:
         """
         Predict tooth diseases in X-ray image
         
         Args:
-            image_path: Path to X-ray image
+            image: Path to X-ray image, raw encoded image bytes or a decoded BGR array
             conf_threshold: Confidence threshold for detections
+            image_name: Display name of the image (defaults to the path / upload name)
+            include_polygons: 'drawn' extracts contours only for teeth drawn on the
+                annotated image, 'all' for every detection
+            contour_engine: Contour engine for this request (default: the predictor's engine)
+            preview: Use the distilled preview model instead of the full model
+            tiling: Force tiled inference on/off (default: automatic above tile_threshold_px)
+            is_cancelled: Optional callable checked before the expensive stages; when it
+                returns True the analysis stops with AnalysisCancelled (client went away)
+            budget: Optional latency budget; optional stages are dropped to meet it and
+                listed under 'degradations'
             
         Returns:
             Dictionary with all prediction results and summary statistics
         """
-        print(f"\n🔍 Analyzing: {os.path.basename(image_path)}")
-        
-        # Run YOLO model
-        results = self.model(image_path, conf=conf_threshold, verbose=False)
-        
-        # Process detections
-        detections = self.process_detections(results, image_path)
-        
-        # Generate unique ID
-        unique_id = str(uuid.uuid4())
+        started = time.perf_counter()
+        if include_polygons not in POLYGON_MODES:
+            raise ValueError(f"include_polygons must be one of {POLYGON_MODES}")
+        contour_engine = self._check_contour_engine(contour_engine)
+        if preview and self.preview_model is None:
+            raise ValueError("Preview model is not available (train it with python train.py --distill)")
+        model_version = self.preview_model_version if preview else self.model_version
+        
+        # Serve repeated uploads of the same image from the cache
+        timings = {}
+        cache_key = None
+        if self.cache is not None:
+            cache_key = PredictionCache.make_key(
+                hash_image_source(image), model_version, conf_threshold, include_polygons, contour_engine,
+                f"tiling:{tiling}:{self.tile_threshold_px}:{self.tile_size}:{self.tile_overlap}"
+            )
+            with span('cache_lookup', timings):
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached_results, image_bytes = cached
+                self._restore_cached_image(cached_results['output_image'], image_bytes)
+                cached_results['refilter_available'] = self._restore_cached_study(
+                    cached_results, cached_results.pop('raw_study', None), image
+                )
+                cached_results['cache_hit'] = True
+                self._refresh_cached_insights(cached_results)
+                print(f"\n⚡ Cache hit: {cached_results['unique_id']}")
+                return cached_results
+        
+        # Decode once - the same array feeds the model, contours and annotator
+        with span('decode', timings):
+            cv_image, default_name = load_image(image)
+        if image_name is None:
+            image_name = image if isinstance(image, str) else default_name
+        
+        print(f"\n🔍 Analyzing: {os.path.basename(image_name)}")
+        
+        # Run YOLO model once at a low threshold; any higher threshold is a re-filter
+        raw_conf_floor = min(conf_threshold, self.raw_conf_floor)
+        # Large panoramics are analysed in overlapping tiles so small teeth survive the 640 px resize
+        if tiling is None:
+            tiling = self.tile_threshold_px > 0 and cv_image.shape[0] * cv_image.shape[1] > self.tile_threshold_px
+        self._check_cancelled(is_cancelled, 'inference')
+        with span('inference', timings):
+            if tiling:
+                raw_detections, tiles = self.detect_tiled(cv_image, raw_conf_floor, preview)
+            else:
+                raw_detections = self.extract_raw_detections(self.run_inference(cv_image, raw_conf_floor, preview))
+                tiles = 0
+        
+        self._check_cancelled(is_cancelled, 'contour extraction and rendering')
+        
+        # Generate unique ID and keep the raw detections for later re-filtering
+        study = Study(
+            unique_id=str(uuid.uuid4()),
+            image_name=image_name,
+            image=cv_image,
+            raw_detections=raw_detections,
+            raw_conf_floor=raw_conf_floor,
+            model='preview' if preview else 'full',
+            tiles=tiles
+        )
+        self.studies.put(study)
+        
+        prediction_results = self.build_results(
+            study, conf_threshold, include_polygons, contour_engine, timings, budget
+        )
+        output_image = prediction_results['output_image']
+        
+        # Save reports (queued for the background writer, the snapshot is what gets saved)
+        saved_results = dict(prediction_results)
+        with span('save_reports'):
+            self.save_reports(saved_results)
+        
+        # Population statistics (cache hits and re-filters are not new analyses)
+        self.stats.record(prediction_results, (time.perf_counter() - started) * 1000)
+        
+        # Degraded results are not cached - the next upload gets the full analysis.
+        # The cache entry is stored by the writer once the annotated image is on disk
+        if cache_key is not None and not prediction_results['degradations']:
+            self.writer.defer(lambda: self._store_cached_prediction(cache_key, saved_results, output_image, study))
+            prediction_results['cache_hit'] = False
+        
+        # AI insights follow in the background and are attached to the saved report
+        self._request_insights(study, prediction_results, saved_results)
         
-        # Create annotated image with non-overlapping labels
-        output_image = self.create_annotated_image(image_path, detections, unique_id)
+        return prediction_results
+    
+    def refilter(self, unique_id: str, conf_threshold: float, include_polygons: str = 'drawn',
+                 contour_engine: str = None, budget: LatencyBudget = None) -> Optional[Dict]:
+        """
+        Rebuild the results of a previous analysis for another confidence threshold
+        without running the model again
         
-        # Generate report
-        report = self.generate_report(detections, image_path)
+        Returns:
+            Results dictionary, or None if the study is no longer held in memory
+        """
+        if include_polygons not in POLYGON_MODES:
+            raise ValueError(f"include_polygons must be one of {POLYGON_MODES}")
+        contour_engine = self._check_contour_engine(contour_engine)
+        study = self.studies.get(unique_id)
+        if study is None:
+            return None
+        results = self.build_results(
+            study, max(conf_threshold, study.raw_conf_floor), include_polygons, contour_engine, budget=budget
+        )
+        self._request_insights(study, results)
+        return results
+    
+    def build_results(self, study: Study, conf_threshold: float, include_polygons: str = 'drawn',
+                      contour_engine: str = None, timings: Dict[str, float] = None,
+                      budget: LatencyBudget = None) -> Dict:
+        """
+        Filter, classify, render and summarize the raw detections of a study
+        
+        timings holds the ms of stages that already ran (decode, inference); the
+        stages run here are added and the result is returned as 'timings'. With a
+        budget, optional stages are dropped when they would miss the deadline;
+        degraded contours and renders are not kept for reuse. AI insights are only
+        included if already cached ('ai_insights' status 'ready'), otherwise the
+        caller requests them in the background ('pending').
+        """
+        contour_engine = contour_engine or self.contour_engine
+        timings = dict(timings or {})
+        with study.lock:
+            polygon_cache = study.polygons.setdefault(contour_engine, {})
+            if budget is not None:
+                budget.plan({
+                    'contours': 0.0 if polygon_cache else expected_stage_ms('contours'),
+                    'render': expected_stage_ms('render'),
+                    'save_reports': expected_stage_ms('save_reports'),
+                })
+            approximate = budget is not None and budget.degraded('approximate_contours')
+            low_quality = budget is not None and budget.degraded('low_quality_annotation')
+            
+            # Process detections (polygons already extracted by this engine are reused)
+            with span('detections', timings):
+                detections = self.process_detections(
+                    study.raw_detections, study.image, conf_threshold,
+                    polygon_cache, include_polygons, contour_engine, approximate
+                )
+            
+            # Create annotated image with non-overlapping labels - only if the drawn set changed
+            rendered_ids = (contour_engine,) + tuple(sorted(
+                detections.detection_ids[detections.rendered()].tolist()
+            ))
+            degraded_render = approximate or low_quality
+            output_image = None if degraded_render else study.renders.get(rendered_ids)
+            if output_image is None or not self.writer.exists(output_image):
+                image_id = study.unique_id if not study.renders else \
+                    f"{study.unique_id}_conf{int(round(conf_threshold * 1000)):03d}"
+                if study.renders and contour_engine != self.contour_engine:
+                    image_id += f"_{contour_engine}"
+                if degraded_render:
+                    image_id += "_degraded"
+                with span('render', timings):
+                    output_image = self.create_annotated_image(
+                        study.image, detections, image_id, timings, low_quality
+                    )
+                if not degraded_render:
+                    study.renders[rendered_ids] = output_image
+            
+            # Generate report (AI insights only if already cached for these findings)
+            # Nothing to give insights on without findings (the report has no insights section then)
+            signature = findings_signature(detections.findings()) if self.insights and len(detections) else None
+            insights = self.insights.lookup(signature) if signature else None
+            reported_ids = tuple(sorted(detections.detection_ids.tolist()))
+            report = study.reports.get(reported_ids)
+            if report is None:
+                with span('report', timings):
+                    report = self.generate_report(detections, study.image_name, insights)
+                study.reports[reported_ids] = report
         
         # Calculate summary statistics
-        disease_distribution = {}
-        severity_distribution = {}
-        
-        for det in detections:
-            disease = det['disease_type']
-            severity = det['severity']
-            
-            disease_distribution[disease] = disease_distribution.get(disease, 0) + 1
-            severity_distribution[severity] = severity_distribution.get(severity, 0) + 1
+        disease_distribution = detections.disease_counts()
+        severity_distribution = detections.severity_counts()
+        diseased_teeth = int(detections.rendered().sum())
         
-        # Prepare complete results
-        prediction_results = {
-            'unique_id': unique_id,
-            'input_image': image_path,
+        # Prepare complete results (the only place detections become dicts)
+        return {
+            'unique_id': study.unique_id,
+            'input_image': study.image_name,
             'output_image': output_image,
+            'confidence_threshold': conf_threshold,
+            'contour_engine': contour_engine,
+            'model': study.model,
+            'tiles': study.tiles,
             'total_detections': len(detections),
-            'detections': detections,
+            'detections': detections.to_dicts(),
             'report': report,
+            'ai_insights': {
+                'status': 'unavailable' if signature is None else 'ready' if insights else 'pending',
+                'signature': signature,
+                'text': insights
+            },
+            'timings': {stage: round(ms, 2) for stage, ms in timings.items()},
+            'latency_budget_ms': budget.budget_ms if budget is not None else None,
+            'degradations': list(budget.degradations) if budget is not None else [],
             'summary': {
                 'total_teeth': len(detections),
                 'disease_distribution': disease_distribution,
                 'severity_distribution': severity_distribution,
-                'healthy_teeth': disease_distribution.get('Healthy', 0),
-                'diseased_teeth': sum(v for k, v in disease_distribution.items() if k != 'Healthy')
+                'healthy_teeth': len(detections) - diseased_teeth,
+                'diseased_teeth': diseased_teeth
             }
         }
+    
+    def _check_contour_engine(self, contour_engine: Optional[str]) -> str:
+        """Resolve the contour engine of a request (None -> predictor default)"""
+        if contour_engine is None:
+            return self.contour_engine
+        if contour_engine not in CONTOUR_ENGINES:
+            raise ValueError(f"contour_engine must be one of {tuple(CONTOUR_ENGINES)}")
+        return contour_engine
+    
+    @staticmethod
+    def _check_cancelled(is_cancelled: Optional[Callable[[], bool]], next_stage: str):
+        """Stop an analysis whose client has disconnected before starting the next stage"""
+        if is_cancelled is not None and is_cancelled():
+            raise AnalysisCancelled(f"Client disconnected - analysis cancelled before {next_stage}")
+    
+    def _request_insights(self, study: Study, results: Dict, saved_results: Dict = None):
+        """
+        Generate missing AI insights in the background and attach them to the stored
+        report (and to the saved report files when saved_results is given)
+        """
+        if results['ai_insights']['status'] != 'pending' or not results['detections']:
+            return
+        detections = results['detections']
+        reported_ids = tuple(sorted(det['detection_id'] for det in detections))
+        
+        def attach(text: str):
+            report = self.generate_report(DetectionSet.from_dicts(detections), study.image_name, text)
+            with study.lock:
+                study.reports[reported_ids] = report
+            if saved_results is not None:
+                self.update_saved_report(saved_results, report, text)
+        
+        self.insights.request(results['ai_insights']['signature'], detections, attach)
+    
+    def _refresh_cached_insights(self, results: Dict):
+        """Attach insights that became available since a prediction was cached"""
+        ai_insights = results.get('ai_insights')
+        if self.insights is None or not ai_insights or ai_insights['status'] != 'pending':
+            return
+        if not results['detections']:
+            # Cached before empty analyses were excluded from insights
+            results['ai_insights'] = dict(ai_insights, status='unavailable', signature=None)
+            return
+        text = self.insights.lookup(ai_insights['signature'])
+        if text is None:
+            self.insights.request(ai_insights['signature'], results['detections'])
+            return
+        results['report'] = self.generate_report(
+            DetectionSet.from_dicts(results['detections']), results['input_image'], text
+        )
+        results['ai_insights'] = dict(ai_insights, status='ready', text=text)
+    
+    def _restore_cached_image(self, output_path: str, image_bytes: bytes):
+        """Re-create a cached annotated image if it was removed from the results folder"""
+        if not self.writer.exists(output_path):
+            self.writer.write_bytes(output_path, image_bytes)
+    
+    def _restore_cached_study(self, results: Dict, raw_study: Optional[Dict], image: ImageSource) -> bool:
+        """
+        Put the study of a cached prediction back into the study store (e.g. after a
+        restart or an eviction) so it can be re-filtered
+
+        Returns:
+            Whether the study can be re-filtered (False for entries cached without raw detections)
+        """
+        if self.studies.get(results['unique_id']) is not None:
+            return True
+        if raw_study is None:
+            return False
+        with span('decode'):
+            cv_image, _ = load_image(image)
+        study = Study(
+            unique_id=results['unique_id'],
+            image_name=results['input_image'],
+            image=cv_image,
+            raw_detections=raw_study['raw_detections'],
+            raw_conf_floor=raw_study['raw_conf_floor'],
+            model=results['model'],
+            tiles=results['tiles']
+        )
+        # The cached render keeps its name; re-filters that draw other teeth get their own
+        detections = DetectionSet.from_dicts(results['detections'])
+        rendered_ids = (results['contour_engine'],) + tuple(sorted(
+            detections.detection_ids[detections.rendered()].tolist()
+        ))
+        study.renders[rendered_ids] = results['output_image']
+        self.studies.put(study)
+        return True
+    
+    def _store_cached_prediction(self, cache_key: str, results: Dict, output_image: str, study: Study):
+        """
+        Cache a prediction with its annotated image and the raw detections of its
+        study, so a cache hit can be re-filtered (runs on the writer thread)
+        """
+        with span('cache_store'):
+            entry = dict(results, raw_study={
+                'raw_detections': study.raw_detections,
+                'raw_conf_floor': study.raw_conf_floor,
+            })
+            self.cache.put(cache_key, entry, self.writer.read(output_image))
+    
+    def run_inference(self, source, conf_threshold: float, preview: bool = False) -> list:
+        """Run the YOLO model, through the micro-batcher when enabled"""
+        if preview:
+            return self.preview_model(source, conf=conf_threshold, verbose=False)
+        if self.batcher is not None:
+            return [self.batcher.infer(source, conf=conf_threshold, verbose=False)]
+        return self.model(source, conf=conf_threshold, verbose=False)
+    
+    def run_inference_many(self, sources: list, conf_threshold: float, preview: bool = False) -> list:
+        """Run the YOLO model on several images as one batch (one Results per image)"""
+        if preview:
+            return self.preview_model(sources, conf=conf_threshold, batch=len(sources), verbose=False)
+        if self.batcher is not None:
+            return self.batcher.infer_many(sources, conf=conf_threshold, verbose=False)
+        return self.model(sources, conf=conf_threshold, batch=len(sources), verbose=False)
+    
+    def detect_tiled(self, cv_image: np.ndarray, conf_threshold: float, preview: bool = False):
+        """
+        Tiled inference for high-resolution radiographs
         
-        # Save reports
-        self.save_reports(prediction_results)
+        The overlapping tiles and a full-frame pass (for teeth larger than the
+        overlap) run as one batch; their detections are merged with class-aware
+        NMS, keeping one box per tooth number
         
-        return prediction_results
+        Returns:
+            Tuple of (raw detections in image coordinates, number of tiles)
+        """
+        height, width = cv_image.shape[:2]
+        tiles = plan_tiles(width, height, self.tile_size, self.tile_overlap)
+        crops = [cv_image[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles] + [cv_image]
+        results = self.run_inference_many(crops, conf_threshold, preview)
+        
+        parts = [
+            shift_tile_detections(self.extract_raw_detections([result]), tile, width, height)
+            for tile, result in zip(tiles, results)
+        ]
+        parts.append(self.extract_raw_detections([results[-1]]))
+        return merge_detections(parts), len(tiles)
     
-    def process_detections(self, results, image_path: str) -> List[Dict]:
-        """Process YOLO detections and extract segmentation masks or create polygon approximations"""
-        detections = []
-        
-        # Load image for OpenCV processing
-        cv_image = cv2.imread(image_path)
-        if cv_image is None:
-            print(f"⚠️ Could not load image for contour extraction: {image_path}")
+    def extract_raw_detections(self, results) -> Dict[str, list]:
+        """Copy the YOLO outputs (boxes, confidences, classes, mask polygons) into plain lists"""
+        raw = {'boxes': [], 'confidences': [], 'classes': [], 'mask_polygons': []}
         
         for r in results:
             if not r.boxes:
@@ -155,356 +586,158 @@ class ToothDiseasePredictor:
             has_masks = hasattr(r, 'masks') and r.masks is not None
             
             for idx, box in enumerate(r.boxes):
-                # Extract YOLO outputs
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                class_name = self.model.names[cls]
-                
-                # Parse tooth number from class name (assumes format "13", "14", etc.)
-                try:
-                    tooth_number = int(class_name)
-                except:
-                    tooth_number = 0  # Unknown tooth number
-                
-                # Classify disease
-                disease_info = DiseaseClassifier.classify_from_model_output(
-                    class_name=f"tooth_{class_name}",
-                    confidence=conf,
-                    tooth_number=tooth_number
-                )
-                
-                # Get tooth name
-                tooth_name = DiseaseClassifier.get_tooth_name(tooth_number)
-                
-                # Extract or create polygon for segmentation visualization
+                # Extract segmentation mask polygon
                 polygon = None
                 if has_masks:
                     try:
-                        # Extract segmentation mask polygon
                         mask = r.masks.xy[idx]
                         if len(mask) > 0:
                             polygon = [(int(x), int(y)) for x, y in mask]
                     except:
                         pass
                 
-                # If no mask available, use smart contour extraction
-                if polygon is None:
-                    polygon = self._extract_tooth_contour(cv_image, x1, y1, x2, y2)
-                
-                # Assign color based on tooth number for consistent rainbow scheme
-                # Colors from reference: Green, Yellow, Cyan, Purple, Blue, Orange, Pink, Red
-                rainbow_colors = [
-                    '#00FF00', # Green
-                    '#FFFF00', # Yellow
-                    '#00FFFF', # Cyan
-                    '#800080', # Purple
-                    '#0000FF', # Blue
-                    '#FFA500', # Orange
-                    '#FF00FF', # Magenta
-                    '#FF0000', # Red
-                    '#008080', # Teal
-                    '#FFC0CB', # Pink
-                ]
-                color_idx = (tooth_number % len(rainbow_colors))
-                fixed_color = rainbow_colors[color_idx]
-
-                # Compile detection
-                detection = {
-                    "tooth_number": tooth_number,
-                    "tooth_name": tooth_name,
-                    "disease_type": disease_info.disease_type.value,
-                    "severity": disease_info.severity.value,
-                    "affected_area": disease_info.affected_area.value,
-                    "confidence": conf,
-                    "bounding_box": {
-                        "x1": x1, "y1": y1,
-                        "x2": x2, "y2": y2
-                    },
-                    "polygon": polygon,  # Add polygon coordinates
-                    "color": fixed_color, # Use fixed rainbow color
-                    "recommendations": disease_info.recommendations[:3],
-                    "urgency": DiseaseClassifier.get_urgency_level(
-                        disease_info.disease_type, disease_info.severity
-                    )
-                }
-                
-                detections.append(detection)
+                raw['boxes'].append(tuple(map(int, box.xyxy[0])))
+                raw['confidences'].append(float(box.conf[0]))
+                raw['classes'].append(int(box.cls[0]))
+                raw['mask_polygons'].append(polygon)
         
-        # Sort by tooth number
-        detections.sort(key=lambda x: x['tooth_number'])
+        return raw
+    
+    def process_detections(self, raw: Dict[str, list], cv_image: np.ndarray, conf_threshold: float,
+                           polygon_cache: Dict[int, tuple] = None, include_polygons: str = 'drawn',
+                           contour_engine: str = None, approximate_contours: bool = False) -> DetectionSet:
+        """
+        Filter raw detections by confidence, classify them and attach mask or contour polygons
+        
+        Contours are only extracted for detections that will be drawn (diseased teeth),
+        unless include_polygons is 'all'. Each detection gets a polygon_status:
+        'mask' (segmentation model), 'exact' (contour engine), 'approximate' (box-derived
+        fallback) or 'pending' (not extracted, polygon is None)
         
-        return detections
+        approximate_contours skips the contour engine and uses box-derived polygons
+        (not stored in polygon_cache, so a later request still gets exact contours)
+        
+        Returns:
+            DetectionSet sorted by tooth number
+        """
+        contour_engine = contour_engine or self.contour_engine
+        if polygon_cache is None:
+            polygon_cache = {}
+        
+        confidences = np.asarray(raw['confidences'], dtype=np.float64)
+        det_ids = np.flatnonzero(confidences >= conf_threshold).tolist()
+        classes = [raw['classes'][det_id] for det_id in det_ids]
+        diseases, severities, areas, tooth_numbers = [], [], [], []
+        polygons, polygon_status = [], []
+        
+        # Detections whose contour still has to be extracted (filled in parallel below)
+        missing = []
+        
+        for i, (det_id, cls) in enumerate(zip(det_ids, classes)):
+            class_name = self.model.names[cls]
+            
+            # Parse tooth number from class name (assumes format "13", "14", etc.)
+            try:
+                tooth_number = int(class_name)
+            except:
+                tooth_number = 0  # Unknown tooth number
+            
+            # Classify disease
+            disease_info = DiseaseClassifier.classify_from_model_output(
+                class_name=f"tooth_{class_name}",
+                confidence=raw['confidences'][det_id],
+                tooth_number=tooth_number
+            )
+            tooth_numbers.append(tooth_number)
+            diseases.append(disease_info.disease_type)
+            severities.append(disease_info.severity)
+            areas.append(disease_info.affected_area)
+            
+            # Use the segmentation mask if the model has one, else smart contour extraction
+            polygon, status = polygon_cache.get(det_id, (None, 'pending'))
+            if polygon is None and raw['mask_polygons'][det_id] is not None:
+                polygon, status = raw['mask_polygons'][det_id], 'mask'
+                polygon_cache[det_id] = (polygon, status)
+            polygons.append(polygon)
+            polygon_status.append(status)
+            
+            # Contours are computed on demand: for drawn teeth, or all if requested
+            if polygon is None and (include_polygons == 'all' or disease_info.disease_type != DiseaseType.HEALTHY):
+                missing.append(i)
+        
+        if missing and approximate_contours:
+            for i in missing:
+                polygons[i] = self._create_tooth_polygon(*raw['boxes'][det_ids[i]])
+                polygon_status[i] = 'approximate'
+            missing = []
+        
+        # Run the contour engine for all teeth without a polygon on the worker pool
+        if missing:
+            boxes = [raw['boxes'][det_ids[i]] for i in missing]
+            with span('contours'):
+                extracted = self.contour_extractor.extract_many(cv_image, boxes, contour_engine)
+            for i, (polygon, exact) in zip(missing, extracted):
+                polygons[i] = polygon
+                polygon_status[i] = 'exact' if exact else 'approximate'
+                polygon_cache[det_ids[i]] = (polygon, polygon_status[i])
+        
+        detections = DetectionSet.build(
+            det_ids, [raw['boxes'][det_id] for det_id in det_ids], confidences[det_ids], classes,
+            tooth_numbers, diseases, severities, areas, polygons, polygon_status
+        )
+        
+        # Sort by tooth number
+        return detections.sort_by_tooth()
     
     def _extract_tooth_contour(self, image, x1, y1, x2, y2) -> List[tuple]:
         """
         Extract precise tooth contour using GrabCut algorithm for organic shapes
         Returns a polygon list of (x, y) tuples
         """
-        if image is None:
-            return self._create_tooth_polygon(x1, y1, x2, y2)
-
-        try:
-            # 1. Crop the bounding box area with padding
-            h, w = image.shape[:2]
-            pad = 5
-            x1_pad = max(0, x1 - pad)
-            y1_pad = max(0, y1 - pad)
-            x2_pad = min(w, x2 + pad)
-            y2_pad = min(h, y2 + pad)
-            
-            roi = image[y1_pad:y2_pad, x1_pad:x2_pad]
-            if roi.size == 0:
-                return self._create_tooth_polygon(x1, y1, x2, y2)
-
-            # 2. Initialize GrabCut mask and models
-            mask = np.zeros(roi.shape[:2], np.uint8)
-            bgdModel = np.zeros((1, 65), np.float64)
-            fgdModel = np.zeros((1, 65), np.float64)
-
-            # 3. Define rectangle for GrabCut (relative to ROI)
-            # We assume the tooth is centered in the box, so we take a slightly smaller rect
-            roi_h, roi_w = roi.shape[:2]
-            rect = (pad, pad, roi_w - 2*pad, roi_h - 2*pad)
-            
-            # 4. Run GrabCut
-            # iterCount=5 gives good balance of speed/quality
-            cv2.grabCut(roi, mask, rect, bgdModel, fgdModel, 5, cv2.GC_INIT_WITH_RECT)
-
-            # 5. Create binary mask (pixels 1 and 3 are foreground/probable foreground)
-            mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
-
-            # 6. Smooth the mask
-            # Apply morphological closing to fill small holes
-            kernel = np.ones((5, 5), np.uint8)
-            mask2 = cv2.morphologyEx(mask2, cv2.MORPH_CLOSE, kernel)
-            # Apply Gaussian blur to smooth edges
-            mask2 = cv2.GaussianBlur(mask2 * 255, (9, 9), 0)
-            _, mask2 = cv2.threshold(mask2, 127, 255, cv2.THRESH_BINARY)
-
-            # 7. Find contours
-            contours, _ = cv2.findContours(mask2, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            if not contours:
-                return self._create_tooth_polygon(x1, y1, x2, y2)
-
-            # 8. Find the largest contour
-            largest_contour = max(contours, key=cv2.contourArea)
-
-            # 9. Smooth the contour (approxPolyDP)
-            # Use smaller epsilon for more organic shape (0.002 instead of 0.005)
-            epsilon = 0.002 * cv2.arcLength(largest_contour, True)
-            approx_contour = cv2.approxPolyDP(largest_contour, epsilon, True)
-
-            # 10. Convert to global coordinates
-            polygon = []
-            for point in approx_contour:
-                px, py = point[0]
-                polygon.append((int(x1_pad + px), int(y1_pad + py)))
-
-            # Ensure polygon is valid
-            if len(polygon) < 3:
-                return self._create_tooth_polygon(x1, y1, x2, y2)
-
-            return polygon
-
-        except Exception as e:
-            print(f"Error extracting contour: {e}")
-            return self._create_tooth_polygon(x1, y1, x2, y2)
+        return extract_tooth_contour(image, x1, y1, x2, y2)
 
     def _create_tooth_polygon(self, x1: int, y1: int, x2: int, y2: int) -> List[tuple]:
         """Create a tooth-shaped polygon from bounding box coordinates"""
-        # Calculate dimensions
-        width = x2 - x1
-        height = y2 - y1
-        
-        # Create a tooth-like polygon (crown + root shape)
-        crown_height = int(height * 0.6)  # Crown is top 60%
-        
-        polygon = [
-            # Crown top (rounded)
-            (x1 + width // 4, y1),
-            (x1 + 3 * width // 4, y1),
-            (x2, y1 + crown_height // 3),
-            (x2, y1 + crown_height),
-            # Root (tapers down)
-            (x1 + 3 * width // 4, y1 + height),
-            (x1 + width // 4, y1 + height),
-            (x1, y1 + crown_height),
-            (x1, y1 + crown_height // 3),
-        ]
-        
-        return polygon
+        return create_tooth_polygon(x1, y1, x2, y2)
     
-    def create_annotated_image(self, image_path: str, detections: List[Dict], unique_id: str) -> str:
-        """Create image with color-coded polygon segmentation masks and non-overlapping labels"""
-        import random
-        
-        # Load image
-        original_image = Image.open(image_path)
-        annotated_image = original_image.copy()
-        draw = ImageDraw.Draw(annotated_image)
-        
-        # Load font
-        try:
-            font_large = ImageFont.truetype("arial.ttf", 20)
-            font_small = ImageFont.truetype("arial.ttf", 16)
-        except IOError:
-            font_large = ImageFont.load_default()
-            font_small = ImageFont.load_default()
-        
-        
-        # Track label positions to avoid overlaps
-        used_label_positions = []
+    def create_annotated_image(self, cv_image: np.ndarray, detections: DetectionSet, unique_id: str,
+                               timings: Dict[str, float] = None, low_quality: bool = False) -> str:
+        """
+        Create image with color-coded polygon segmentation masks and non-overlapping labels
         
+        JPEG encoding and saving happen on the artifact writer; the returned path can
+        be waited for with writer.wait_for(). low_quality (latency budget) draws
+        outlines and labels without the blended fills and saves at a lower JPEG quality
+        """
         # Filter: Only show diseased teeth (skip healthy ones)
-        diseased_detections = [
-            (idx, det) for idx, det in enumerate(detections) 
-            if det['disease_type'].lower() != 'healthy'
-        ]
-        
-        # Create a semi-transparent overlay for bright colored fills
-        overlay = Image.new('RGBA', annotated_image.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        
-        # Draw each diseased tooth detection
-        for idx, detection in diseased_detections:
-            bbox = detection['bounding_box']
-            x1, y1, x2, y2 = bbox['x1'], bbox['y1'], bbox['x2'], bbox['y2']
-            polygon = detection.get('polygon', [])
-            color_hex = detection.get('color', '#FFFFFF') # Use the fixed color assigned earlier
-            
-            # Convert hex color to RGB
-            color_rgb = tuple(int(color_hex.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-            
-            # Draw filled polygon with semi-transparency (bright colors)
-            if polygon and len(polygon) >= 3:
-                # Create semi-transparent fill color (50% opacity for brightness)
-                fill_color = color_rgb + (128,)  # 128 = 50% of 255
-                overlay_draw.polygon(polygon, fill=fill_color)
-                
-                # Draw thin colored outline for definition
-                draw.polygon(polygon, outline=color_hex, width=2)
-            
-            # Prepare label texts
-            disease_text = detection['disease_type']
-            tooth_text = f"#{detection['tooth_number']}"
-            conf_text = f"{detection['confidence']:.0%}"
-            
-            # Combine into single line for space efficiency
-            label_text = f"{disease_text} {tooth_text} ({conf_text})"
-            
-            # Calculate text size
-            text_bbox = draw.textbbox((0, 0), label_text, font=font_small)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            
-            # Smart label positioning to avoid overlaps
-            label_y = y1 - text_height - 8  # Start above the box
-            label_x = x1
-            
-            # Check for overlap with existing labels and adjust
-            max_attempts = 10
-            attempt = 0
-            while attempt < max_attempts:
-                overlap = False
-                for used_pos in used_label_positions:
-                    used_x, used_y, used_w, used_h = used_pos
-                    # Check if labels overlap
-                    if not (label_x + text_width < used_x or 
-                           label_x > used_x + used_w or
-                           label_y + text_height < used_y or 
-                           label_y > used_y + used_h):
-                        overlap = True
-                        break
-                
-                if not overlap:
-                    break
-                
-                # Try different positions
-                if attempt == 0:
-                    label_y = y2 + 5  # Below the box
-                elif attempt == 1:
-                    label_x = x2 - text_width  # Right-aligned above
-                elif attempt == 2:
-                    label_y = y1 + (y2 - y1) // 2  # Middle of box
-                    label_x = x2 + 5  # Right side
-                elif attempt == 3:
-                    label_x = x1 - text_width - 5  # Left side
-                else:
-                    # Random offset
-                    label_y += random.randint(-20, 20)
-                    label_x += random.randint(-10, 10)
-                
-                # Keep in bounds
-                label_x = max(0, min(label_x, original_image.width - text_width))
-                label_y = max(0, min(label_y, original_image.height - text_height))
-                
-                attempt += 1
-            
-            # Record this label position
-            used_label_positions.append((label_x, label_y, text_width, text_height))
-            
-            # Draw label background (semi-transparent effect with padding)
-            padding = 4
-            bg_bbox = [
-                label_x - padding,
-                label_y - padding,
-                label_x + text_width + padding,
-                label_y + text_height + padding
-            ]
-            
-            # Draw black background for contrast
-            draw.rectangle(bg_bbox, fill="black")
-            
-            # Draw colored border around label
-            draw.rectangle(bg_bbox, outline=color_hex, width=2)
-            
-            # Draw white text
-            draw.text((label_x, label_y), label_text, fill="white", font=font_small)
+        diseased_detections = detections.select(detections.rendered())
         
-        # Composite the overlay with filled polygons onto the original image
-        annotated_image = annotated_image.convert('RGBA')
-        annotated_image = Image.alpha_composite(annotated_image, overlay)
-        annotated_image = annotated_image.convert('RGB')
+        annotated_image = render_annotations(cv_image, diseased_detections.to_dicts(), timings,
+                                             fills=not low_quality)
         
-        # Save annotated image
+        # Save annotated image (encoded in the background)
         output_path = os.path.join(OUTPUT_DIR, f"{unique_id}.jpg")
-        annotated_image.save(output_path, quality=95)
-        print(f"✅ Annotated image saved: {output_path}")
+        self.writer.write_jpeg(output_path, annotated_image, 70 if low_quality else 95)
+        print(f"✅ Annotated image queued: {output_path}")
         
         return output_path
     
-    def create_summary(self, detections: List[Dict]) -> Dict:
+    def create_summary(self, detections: DetectionSet) -> Dict:
         """Create statistical summary of detections"""
-        if not detections:
+        if not len(detections):
             return {"message": "No teeth detected"}
         
-        # Count disease types
-        disease_counts = {}
-        severity_counts = {}
-        urgency_counts = {}
-        
-        for det in detections:
-            disease = det['disease_type']
-            severity = det['severity']
-            urgency = det['urgency'].split(' - ')[0]  # Extract urgency level
-            
-            disease_counts[disease] = disease_counts.get(disease, 0) + 1
-            severity_counts[severity] = severity_counts.get(severity, 0) + 1
-            urgency_counts[urgency] = urgency_counts.get(urgency, 0) + 1
-        
         return {
             "total_teeth": len(detections),
-            "disease_distribution": disease_counts,
-            "severity_distribution": severity_counts,
-            "urgency_distribution": urgency_counts,
-            "tooth_numbers": [d['tooth_number'] for d in detections]
+            "disease_distribution": detections.disease_counts(),
+            "severity_distribution": detections.severity_counts(),
+            "urgency_distribution": detections.urgency_counts(),
+            "tooth_numbers": detections.tooth_numbers.tolist()
         }
     
-    def generate_report(self, detections: List[Dict], image_path: str) -> str:
-        """Generate comprehensive text report"""
-        if not detections:
+    def generate_report(self, detections: DetectionSet, image_path: str, ai_insights: str = None) -> str:
+        """Generate comprehensive text report (with the AI insights section if given)"""
+        if not len(detections):
             return "No dental abnormalities detected in the X-ray image."
         
         # Build detailed report
@@ -516,8 +749,9 @@ class ToothDiseasePredictor:
         report_lines.append(f"Total Teeth Detected: {len(detections)}\n")
         
         # Group by urgency
-        urgent = [d for d in detections if "URGENT" in d['urgency'] or "HIGH" in d['urgency']]
-        non_urgent = [d for d in detections if d not in urgent]
+        is_urgent = detections.urgency_codes() <= URGENCY_LEVELS.index('HIGH')
+        urgent = detections.select(is_urgent).to_dicts(polygons=False)
+        non_urgent = detections.select(~is_urgent).to_dicts(polygons=False)
         
         if urgent:
             report_lines.append("\n⚠️  URGENT/HIGH PRIORITY FINDINGS:")
@@ -542,10 +776,9 @@ class ToothDiseasePredictor:
                 report_lines.append(f"   Confidence: {det['confidence']:.2%}")
         
         # Add AI-generated insights if available
-        if self.gemini_model:
+        if ai_insights:
             report_lines.append("\n\n💡 AI-GENERATED INSIGHTS:")
             report_lines.append("-" * 80)
-            ai_insights = self.get_ai_insights(detections)
             report_lines.append(ai_insights)
         
         report_lines.append("\n" + "=" * 80)
@@ -555,70 +788,46 @@ class ToothDiseasePredictor:
         return "\n".join(report_lines)
     
     def get_ai_insights(self, detections: List[Dict]) -> str:
-        """Get AI-generated insights using Gemini"""
-        if not self.gemini_model:
+        """Get AI-generated insights synchronously (cached by finding signature)"""
+        if self.insights is None:
             return "AI insights not available (no API key provided)"
         
-        # Build prompt
-        prompt = "Based on the following dental X-ray analysis, provide professional insights and recommendations:\n\n"
-        
-        for det in detections:
-            prompt += f"- Tooth #{det['tooth_number']}: {det['disease_type']} ({det['severity']})\n"
-        
-        prompt += "\nPlease provide:\n"
-        prompt += "1. Overall oral health assessment\n"
-        prompt += "2. Priority treatment recommendations\n"
-        prompt += "3. Preventive care suggestions\n"
-        prompt += "Keep the response concise and professional."
-        
         try:
-            response = self.gemini_model.generate_content(prompt)
-            return response.text
+            return self.insights.generate_now(detections)
         except Exception as e:
             return f"Error generating AI insights: {e}"
     
+    def update_saved_report(self, saved_results: Dict, report: str, ai_insights: str):
+        """Rewrite the saved JSON and text reports of an analysis once its AI insights arrived"""
+        unique_id = saved_results['unique_id']
+        updated = dict(saved_results, report=report, ai_insights=dict(
+            saved_results['ai_insights'], status='ready', text=ai_insights
+        ))
+        self.writer.write_json(os.path.join(OUTPUT_DIR, f"{unique_id}.json"), updated)
+        self.writer.write_text(os.path.join(OUTPUT_DIR, f"{unique_id}.txt"), report)
+        print(f"✅ AI insights attached to report: {unique_id}")
+    
     def save_reports(self, results: Dict):
-        """Save reports in multiple formats"""
+        """
+        Save reports in multiple formats
+        
+        Everything is written by the background artifact writer; results must not
+        be modified after this call
+        """
         unique_id = results['unique_id']
         
-        # 1. CSV Report (append mode for batch processing)
-        csv_exists = os.path.exists(CSV_REPORT_PATH)
-        with open(CSV_REPORT_PATH, mode='a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not csv_exists:
-                writer.writerow([
-                    "unique_id", "input_image", "output_image", "total_detections",
-                    "tooth_numbers", "diseases", "report_summary"
-                ])
-            
-            tooth_nums = ', '.join([str(d['tooth_number']) for d in results['detections']])
-            diseases = ', '.join([d['disease_type'] for d in results['detections']])
-            
-            writer.writerow([
-                unique_id,
-                results['input_image'],
-                results['output_image'],
-                results['total_detections'],
-                tooth_nums,
-                diseases,
-                str(results['summary'])
-            ])
-        
-        print(f"✅ CSV report updated: {CSV_REPORT_PATH}")
+        # 1. Results index (queryable study and detection rows)
+        self.writer.add_to_index(self.index, results)
         
         # 2. JSON Report (detailed)
         json_output_path = os.path.join(OUTPUT_DIR, f"{unique_id}.json")
-        with open(json_output_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        
-        print(f"✅ JSON report saved: {json_output_path}")
+        self.writer.write_json(json_output_path, results)
         
         # 3. Text Report
         txt_output_path = os.path.join(OUTPUT_DIR, f"{unique_id}.txt")
-        with open(txt_output_path, 'w', encoding='utf-8') as f:
-            f.write(results['report'])
+        self.writer.write_text(txt_output_path, results['report'])
         
-        print(f"✅ Text report saved: {txt_output_path}")
+        print(f"✅ Reports queued: {json_output_path}, {txt_output_path} (+ {RESULTS_DB_PATH})")
 
 
 def main():
@@ -672,7 +881,7 @@ def main():
     
     print(f"\n📁 Results saved to: {OUTPUT_DIR}")
     print(f"   • Annotated image: {results['output_image']}")
-    print(f"   • CSV report: {CSV_REPORT_PATH}")
+    print(f"   • Results index: {RESULTS_DB_PATH}")
     print(f"   • Detailed reports: {OUTPUT_DIR}/{results['unique_id']}.*")
     
     print("\n✅ Prediction complete!\n")
@@ -0,0 +1,222 @@
+"""
+Content-Addressed Prediction Cache
+Re-uploads of the same radiograph (retries, JSON -> PDF -> email) are served
+from a two-tier (memory + disk) LRU cache keyed by image hash, model version
+and confidence threshold instead of re-running the full analysis
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def hash_image_source(image) -> str:
+    """SHA-256 of the encoded image bytes (or of the pixel data for decoded arrays)"""
+    digest = hashlib.sha256()
+    if isinstance(image, np.ndarray):
+        digest.update(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+    elif isinstance(image, (bytes, bytearray, memoryview)):
+        digest.update(image)
+    else:
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """LRU + TTL cache of prediction results and annotated images"""
+
+    def __init__(self, cache_dir: str, max_memory_bytes: int = 128 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 24 * 3600):
+        """
+        Args:
+            cache_dir: Directory for the disk tier
+            max_memory_bytes: Byte budget of the in-memory tier
+            max_disk_bytes: Byte budget of the disk tier
+            ttl_seconds: Entries older than this are treated as misses
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        # key -> (created_at, results, image_bytes, size)
+        self._memory: "OrderedDict[str, Tuple[float, Dict, bytes, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size on disk, ordered by last access
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+
+        self.counters = {
+            'hits_memory': 0,
+            'hits_disk': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions_memory': 0,
+            'evictions_disk': 0,
+            'expirations': 0,
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(image_hash: str, model_version: str, conf_threshold: float, *options: str) -> str:
+        """Cache key for one (image, model, threshold, request options) combination"""
+        raw = ":".join([image_hash, model_version, f"{conf_threshold:.4f}", *map(str, options)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f"{key}.json"),
+                os.path.join(self.cache_dir, f"{key}.jpg"))
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU index from the cache directory (least recently used first)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-5]
+            json_path, jpg_path = self._paths(key)
+            try:
+                size = os.path.getsize(json_path)
+                if os.path.exists(jpg_path):
+                    size += os.path.getsize(jpg_path)
+                entries.append((os.path.getmtime(json_path), key, size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """
+        Look up a cached prediction
+
+        Returns:
+            Tuple of (results dict copy, annotated JPEG bytes) or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, results, image_bytes, _ = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters['hits_memory'] += 1
+                    return json.loads(json.dumps(results)), image_bytes
+                self._drop_memory(key)
+                self.counters['expirations'] += 1
+
+            if key in self._disk:
+                loaded = self._read_disk(key)
+                if loaded is not None and now - loaded[0] <= self.ttl_seconds:
+                    created_at, results, image_bytes = loaded
+                    self._disk.move_to_end(key)
+                    os.utime(self._paths(key)[0], None)
+                    self._put_memory(key, created_at, results, image_bytes)
+                    self.counters['hits_disk'] += 1
+                    return json.loads(json.dumps(results)), image_bytes
+                self._drop_disk(key)
+                self.counters['expirations'] += 1
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key: str, results: Dict, image_bytes: bytes):
+        """Store a prediction in both tiers"""
+        created_at = time.time()
+        results = json.loads(json.dumps(results))
+        with self._lock:
+            self._put_memory(key, created_at, results, image_bytes)
+            self._write_disk(key, created_at, results, image_bytes)
+            self.counters['stores'] += 1
+
+    def _put_memory(self, key, created_at, results, image_bytes):
+        size = len(json.dumps(results)) + len(image_bytes)
+        if size > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._drop_memory(key)
+        self._memory[key] = (created_at, results, image_bytes, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self.counters['evictions_memory'] += 1
+
+    def _drop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[3]
+
+    def _read_disk(self, key) -> Optional[Tuple[float, Dict, bytes]]:
+        json_path, jpg_path = self._paths(key)
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            with open(jpg_path, 'rb') as f:
+                image_bytes = f.read()
+            return payload['created_at'], payload['results'], image_bytes
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, created_at, results, image_bytes):
+        json_path, jpg_path = self._paths(key)
+        payload = json.dumps({'created_at': created_at, 'results': results}, ensure_ascii=False).encode('utf-8')
+        size = len(payload) + len(image_bytes)
+        if size > self.max_disk_bytes:
+            return
+        try:
+            # Write the image first so a visible .json always has its .jpg
+            for path, data in ((jpg_path, image_bytes), (json_path, payload)):
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Prediction cache write failed: {e}")
+            return
+
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        self._disk[key] = size
+        self._disk_bytes += size
+        while self._disk_bytes > self.max_disk_bytes:
+            oldest = next(iter(self._disk))
+            self._drop_disk(oldest)
+            self.counters['evictions_disk'] += 1
+
+    def _drop_disk(self, key):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and tier occupancy"""
+        with self._lock:
+            lookups = self.counters['hits_memory'] + self.counters['hits_disk'] + self.counters['misses']
+            hits = self.counters['hits_memory'] + self.counters['hits_disk']
+            return {
+                **self.counters,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'ttl_seconds': self.ttl_seconds,
+            }
@@ -0,0 +1,243 @@
+"""
+Prefork Multi-Process API Server (Linux)
+Loads the predictor and model weights once in a master process, then forks N
+waitress workers that share the weights copy-on-write and accept connections on
+one shared socket. A supervisor restarts crashed workers and reports per-worker
+memory and throughput
+"""
+
+import os
+import sys
+import gc
+import time
+import signal
+import socket
+import multiprocessing
+
+WORKERS = int(os.getenv('PREFORK_WORKERS', '0')) or os.cpu_count() or 1
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', '4'))
+TORCH_THREADS = int(os.getenv('TORCH_THREADS_PER_WORKER', '0')) or max(1, (os.cpu_count() or 1) // WORKERS)
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8080'))
+STATS_INTERVAL_S = float(os.getenv('PREFORK_STATS_INTERVAL_S', '60'))
+# Workers get this long to flush queued artifact writes on SIGTERM (the master waits 10 s)
+ARTIFACT_FLUSH_TIMEOUT_S = float(os.getenv('ARTIFACT_FLUSH_TIMEOUT_S', '8'))
+
+# Thread pools must be sized before torch / OpenCV are imported by api.py
+os.environ.setdefault('OMP_NUM_THREADS', str(TORCH_THREADS))
+os.environ.setdefault('MKL_NUM_THREADS', str(TORCH_THREADS))
+
+from flask import jsonify  # noqa: E402
+
+import api  # noqa: E402  (loads the predictor and weights in the master)
+
+# Per worker slot: pid, started_at, handled requests (shared with all workers)
+SLOT_FIELDS = 3
+worker_slots = multiprocessing.Array('d', WORKERS * SLOT_FIELDS)
+current_slot = None
+
+
+def read_memory_kb(pid: int) -> dict:
+    """Resident (RSS) and proportional (PSS, shared pages split between processes) memory"""
+    memory = {'rss_kb': None, 'pss_kb': None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    memory['rss_kb'] = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status", 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        memory['rss_kb'] = int(line.split()[1])
+        except OSError:
+            pass
+    return memory
+
+
+def get_worker_stats() -> list:
+    """Memory and throughput of every worker slot"""
+    now = time.time()
+    stats = []
+    with worker_slots.get_lock():
+        slots = [worker_slots[i * SLOT_FIELDS:(i + 1) * SLOT_FIELDS] for i in range(WORKERS)]
+    for index, (pid, started_at, requests) in enumerate(slots):
+        if not pid:
+            continue
+        uptime = max(now - started_at, 1e-9)
+        stats.append({
+            'slot': index,
+            'pid': int(pid),
+            'uptime_s': round(uptime, 1),
+            'requests': int(requests),
+            'requests_per_s': round(requests / uptime, 3),
+            **read_memory_kb(int(pid)),
+        })
+    return stats
+
+
+@api.app.after_request
+def count_request(response):
+    """Count handled requests of this worker"""
+    if current_slot is not None:
+        with worker_slots.get_lock():
+            worker_slots[current_slot * SLOT_FIELDS + 2] += 1
+    return response
+
+
+@api.app.route('/api/workers', methods=['GET'])
+def workers():
+    """Per-worker memory (RSS / PSS) and throughput of the prefork server"""
+    return jsonify({
+        'master_pid': os.getppid(),
+        'worker_pid': os.getpid(),
+        'workers': get_worker_stats(),
+        'master': read_memory_kb(os.getppid()),
+    })
+
+
+def flush_and_exit(signum, frame):
+    """Worker SIGTERM: write queued reports, images and statistics before exiting"""
+    api.artifact_writer.flush(ARTIFACT_FLUSH_TIMEOUT_S)
+    api.aggregate_stats.save_snapshot()
+    os._exit(0)
+
+
+def run_worker(slot: int, sock: socket.socket):
+    """Worker process body: tune thread pools and serve on the shared socket"""
+    global current_slot
+    current_slot = slot
+    signal.signal(signal.SIGTERM, flush_and_exit)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import cv2
+    import torch
+    torch.set_num_threads(TORCH_THREADS)
+    cv2.setNumThreads(TORCH_THREADS)
+
+    with worker_slots.get_lock():
+        worker_slots[slot * SLOT_FIELDS:(slot + 1) * SLOT_FIELDS] = [os.getpid(), time.time(), 0]
+
+    # Each worker sweeps from startup on (one at a time, under the sweeper's file lock)
+    api.retention.start()
+
+    from waitress import serve
+    serve(api.app, sockets=[sock], threads=WORKER_THREADS, channel_timeout=300,
+          channel_request_lookahead=5)
+
+
+def spawn_worker(slot: int, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            run_worker(slot, sock)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+
+def log_worker_stats(previous: dict) -> dict:
+    """Print memory and recent throughput of all workers"""
+    now = time.time()
+    current = {}
+    for worker in get_worker_stats():
+        last_requests, last_time = previous.get(worker['pid'], (0, now - worker['uptime_s']))
+        rate = (worker['requests'] - last_requests) / max(now - last_time, 1e-9)
+        current[worker['pid']] = (worker['requests'], now)
+        rss_mb = (worker['rss_kb'] or 0) / 1024
+        pss = f", PSS {worker['pss_kb'] / 1024:.0f} MB" if worker['pss_kb'] is not None else ""
+        print(f"📊 Worker {worker['slot']} (pid {worker['pid']}): RSS {rss_mb:.0f} MB{pss}, "
+              f"{worker['requests']} requests, {rate:.2f} req/s")
+    return current
+
+
+def main():
+    if not hasattr(os, 'fork'):
+        print("❌ Prefork serving needs Linux (os.fork) - use: python api.py")
+        sys.exit(1)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(1024)
+
+    # Keep the loaded model out of the garbage collector so refcount/GC passes in the
+    # workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    print("=" * 70)
+    print(f"PREFORK SERVER: {WORKERS} workers x {WORKER_THREADS} threads, "
+          f"{TORCH_THREADS} torch/OpenCV threads per worker")
+    print(f"Listening on http://{HOST}:{PORT}")
+    print(f"Admission (per worker): {api.admission.max_in_flight} running + {api.admission.max_queued} waiting "
+          f"analyses, {WORKERS * api.admission.max_in_flight} + {WORKERS * api.admission.max_queued} in total")
+    print("=" * 70)
+
+    children = {}
+    for slot in range(WORKERS):
+        children[spawn_worker(slot, sock)] = slot
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    restarts = {}
+    stats = {}
+    next_stats = time.time() + STATS_INTERVAL_S
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in children:
+            slot = children.pop(pid)
+            print(f"⚠️ Worker {slot} (pid {pid}) exited with status {status} - restarting")
+            # Back off if the slot keeps crashing right after start
+            if time.time() - restarts.get(slot, 0) < 5:
+                time.sleep(1)
+            restarts[slot] = time.time()
+            children[spawn_worker(slot, sock)] = slot
+            continue
+
+        if time.time() >= next_stats:
+            stats = log_worker_stats(stats)
+            next_stats = time.time() + STATS_INTERVAL_S
+        time.sleep(0.5)
+
+    print("\nStopping workers...")
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.time() + 10
+    while children and time.time() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
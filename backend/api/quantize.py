@@ -0,0 +1,93 @@
+"""
+INT8 Post-Training Quantization
+Quantizes the trained FP32 model to INT8 (OpenVINO) using a calibration subset of
+the training dataset, and publishes it only if mAP@0.5 stays within tolerance
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from ultralytics import YOLO
+
+from inference_engines import exported_model_path, hash_weights, write_source_marker
+
+MODEL_PATH = str(Path(__file__).parent.parent / "model" / "best.pt")
+DATA_YAML = "dataset/data.yaml"
+
+
+def evaluate(model: YOLO, data_yaml: str, imgsz: int) -> float:
+    """mAP@0.5 on the validation split"""
+    metrics = model.val(data=data_yaml, imgsz=imgsz, batch=1, plots=False, verbose=False)
+    return float(metrics.box.map50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization of the tooth detector")
+    parser.add_argument('--model', default=MODEL_PATH, help="Trained FP32 .pt weights")
+    parser.add_argument('--data', default=DATA_YAML, help="Dataset yaml (train split is used for calibration)")
+    parser.add_argument('--fraction', type=float, default=0.25,
+                        help="Fraction of the training images used for calibration")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Maximum allowed mAP@0.5 drop (absolute) versus FP32")
+    parser.add_argument('--imgsz', type=int, default=640, help="Export image size")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("INT8 POST-TRAINING QUANTIZATION")
+    print("=" * 70)
+
+    if not os.path.exists(args.model):
+        print(f"\n❌ ERROR: Model not found at {args.model}")
+        print("   Please train the model first using: python train.py")
+        sys.exit(1)
+    if not os.path.exists(args.data):
+        print(f"\n❌ ERROR: Dataset configuration not found at {args.data}")
+        print("   Calibration needs the prepared dataset (run prepare_dataset.py first)")
+        sys.exit(1)
+
+    weights_hash = hash_weights(args.model)
+    target_path = exported_model_path(args.model, 'openvino_int8')
+
+    print(f"\n📊 Evaluating FP32 model: {args.model}")
+    fp32_map50 = evaluate(YOLO(args.model), args.data, args.imgsz)
+
+    with tempfile.TemporaryDirectory(prefix="quantize_") as staging_dir:
+        # Export into a staging folder so a failed quantization never replaces the published model
+        staged_weights = os.path.join(staging_dir, os.path.basename(args.model))
+        shutil.copy2(args.model, staged_weights)
+
+        print(f"\n⚙️ Quantizing to INT8 (calibration fraction: {args.fraction:.0%})...")
+        int8_path = YOLO(staged_weights).export(
+            format='openvino', int8=True, data=args.data, fraction=args.fraction,
+            imgsz=args.imgsz, dynamic=True, verbose=False
+        )
+
+        print(f"\n📊 Evaluating INT8 model: {int8_path}")
+        int8_map50 = evaluate(YOLO(int8_path, task='detect'), args.data, args.imgsz)
+
+        drop = fp32_map50 - int8_map50
+        print(f"\n{'Model':<8}{'mAP@0.5':>10}")
+        print("-" * 18)
+        print(f"{'FP32':<8}{fp32_map50:>10.4f}")
+        print(f"{'INT8':<8}{int8_map50:>10.4f}")
+        print(f"\n   Drop: {drop:+.4f} (tolerance: {args.tolerance:.4f})")
+
+        if drop > args.tolerance:
+            print("\n❌ INT8 model rejected: accuracy drop exceeds tolerance, nothing published")
+            sys.exit(1)
+
+        if os.path.exists(target_path):
+            shutil.rmtree(target_path)
+        shutil.copytree(str(int8_path), target_path)
+        write_source_marker(target_path, weights_hash)
+
+    print(f"\n✅ INT8 model published: {target_path}")
+    print("   Serve it with: INFERENCE_ENGINE=openvino_int8")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Results Index
+SQLite (WAL) index of saved analyses with one row per study and per detection,
+indexed by tooth number, disease type, severity, urgency and time, so questions
+like "abscesses on tooth 36 last month" are answered without scanning the report
+files in results_pridects/
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    unique_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    input_image TEXT,
+    output_image TEXT,
+    model TEXT,
+    confidence_threshold REAL,
+    contour_engine TEXT,
+    total_detections INTEGER NOT NULL,
+    healthy_teeth INTEGER NOT NULL,
+    diseased_teeth INTEGER NOT NULL,
+    degradations TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS detections (
+    unique_id TEXT NOT NULL REFERENCES studies(unique_id) ON DELETE CASCADE,
+    detection_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    tooth_number INTEGER,
+    tooth_name TEXT,
+    disease_type TEXT,
+    severity TEXT,
+    affected_area TEXT,
+    urgency_level TEXT,
+    urgency TEXT,
+    confidence REAL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    PRIMARY KEY (unique_id, detection_id)
+);
+CREATE INDEX IF NOT EXISTS studies_created_at ON studies(created_at);
+CREATE INDEX IF NOT EXISTS detections_tooth ON detections(tooth_number, created_at);
+CREATE INDEX IF NOT EXISTS detections_disease ON detections(disease_type, created_at);
+CREATE INDEX IF NOT EXISTS detections_severity ON detections(severity, created_at);
+CREATE INDEX IF NOT EXISTS detections_urgency ON detections(urgency_level, created_at);
+CREATE INDEX IF NOT EXISTS detections_created_at ON detections(created_at);
+"""
+
+STUDY_COLUMNS = ('unique_id', 'created_at', 'input_image', 'output_image', 'model', 'confidence_threshold',
+                 'contour_engine', 'total_detections', 'healthy_teeth', 'diseased_teeth', 'degradations',
+                 'summary')
+DETECTION_COLUMNS = ('unique_id', 'detection_id', 'created_at', 'tooth_number', 'tooth_name', 'disease_type',
+                     'severity', 'affected_area', 'urgency_level', 'urgency', 'confidence',
+                     'x1', 'y1', 'x2', 'y2')
+
+# Query parameter -> detections column
+DETECTION_FILTERS = {
+    'tooth_number': 'tooth_number',
+    'disease_type': 'disease_type',
+    'severity': 'severity',
+    'urgency': 'urgency_level',
+}
+
+
+def urgency_level(urgency: Optional[str]) -> Optional[str]:
+    """'HIGH - Schedule within 1 week' -> 'HIGH'"""
+    return urgency.split(' - ')[0].strip() if urgency else None
+
+
+def format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+def parse_timestamp(value: str) -> float:
+    """Unix seconds or an ISO date / datetime (UTC unless it has an offset)"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def study_row(results: Dict, created_at: float) -> Tuple:
+    """studies row of a results dictionary"""
+    summary = results.get('summary') or {}
+    detections = results.get('detections') or []
+    healthy = summary.get('healthy_teeth')
+    if healthy is None:
+        healthy = sum(1 for det in detections if det.get('disease_type') == 'Healthy')
+    return (
+        results['unique_id'],
+        created_at,
+        results.get('input_image'),
+        results.get('output_image'),
+        results.get('model'),
+        results.get('confidence_threshold'),
+        results.get('contour_engine'),
+        results.get('total_detections', len(detections)),
+        healthy,
+        summary.get('diseased_teeth', len(detections) - healthy),
+        json.dumps(results.get('degradations') or []),
+        json.dumps(summary, ensure_ascii=False),
+    )
+
+
+def detection_rows(results: Dict, created_at: float) -> List[Tuple]:
+    """detections rows of a results dictionary"""
+    rows = []
+    for index, det in enumerate(results.get('detections') or []):
+        box = det.get('bounding_box') or {}
+        rows.append((
+            results['unique_id'],
+            det.get('detection_id', index),
+            created_at,
+            det.get('tooth_number'),
+            det.get('tooth_name'),
+            det.get('disease_type'),
+            det.get('severity'),
+            det.get('affected_area'),
+            urgency_level(det.get('urgency')),
+            det.get('urgency'),
+            det.get('confidence'),
+            box.get('x1'), box.get('y1'), box.get('x2'), box.get('y2'),
+        ))
+    return rows
+
+
+class ResultsIndex:
+    """Normalized, queryable index of every saved analysis"""
+
+    def __init__(self, db_path: str, busy_timeout: float = 5.0):
+        """
+        Args:
+            db_path: SQLite database file (created with its folder if missing)
+            busy_timeout: Seconds a write waits for another process' write lock
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the current thread (a forked child opens its own)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def add_study(self, results: Dict, created_at: float = None):
+        """Insert (or replace) one analysis and its detections in a single transaction"""
+        self.add_studies([(results, created_at)])
+
+    def add_studies(self, studies: List[Tuple[Dict, Optional[float]]]):
+        """Insert (or replace) several analyses in one transaction (used by the importer)"""
+        conn = self._connect()
+        with conn:
+            for results, created_at in studies:
+                created_at = created_at if created_at is not None else time.time()
+                conn.execute("DELETE FROM detections WHERE unique_id = ?", (results['unique_id'],))
+                conn.execute(
+                    f"INSERT OR REPLACE INTO studies ({', '.join(STUDY_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(STUDY_COLUMNS))})",
+                    study_row(results, created_at)
+                )
+                conn.executemany(
+                    f"INSERT INTO detections ({', '.join(DETECTION_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(DETECTION_COLUMNS))})",
+                    detection_rows(results, created_at)
+                )
+
+    def remove_studies(self, unique_ids: List[str]) -> int:
+        """Delete analyses and their detections (e.g. after retention removed their files)"""
+        if not unique_ids:
+            return 0
+        conn = self._connect()
+        with conn:
+            conn.executemany("DELETE FROM detections WHERE unique_id = ?", [(u,) for u in unique_ids])
+            return conn.executemany("DELETE FROM studies WHERE unique_id = ?",
+                                    [(u,) for u in unique_ids]).rowcount
+
+    def has_study(self, unique_id: str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM studies WHERE unique_id = ?", (unique_id,)).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _study_dict(row: sqlite3.Row) -> Dict:
+        study = dict(row)
+        study['created_at'] = format_timestamp(study['created_at'])
+        study['degradations'] = json.loads(study['degradations'] or '[]')
+        study['summary'] = json.loads(study['summary'] or '{}')
+        return study
+
+    @staticmethod
+    def _detection_dict(row: sqlite3.Row) -> Dict:
+        detection = dict(row)
+        detection['created_at'] = format_timestamp(detection['created_at'])
+        detection['bounding_box'] = {k: detection.pop(k) for k in ('x1', 'y1', 'x2', 'y2')}
+        return detection
+
+    @staticmethod
+    def _where(filters: Dict, since: float, until: float, table: str = 'd') -> Tuple[str, list]:
+        """WHERE clause and parameters for detection filters and a time range"""
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is not None:
+                clauses.append(f"d.{DETECTION_FILTERS[name]} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append(f"{table}.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{table}.created_at < ?")
+            params.append(until)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def get_study(self, unique_id: str) -> Optional[Dict]:
+        """One analysis with all its detections, or None"""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM studies WHERE unique_id = ?", (unique_id,)).fetchone()
+        if row is None:
+            return None
+        study = self._study_dict(row)
+        study['detections'] = [
+            self._detection_dict(det) for det in conn.execute(
+                "SELECT * FROM detections WHERE unique_id = ? ORDER BY detection_id", (unique_id,)
+            )
+        ]
+        return study
+
+    def find_detections(self, tooth_number: int = None, disease_type: str = None, severity: str = None,
+                        urgency: str = None, since: float = None, until: float = None,
+                        limit: int = 100, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """
+        Detections matching all given filters, newest first
+
+        Args:
+            urgency: Urgency level ('URGENT', 'HIGH', 'MODERATE' or 'LOW')
+            since / until: Unix time range [since, until)
+
+        Returns:
+            (total number of matches, detections of the requested page)
+        """
+        where, params = self._where(
+            {'tooth_number': tooth_number, 'disease_type': disease_type, 'severity': severity, 'urgency': urgency},
+            since, until
+        )
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM detections d{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT d.*, s.input_image FROM detections d JOIN studies s USING (unique_id){where} "
+            f"ORDER BY d.created_at DESC, d.unique_id, d.detection_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        return total, [self._detection_dict(row) for row in rows]
+
+    def find_studies(self, tooth_number: int = None, disease_type: str = None, severity: str = None,
+                     urgency: str = None, since: float = None, until: float = None,
+                     limit: int = 50, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """
+        Analyses with at least one detection matching all given filters (or, without
+        detection filters, all analyses in the time range), newest first. Each study
+        lists the ids of its matching detections.
+
+        Returns:
+            (total number of matching studies, studies of the requested page)
+        """
+        detection_filters = {'tooth_number': tooth_number, 'disease_type': disease_type,
+                             'severity': severity, 'urgency': urgency}
+        conn = self._connect()
+        if all(value is None for value in detection_filters.values()):
+            where, params = self._where({}, since, until, table='s')
+            total = conn.execute(f"SELECT COUNT(*) FROM studies s{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT s.*, NULL AS matching FROM studies s{where} "
+                f"ORDER BY s.created_at DESC, s.unique_id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        else:
+            where, params = self._where(detection_filters, since, until)
+            total = conn.execute(
+                f"SELECT COUNT(DISTINCT d.unique_id) FROM detections d{where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT s.*, m.matching FROM studies s JOIN ("
+                f"SELECT d.unique_id, GROUP_CONCAT(d.detection_id) AS matching FROM detections d{where} "
+                f"GROUP BY d.unique_id) m USING (unique_id) "
+                f"ORDER BY s.created_at DESC, s.unique_id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+
+        studies = []
+        for row in rows:
+            study = self._study_dict(row)
+            matching = study.pop('matching')
+            if matching is not None:
+                study['matching_detection_ids'] = sorted(int(i) for i in matching.split(','))
+            studies.append(study)
+        return total, studies
+
+    def get_stats(self) -> Dict:
+        """Number of indexed studies / detections and database size"""
+        conn = self._connect()
+        return {
+            'path': self.db_path,
+            'studies': conn.execute("SELECT COUNT(*) FROM studies").fetchone()[0],
+            'detections': conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0],
+            'size_bytes': sum(
+                os.path.getsize(path) for path in (self.db_path, self.db_path + '-wal')
+                if os.path.exists(path)
+            ),
+        }
@@ -0,0 +1,382 @@
+"""
+Artifact Retention
+Background sweeper that keeps results_pridects/ within a size and age limit by
+deleting the artifacts of the least recently used analyses (annotated images,
+JSON/TXT reports, PDFs), and removes orphaned uploads and stale temp files.
+Analyses that a request is using (in any process), or that were accessed
+recently, are never deleted. Deleted analyses are removed from the results index, and blobs of the
+artifact store that no analysis references any more are garbage-collected after
+each pass
+"""
+
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, Counter, Gauge
+
+try:
+    import fcntl  # Only one prefork worker sweeps at a time (Linux / macOS)
+except ImportError:
+    fcntl = None
+
+# Subfolder of results_dir with one lock file per held analysis
+HOLDS_DIR = '.holds'
+
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+RETENTION_DELETED = REGISTRY.register(Counter(
+    'dentx_retention_deleted_files_total', 'Files removed by the retention sweeper', ('reason',)
+))
+RETENTION_RECLAIMED = REGISTRY.register(Counter(
+    'dentx_retention_reclaimed_bytes_total', 'Bytes reclaimed by the retention sweeper', ('reason',)
+))
+RETENTION_BYTES = REGISTRY.register(Gauge(
+    'dentx_retention_folder_bytes', 'Size of the swept folders after the last sweep', ('folder',)
+))
+
+
+@dataclass
+class _Group:
+    """All artifact files of one analysis"""
+    unique_id: str
+    files: List[Tuple[str, int]] = field(default_factory=list)  # (path, size)
+    size: int = 0
+    last_access: float = 0.0
+
+
+class RetentionSweeper:
+    """Size / age bounded LRU retention of analysis artifacts"""
+
+    def __init__(self, results_dir: str, uploads_dir: str = None, max_bytes: int = 2 * 1024 ** 3,
+                 max_age_seconds: float = 90 * 86400, min_idle_seconds: float = 600,
+                 orphan_age_seconds: float = 3600, interval: float = 600, writer=None, store=None,
+                 index=None):
+        """
+        Args:
+            results_dir: Folder with the <uuid>.* artifacts of the analyses
+            uploads_dir: Upload folder; every file older than orphan_age_seconds is an orphan
+                (uploads are decoded in memory and never written there)
+            max_bytes: Size limit of the analysis artifacts (0 = no limit)
+            max_age_seconds: Analyses not accessed for longer are deleted (0 = no limit)
+            min_idle_seconds: Analyses accessed more recently are never deleted
+            orphan_age_seconds: Age of uploads and temp files before they are removed
+            interval: Seconds between two sweeps
+            writer: Optional ArtifactWriter; analyses with queued writes are kept
+            store: Optional BlobStore the artifacts are aliases of; a blob shared by several
+                analyses counts towards each of them with an equal share, and is
+                collected once the last of them is deleted
+            index: Optional ResultsIndex the deleted analyses are removed from
+        """
+        self.results_dir = results_dir
+        self.uploads_dir = uploads_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.min_idle_seconds = min_idle_seconds
+        self.orphan_age_seconds = orphan_age_seconds
+        self.interval = interval
+        self.writer = writer
+        self.store = store
+        self.index = index
+
+        self._lock = threading.Lock()
+        self._holds: Dict[str, int] = {}
+        self._thread = None
+        self._pid = None
+        self.counters = {'sweeps': 0, 'deleted_studies': 0, 'deleted_files': 0, 'reclaimed_bytes': 0,
+                         'orphan_uploads': 0, 'skipped_held': 0, 'collected_blobs': 0}
+        self.last_sweep: Optional[Dict] = None
+
+    def _ensure_started(self):
+        """Start the sweeper thread lazily (and again in a forked child)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._holds = {}
+                self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def start(self):
+        """
+        Start sweeping in the background now (first sweep right away)
+
+        Call it in every serving process: after a fork the thread only exists in
+        the parent, and a process without traffic would otherwise never sweep.
+        """
+        self._ensure_started()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Retention sweep failed: {e}")
+            time.sleep(self.interval)
+
+    def touch(self, unique_id: str):
+        """
+        Mark an analysis as used now
+
+        The access time of its JSON report is set explicitly (filesystems mounted
+        with noatime/relatime would not), so sweepers in other processes see it too.
+        """
+        self._ensure_started()
+        path = os.path.join(self.results_dir, f"{unique_id}.json")
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    def _hold_path(self, unique_id: str) -> str:
+        return os.path.join(self.results_dir, HOLDS_DIR, f"{unique_id}.hold")
+
+    def _lock_hold_file(self, unique_id: str, exclusive: bool):
+        """
+        flock the hold file of an analysis: shared for a request using it, exclusive
+        (non-blocking) for the sweeper about to delete it
+
+        Returns:
+            The open lock file, or None if the exclusive lock is taken (analysis is held)
+        """
+        path = self._hold_path(unique_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        while True:
+            lock_file = open(path, 'a')
+            try:
+                fcntl.flock(lock_file.fileno(), (fcntl.LOCK_EX | fcntl.LOCK_NB) if exclusive else fcntl.LOCK_SH)
+            except OSError:
+                lock_file.close()
+                return None
+            # The sweeper removes unused hold files; lock the current one, not a removed one
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    @contextmanager
+    def hold(self, unique_id: Optional[str]):
+        """
+        Keep the artifacts of an analysis while the enclosed block uses them
+
+        The hold is a shared flock on results_dir/.holds/<uuid>.hold, so sweepers in
+        other prefork workers respect it too (in-process only where flock is missing).
+        """
+        if not unique_id:
+            yield
+            return
+        self.touch(unique_id)
+        lock_file = self._lock_hold_file(unique_id, exclusive=False) if fcntl is not None else None
+        with self._lock:
+            self._holds[unique_id] = self._holds.get(unique_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._holds.get(unique_id, 1) - 1
+                if remaining > 0:
+                    self._holds[unique_id] = remaining
+                else:
+                    self._holds.pop(unique_id, None)
+            if lock_file is not None:
+                lock_file.close()  # Releases the flock
+
+    @staticmethod
+    def unique_id_of(filename: str) -> Optional[str]:
+        """Analysis a results file belongs to ('report_<uuid>.pdf', '<uuid>_conf300.jpg', ...)"""
+        match = UUID_PATTERN.search(os.path.basename(filename))
+        return match.group(0) if match else None
+
+    def _scan_results(self, now: float, swept: Dict) -> Dict[str, _Group]:
+        """Group the artifact files by analysis; remove stale temp files on the way"""
+        groups: Dict[str, _Group] = {}
+        for entry in os.scandir(self.results_dir):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith('.tmp'):
+                if now - stat.st_mtime > self.orphan_age_seconds:
+                    self._delete(entry.path, stat.st_size, 'temp', swept)
+                continue
+            unique_id = self.unique_id_of(entry.name)
+            if unique_id is None:
+                continue  # results.db, aggregate_stats.json, report.csv, ...
+            size = stat.st_size
+            if self.store is not None and stat.st_nlink > 2:
+                # Alias of a blob shared with other analyses (the blob's own entry is one link)
+                size //= stat.st_nlink - 1
+            group = groups.setdefault(unique_id, _Group(unique_id))
+            group.files.append((entry.path, size))
+            group.size += size
+            group.last_access = max(group.last_access, stat.st_atime, stat.st_mtime)
+        return groups
+
+    def _delete(self, path: str, size: int, reason: str, swept: Dict) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"⚠️ Retention: could not remove {path}: {e}")
+            return False
+        RETENTION_DELETED.inc(reason=reason)
+        RETENTION_RECLAIMED.inc(size, reason=reason)
+        swept['files'] += 1
+        swept['bytes'] += size
+        swept['bytes_by_reason'][reason] = swept['bytes_by_reason'].get(reason, 0) + size
+        return True
+
+    def _deletable(self, group: _Group, now: float) -> bool:
+        """Not held by a request, not recently used and without queued writes"""
+        with self._lock:
+            held = group.unique_id in self._holds
+        if held or now - group.last_access < self.min_idle_seconds:
+            return False
+        if self.writer is not None and any(self.writer.pending(path) for path, _ in group.files):
+            return False
+        return True
+
+    def _remove_unused_hold_files(self):
+        """Remove the hold files nobody holds (held ones are locked and stay)"""
+        holds_dir = os.path.join(self.results_dir, HOLDS_DIR)
+        if fcntl is None or not os.path.isdir(holds_dir):
+            return
+        for entry in os.scandir(holds_dir):
+            unique_id = self.unique_id_of(entry.name)
+            if unique_id is None:
+                continue
+            lock_file = self._lock_hold_file(unique_id, exclusive=True)
+            if lock_file is not None:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                lock_file.close()
+
+    def sweep(self) -> Dict:
+        """
+        Run one retention pass: expired analyses, then LRU analyses over the size
+        limit, then orphaned uploads
+
+        Returns:
+            Summary of the pass (also kept as last_sweep)
+        """
+        lock_file = None
+        if fcntl is not None:
+            lock_file = open(os.path.join(self.results_dir, '.retention.lock'), 'a')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return {'skipped': 'another process is sweeping'}
+        try:
+            return self._sweep()
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _sweep(self) -> Dict:
+        start = time.perf_counter()
+        now = time.time()
+        swept = {'studies': 0, 'files': 0, 'bytes': 0, 'held': 0, 'bytes_by_reason': {}}
+        groups = self._scan_results(now, swept)
+        total = sum(group.size for group in groups.values())
+
+        # Least recently used first: once an analysis is neither expired nor needed to
+        # get under the size limit, no later (more recent) one is either
+        deleted_ids = []
+        for group in sorted(groups.values(), key=lambda g: g.last_access):
+            expired = self.max_age_seconds > 0 and now - group.last_access > self.max_age_seconds
+            over_size = self.max_bytes > 0 and total > self.max_bytes
+            if not expired and not over_size:
+                break
+            if not self._deletable(group, now):
+                swept['held'] += 1
+                continue
+            # The exclusive hold lock fails if a request in any process holds the
+            # analysis, and keeps new holds waiting until its files are gone
+            lock_file = self._lock_hold_file(group.unique_id, exclusive=True) if fcntl is not None else None
+            if fcntl is not None and lock_file is None:
+                swept['held'] += 1
+                continue
+            try:
+                for path, size in group.files:
+                    if self._delete(path, size, 'age' if expired else 'size', swept):
+                        total -= size
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+            swept['studies'] += 1
+            deleted_ids.append(group.unique_id)
+        self._remove_unused_hold_files()
+
+        # Queries must not return analyses whose image and reports are gone
+        if self.index is not None and deleted_ids:
+            try:
+                self.index.remove_studies(deleted_ids)
+            except Exception as e:
+                print(f"⚠️ Retention: could not remove {len(deleted_ids)} analyses from the results index: {e}")
+
+        uploads_total = 0
+        orphans = 0
+        if self.uploads_dir and os.path.isdir(self.uploads_dir):
+            for entry in os.scandir(self.uploads_dir):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > self.orphan_age_seconds and \
+                        self._delete(entry.path, stat.st_size, 'orphan_upload', swept):
+                    orphans += 1
+                else:
+                    uploads_total += stat.st_size
+
+        collected = 0
+        if self.store is not None:
+            # Blobs are only unreferenced after all their aliases are gone; the bytes were
+            # already counted (as shares) when the aliases were deleted
+            collected, _ = self.store.collect_garbage(self.orphan_age_seconds)
+            if collected:
+                RETENTION_DELETED.inc(collected, reason='unreferenced_blob')
+
+        RETENTION_BYTES.set(total, folder='results')
+        RETENTION_BYTES.set(uploads_total, folder='uploads')
+        with self._lock:
+            self.counters['sweeps'] += 1
+            self.counters['deleted_studies'] += swept['studies']
+            self.counters['deleted_files'] += swept['files']
+            self.counters['reclaimed_bytes'] += swept['bytes']
+            self.counters['orphan_uploads'] += orphans
+            self.counters['skipped_held'] += swept['held']
+            self.counters['collected_blobs'] += collected
+            self.last_sweep = {
+                'at': now,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+                'results_bytes': total,
+                'uploads_bytes': uploads_total,
+                'collected_blobs': collected,
+                **swept,
+            }
+        if swept['files']:
+            print(f"🧹 Retention: removed {swept['studies']} analyses and {orphans} orphaned uploads "
+                  f"({swept['files']} files, {swept['bytes'] / 1024 / 1024:.1f} MB reclaimed), "
+                  f"results folder now {total / 1024 / 1024:.1f} MB")
+        return self.last_sweep
+
+    def get_stats(self) -> Dict:
+        """Limits, totals so far and the last sweep"""
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age_seconds,
+                'held': len(self._holds),
+                'last_sweep': self.last_sweep,
+                **self.counters,
+            }
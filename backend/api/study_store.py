@@ -0,0 +1,79 @@
+"""
+Study Store
+Keeps the decoded image and the raw low-threshold detections of recent
+analyses in memory so results can be re-filtered for any confidence
+threshold without running the model again
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class Study:
+    """Everything needed to rebuild the results of one analysis"""
+    unique_id: str
+    image_name: str
+    image: np.ndarray
+    raw_detections: Dict[str, list]
+    raw_conf_floor: float
+    # Which model produced the raw detections ('full' or 'preview')
+    model: str = 'full'
+    # Number of tiles of a tiled analysis (0 = single full-frame pass)
+    tiles: int = 0
+    created_at: float = field(default_factory=time.time)
+    # Per contour engine, raw-detection polygons already extracted (index -> (polygon, status))
+    polygons: Dict[str, Dict[int, Tuple[List[tuple], str]]] = field(default_factory=dict)
+    # Annotated image per contour engine and set of rendered detections (-> output path)
+    renders: Dict[tuple, str] = field(default_factory=dict)
+    # Text report per set of reported detections (indices -> report)
+    reports: Dict[Tuple[int, ...], str] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.image.nbytes
+
+
+class StudyStore:
+    """LRU of recent studies bounded by decoded image memory"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_studies: int = 64):
+        self.max_bytes = max_bytes
+        self.max_studies = max_studies
+        self._studies: "OrderedDict[str, Study]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, study: Study):
+        with self._lock:
+            if study.unique_id in self._studies:
+                self._bytes -= self._studies.pop(study.unique_id).size_bytes
+            self._studies[study.unique_id] = study
+            self._bytes += study.size_bytes
+            # The study just put is never evicted, even if it alone exceeds max_bytes
+            while len(self._studies) > 1 and (
+                self._bytes > self.max_bytes or len(self._studies) > self.max_studies
+            ):
+                _, evicted = self._studies.popitem(last=False)
+                self._bytes -= evicted.size_bytes
+
+    def get(self, unique_id: str) -> Optional[Study]:
+        with self._lock:
+            study = self._studies.get(unique_id)
+            if study is not None:
+                self._studies.move_to_end(unique_id)
+            return study
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'studies': len(self._studies),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,9 @@
+"""
+Shared test setup: the API modules are flat and imported by bare name, as
+api.py does, so their folder goes on sys.path
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,78 @@
+"""Admission control: immediate rejection with a Retry-After estimate, queue timeout and cancel"""
+
+import threading
+
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionRejected, AnalysisCancelled
+
+
+@pytest.fixture(autouse=True)
+def stage_estimates(monkeypatch):
+    """Measured stage latencies: a 3 s analysis (independent of other tests' spans)"""
+    estimates = {'inference': 2000.0, 'detections': 800.0, 'render': 200.0}
+    monkeypatch.setattr(admission, 'stage_estimate_ms',
+                        lambda stage, default=0.0: estimates.get(stage, default))
+    return estimates
+
+
+def test_overflow_is_rejected_with_retry_after():
+    controller = AdmissionController(max_in_flight=2, max_queued=0)
+
+    with controller.admit(), controller.admit():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit():
+                pass
+
+    # Two in flight plus the new request over two slots: 1.5 waves of 3 s
+    assert rejected.value.retry_after == 5
+    assert controller.counters == {'admitted': 2, 'rejected': 1, 'timeout': 0, 'cancelled': 0}
+    assert controller.get_stats()['in_flight'] == 0
+
+
+def test_retry_after_falls_back_to_the_initial_service_time(stage_estimates):
+    stage_estimates.clear()
+    controller = AdmissionController(max_in_flight=1, max_queued=0, initial_service_time=7.0)
+
+    with controller.admit():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit():
+                pass
+
+    assert rejected.value.retry_after == 14
+
+
+def test_queued_request_runs_when_a_slot_frees_up():
+    controller = AdmissionController(max_in_flight=1, max_queued=1, poll_interval=0.01)
+    admitted = threading.Event()
+
+    def waiter():
+        with controller.admit():
+            admitted.set()
+
+    with controller.admit():
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert not admitted.wait(0.1)
+    thread.join(5)
+
+    assert admitted.is_set()
+    assert controller.counters['admitted'] == 2
+
+
+def test_queue_timeout_and_cancellation():
+    controller = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=0.05, poll_interval=0.01)
+
+    with controller.admit():
+        with pytest.raises(AdmissionRejected) as timed_out:
+            with controller.admit():
+                pass
+        with pytest.raises(AnalysisCancelled):
+            with controller.admit(is_cancelled=lambda: True):
+                pass
+
+    # One running, one waiting (this request) plus itself: three 3 s waves
+    assert timed_out.value.retry_after == 9
+    assert (controller.counters['timeout'], controller.counters['cancelled']) == (1, 1)
+    assert controller.get_stats()['queued'] == 0
@@ -0,0 +1,61 @@
+"""AggregateStats: windowed summaries and snapshot merges between processes sharing one file"""
+
+import time
+
+from aggregate_stats import AggregateStats
+
+DAY = 86400
+
+
+def results(*findings):
+    return {'detections': [
+        {'tooth_number': tooth, 'disease_type': disease, 'severity': severity, 'urgency': f'{urgency} - x'}
+        for tooth, disease, severity, urgency in findings
+    ]}
+
+
+ABSCESS = (36, 'Abscess', 'Severe', 'URGENT')
+HEALTHY = (11, 'Healthy', 'None', 'LOW')
+
+
+def test_two_instances_merge_into_one_snapshot(tmp_path):
+    path = str(tmp_path / 'aggregate_stats.json')
+    first = AggregateStats(path, snapshot_interval=3600)
+    second = AggregateStats(path, snapshot_interval=3600)
+
+    first.record(results(ABSCESS, HEALTHY), latency_ms=800)
+    second.record(results(ABSCESS), latency_ms=3000)
+    second.record(results(HEALTHY), latency_ms=300)
+    first.save_snapshot()
+    second.save_snapshot()
+
+    # The second save re-read the file, so it sees the first instance's counts too
+    merged = second.summary()
+    assert merged['studies'] == 3
+    assert merged['detections'] == 4
+    assert merged['disease_distribution'] == {'Abscess': 2, 'Healthy': 2}
+    assert merged['urgency_distribution'] == {'URGENT': 2, 'LOW': 2}
+    assert merged['latency_ms']['mean'] == round((800 + 3000 + 300) / 3, 1)
+
+    # The first instance picks them up after its next save; a fresh one at start
+    first.record(results(HEALTHY))
+    first.save_snapshot()
+    assert first.summary()['studies'] == 4
+    assert AggregateStats(path).summary()['studies'] == 4
+    assert second.get_stats()['unsaved_days'] == 0
+
+
+def test_unsaved_counts_are_included_and_windows_cut_by_day(tmp_path):
+    stats = AggregateStats(str(tmp_path / 'aggregate_stats.json'), snapshot_interval=3600)
+    now = time.time()
+
+    stats.record(results(ABSCESS), at=now - 10 * DAY)
+    stats.record(results(ABSCESS, HEALTHY), at=now)
+
+    assert stats.summary(now=now)['studies'] == 2
+    week = stats.summary(days=7, now=now)
+    assert week['studies'] == 1
+    assert week['tooth_prevalence'] == [
+        {'tooth_number': 11, 'studies': 1, 'diseased': 0, 'prevalence': 0.0},
+        {'tooth_number': 36, 'studies': 1, 'diseased': 1, 'prevalence': 1.0},
+    ]
@@ -0,0 +1,54 @@
+"""Artifact writer: atomic files, waiting for queued writes and batched index inserts"""
+
+import os
+import threading
+
+from artifact_writer import ArtifactWriter
+from results_index import ResultsIndex
+
+
+def results(unique_id):
+    return {'unique_id': unique_id, 'detections': [], 'summary': {}}
+
+
+def test_written_files_can_be_waited_for(tmp_path):
+    writer = ArtifactWriter()
+    path = str(tmp_path / "report.json")
+
+    writer.write_json(path, {'a': 1})
+
+    assert writer.wait_for(path, 10)
+    assert not writer.pending(path)
+    assert open(path, encoding='utf-8').read() == '{\n  "a": 1\n}'
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_index_inserts_of_a_batch_share_one_transaction(tmp_path):
+    index = ResultsIndex(str(tmp_path / "results.db"))
+    writer = ArtifactWriter(batch_size=32)
+    release = threading.Event()
+    writer.defer(lambda: release.wait(10))  # Hold the writer so the inserts queue up
+
+    for i in range(5):
+        writer.add_to_index(index, results(f"study-{i}"))
+    release.set()
+
+    assert writer.flush(10)
+    assert all(index.has_study(f"study-{i}") for i in range(5))
+    assert writer.get_stats()['index_transactions'] == 1
+
+
+def test_failed_batch_insert_keeps_the_valid_analyses(tmp_path):
+    index = ResultsIndex(str(tmp_path / "results.db"))
+    writer = ArtifactWriter()
+    release = threading.Event()
+    writer.defer(lambda: release.wait(10))
+
+    writer.add_to_index(index, results("good"))
+    writer.add_to_index(index, {'detections': []})  # No unique_id
+    release.set()
+
+    assert writer.flush(10)
+    assert index.has_study("good")
+    stats = writer.get_stats()
+    assert stats['failed'] == 1
@@ -0,0 +1,55 @@
+"""Micro-batcher: grouping concurrent requests and failing them cleanly"""
+
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class EchoModel:
+    """Returns one result per source and records the batch sizes it was called with"""
+
+    def __init__(self, drop_last=False):
+        self.drop_last = drop_last
+        self.batches = []
+
+    def __call__(self, sources, batch, **kwargs):
+        self.batches.append(len(sources))
+        results = [(source, kwargs.get('conf')) for source in sources]
+        return results[:-1] if self.drop_last else results
+
+
+def test_concurrent_requests_share_one_forward_pass():
+    model = EchoModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+
+    results = batcher.infer_many(['a', 'b', 'c'], conf=0.25)
+
+    assert results == [('a', 0.25), ('b', 0.25), ('c', 0.25)]
+    assert model.batches == [3]
+
+
+def test_different_options_are_not_batched_together():
+    model = EchoModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def infer(source, conf):
+        results[source] = batcher.infer(source, conf=conf)
+
+    threads = [threading.Thread(target=infer, args=(s, c)) for s, c in (('a', 0.25), ('b', 0.5))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == {'a': ('a', 0.25), 'b': ('b', 0.5)}
+    assert sorted(model.batches) == [1, 1]
+
+
+def test_short_result_list_fails_every_request():
+    batcher = MicroBatcher(EchoModel(drop_last=True), max_batch_size=8, max_wait_ms=200)
+
+    with pytest.raises(RuntimeError, match="2 results for 3 images"):
+        batcher.infer_many(['a', 'b', 'c'], conf=0.25)
@@ -0,0 +1,86 @@
+"""Blob store: deduplication, garbage collection and non-filesystem backends"""
+
+import os
+
+from artifact_writer import ArtifactWriter
+from blob_store import BlobBackend, BlobStore, LocalBlobBackend, blob_key
+
+
+class MemoryBlobBackend(BlobBackend):
+    """Blobs and aliases in dicts, like an object store without local paths"""
+
+    def __init__(self):
+        self.blobs = {}
+        self.aliases = {}
+
+    def has_blob(self, key):
+        return key in self.blobs
+
+    def put_blob(self, key, data):
+        self.blobs[key] = data
+
+    def link(self, name, key):
+        if key not in self.blobs:
+            raise FileNotFoundError(key)
+        self.aliases[name] = key
+
+    def read(self, name):
+        return self.blobs[self.aliases[name]]
+
+    def exists(self, name):
+        return name in self.aliases
+
+    def remove(self, name):
+        return self.aliases.pop(name, None) is not None
+
+    def unreferenced_blobs(self, min_age_seconds):
+        referenced = set(self.aliases.values())
+        return [(key, len(data)) for key, data in self.blobs.items() if key not in referenced]
+
+    def delete_blob(self, key):
+        return self.blobs.pop(key, None) is not None
+
+
+def test_identical_artifacts_share_one_blob(tmp_path):
+    store = BlobStore(LocalBlobBackend(str(tmp_path)), str(tmp_path))
+
+    store.write(str(tmp_path / "a.jpg"), b"same bytes")
+    store.write(str(tmp_path / "b.jpg"), b"same bytes")
+    store.write(str(tmp_path / "c.jpg"), b"other bytes")
+
+    stats = store.get_stats()
+    assert (stats['stored'], stats['deduplicated']) == (2, 1)
+    assert stats['dedup_rate'] == 1 / 3
+    assert (tmp_path / "a.jpg").read_bytes() == b"same bytes"
+    assert os.stat(tmp_path / "a.jpg").st_ino == os.stat(tmp_path / "b.jpg").st_ino
+
+
+def test_garbage_collection_keeps_referenced_blobs(tmp_path):
+    store = BlobStore(LocalBlobBackend(str(tmp_path)), str(tmp_path))
+    shared = store.write(str(tmp_path / "a.jpg"), b"shared")
+    store.write(str(tmp_path / "b.jpg"), b"shared")
+    single = store.write(str(tmp_path / "c.jpg"), b"single")
+
+    store.remove(str(tmp_path / "a.jpg"))
+    store.remove(str(tmp_path / "c.jpg"))
+
+    assert store.collect_garbage(min_age_seconds=0) == (1, len(b"single"))
+    assert store.backend.has_blob(shared)
+    assert not store.backend.has_blob(single)
+    assert store.read(str(tmp_path / "b.jpg")) == b"shared"
+
+
+def test_store_and_writer_work_without_local_paths(tmp_path):
+    backend = MemoryBlobBackend()
+    store = BlobStore(backend, str(tmp_path))
+    writer = ArtifactWriter(store=store)
+    path = str(tmp_path / "report_x.txt")
+
+    writer.write_text(path, "report")
+    assert writer.flush(10)
+
+    assert writer.exists(path)
+    assert writer.read(path) == b"report"
+    assert backend.aliases == {"report_x.txt": blob_key(b"report")}
+    assert not os.path.exists(path)
+    assert not writer.exists(str(tmp_path / "missing.txt"))
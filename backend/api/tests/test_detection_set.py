@@ -0,0 +1,177 @@
+"""Columnar DetectionSet versus the list-of-dicts pipeline it replaced"""
+
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from contour_extraction import create_tooth_polygon
+from detection_set import DetectionSet, RAINBOW_COLORS
+from disease_classifier import DiseaseClassifier
+from predict_enhanced import ToothDiseasePredictor
+
+NAMES = {i: name for i, name in enumerate(
+    [str(tooth) for quadrant in (1, 2, 3, 4) for tooth in range(quadrant * 10 + 1, quadrant * 10 + 9)] + ['tooth']
+)}
+
+
+def fake_contour(box):
+    x1, y1, x2, y2 = box
+    return [(x1, y1), (x2, y1), (x2, y2), (x1 + 1, y2)]
+
+
+class FakeExtractor:
+    """Contour engine stand-in: a deterministic polygon per box, every third one 'timed out'"""
+
+    def extract_many(self, image, boxes, engine):
+        return [(fake_contour(box), True) if sum(box) % 3 else (create_tooth_polygon(*box), False)
+                for box in boxes]
+
+
+def random_raw(seed: int, n: int = 40):
+    rng = random.Random(seed)
+    raw = {'boxes': [], 'confidences': [], 'classes': [], 'mask_polygons': []}
+    for _ in range(n):
+        x1, y1 = rng.randint(0, 900), rng.randint(0, 500)
+        raw['boxes'].append((x1, y1, x1 + rng.randint(10, 90), y1 + rng.randint(20, 200)))
+        raw['confidences'].append(rng.uniform(0.05, 0.99))
+        raw['classes'].append(rng.randrange(len(NAMES)))
+        raw['mask_polygons'].append(
+            [(rng.randint(0, 999), rng.randint(0, 999)) for _ in range(rng.randint(3, 9))]
+            if rng.random() < 0.2 else None
+        )
+    return raw
+
+
+def legacy_process_detections(raw, conf_threshold, polygon_cache, include_polygons, approximate_contours):
+    """The list-of-dicts process_detections before DetectionSet (reference implementation)"""
+    detections, missing = [], []
+    for det_id, conf in enumerate(raw['confidences']):
+        if conf < conf_threshold:
+            continue
+        x1, y1, x2, y2 = raw['boxes'][det_id]
+        class_name = NAMES[raw['classes'][det_id]]
+        try:
+            tooth_number = int(class_name)
+        except ValueError:
+            tooth_number = 0
+        info = DiseaseClassifier.classify_from_model_output(
+            class_name=f"tooth_{class_name}", confidence=conf, tooth_number=tooth_number
+        )
+        polygon, polygon_status = polygon_cache.get(det_id, (None, 'pending'))
+        if polygon is None and raw['mask_polygons'][det_id] is not None:
+            polygon, polygon_status = raw['mask_polygons'][det_id], 'mask'
+            polygon_cache[det_id] = (polygon, polygon_status)
+        detection = {
+            "detection_id": det_id,
+            "tooth_number": tooth_number,
+            "tooth_name": DiseaseClassifier.get_tooth_name(tooth_number),
+            "disease_type": info.disease_type.value,
+            "severity": info.severity.value,
+            "affected_area": info.affected_area.value,
+            "confidence": conf,
+            "bounding_box": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
+            "polygon": polygon,
+            "polygon_status": polygon_status,
+            "color": RAINBOW_COLORS[tooth_number % len(RAINBOW_COLORS)],
+            "recommendations": info.recommendations[:3],
+            "urgency": DiseaseClassifier.get_urgency_level(info.disease_type, info.severity),
+        }
+        if polygon is None and (include_polygons == 'all' or detection['disease_type'].lower() != 'healthy'):
+            missing.append(len(detections))
+        detections.append(detection)
+
+    if missing and approximate_contours:
+        for i in missing:
+            detections[i]['polygon'] = create_tooth_polygon(*raw['boxes'][detections[i]['detection_id']])
+            detections[i]['polygon_status'] = 'approximate'
+        missing = []
+    if missing:
+        boxes = [raw['boxes'][detections[i]['detection_id']] for i in missing]
+        for i, (polygon, exact) in zip(missing, FakeExtractor().extract_many(None, boxes, 'grabcut')):
+            detections[i]['polygon'] = polygon
+            detections[i]['polygon_status'] = 'exact' if exact else 'approximate'
+            polygon_cache[detections[i]['detection_id']] = (polygon, detections[i]['polygon_status'])
+
+    detections.sort(key=lambda x: x['tooth_number'])
+    return detections
+
+
+def legacy_counts(detections):
+    """disease / severity / urgency counts of the legacy create_summary"""
+    disease, severity, urgency = {}, {}, {}
+    for det in detections:
+        disease[det['disease_type']] = disease.get(det['disease_type'], 0) + 1
+        severity[det['severity']] = severity.get(det['severity'], 0) + 1
+        level = det['urgency'].split(' - ')[0]
+        urgency[level] = urgency.get(level, 0) + 1
+    return disease, severity, urgency
+
+
+def normalized(detections):
+    """Polygons as lists of tuples, as both pipelines hand them to json"""
+    return [dict(det, polygon=[tuple(p) for p in det['polygon']] if det['polygon'] is not None else None)
+            for det in detections]
+
+
+@pytest.fixture
+def predictor():
+    predictor = ToothDiseasePredictor.__new__(ToothDiseasePredictor)
+    predictor.model = SimpleNamespace(names=NAMES)
+    predictor.contour_engine = 'grabcut'
+    predictor.contour_extractor = FakeExtractor()
+    return predictor
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('include_polygons', ['drawn', 'all'])
+@pytest.mark.parametrize('approximate', [False, True])
+def test_process_detections_matches_legacy_dicts(predictor, seed, include_polygons, approximate):
+    raw = random_raw(seed)
+    image = np.zeros((1000, 1000, 3), np.uint8)
+    # A few polygons cached by an earlier request
+    cache = {det_id: (fake_contour(raw['boxes'][det_id]), 'exact') for det_id in range(0, 40, 7)}
+
+    detections = predictor.process_detections(raw, image, 0.3, dict(cache), include_polygons,
+                                              approximate_contours=approximate)
+    legacy = legacy_process_detections(raw, 0.3, dict(cache), include_polygons, approximate)
+
+    assert normalized(detections.to_dicts()) == normalized(legacy)
+    assert list(detections.disease_counts().items()) == list(legacy_counts(legacy)[0].items())
+    assert list(detections.severity_counts().items()) == list(legacy_counts(legacy)[1].items())
+    assert list(detections.urgency_counts().items()) == list(legacy_counts(legacy)[2].items())
+
+
+def test_select_filter_and_sort_match_list_operations(predictor):
+    raw = random_raw(11, n=60)
+    detections = predictor.process_detections(raw, None, 0.05, {}, 'all', approximate_contours=True)
+    legacy = normalized(detections.to_dicts())
+
+    assert normalized(detections.filter_confidence(0.5).to_dicts()) == [d for d in legacy if d['confidence'] >= 0.5]
+    assert normalized(detections.select(detections.rendered()).to_dicts()) == \
+        [d for d in legacy if d['disease_type'].lower() != 'healthy']
+    order = [5, 0, 17, 3]
+    assert normalized(detections.select(np.array(order)).to_dicts()) == [legacy[i] for i in order]
+    reversed_set = detections.select(np.arange(len(detections))[::-1])
+    assert normalized(reversed_set.sort_by_tooth().to_dicts()) == \
+        sorted(legacy[::-1], key=lambda d: d['tooth_number'])
+    assert detections.findings() == sorted((d['tooth_number'], d['disease_type'], d['severity']) for d in legacy)
+
+
+def test_from_dicts_round_trips_the_json_schema(predictor):
+    raw = random_raw(3)
+    detections = predictor.process_detections(raw, None, 0.2, {}, 'drawn', approximate_contours=True)
+    dicts = normalized(detections.to_dicts())
+
+    assert normalized(DetectionSet.from_dicts(dicts).to_dicts()) == dicts
+    assert [d['polygon'] for d in DetectionSet.from_dicts(dicts).to_dicts(polygons=False)] == [None] * len(dicts)
+
+
+def test_empty_set():
+    empty = DetectionSet.from_dicts([])
+
+    assert len(empty) == 0
+    assert empty.to_dicts() == []
+    assert empty.disease_counts() == {}
+    assert len(empty.filter_confidence(0.5).sort_by_tooth()) == 0
@@ -0,0 +1,56 @@
+"""Deterministic, non-overlapping label placement"""
+
+import random
+
+from label_layout import LabelLayout
+
+
+def random_labels(seed: int, n: int = 32):
+    rng = random.Random(seed)
+    labels = []
+    for _ in range(n):
+        x1, y1 = rng.randint(0, 1800), rng.randint(0, 900)
+        labels.append(((x1, y1, x1 + rng.randint(40, 120), y1 + rng.randint(80, 250)),
+                       rng.randint(60, 180), rng.randint(18, 30)))
+    return labels
+
+
+def layout_positions(labels, width=2000, height=1000):
+    layout = LabelLayout(width, height)
+    return [layout.place(box, w, h) for box, w, h in labels]
+
+
+def test_same_input_gives_the_same_layout():
+    labels = random_labels(7)
+
+    assert layout_positions(labels) == layout_positions(labels)
+    assert layout_positions(labels) != layout_positions(random_labels(8))
+
+
+def test_first_label_goes_above_its_box_and_the_next_one_moves_away():
+    layout = LabelLayout(1000, 1000)
+
+    assert layout.place((100, 200, 160, 400), 80, 20) == (100, 200 - 20 - 8)
+    # Same box again: 'above' is taken, so the label goes below
+    assert layout.place((100, 200, 160, 400), 80, 20) == (100, 405)
+
+
+def test_labels_stay_inside_the_image_and_do_not_overlap_when_there_is_room():
+    labels = random_labels(3, n=12)
+    positions = layout_positions(labels)
+
+    rects = [(x, y, x + w, y + h) for (x, y), (_, w, h) in zip(positions, labels)]
+    for x0, y0, x1, y1 in rects:
+        assert 0 <= x0 and x1 <= 2000 and 0 <= y0 and y1 <= 1000
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            assert min(a[2], b[2]) <= max(a[0], b[0]) or min(a[3], b[3]) <= max(a[1], b[1])
+
+
+def test_overlap_area_counts_each_placed_label_once():
+    layout = LabelLayout(1000, 1000, margin=0, cell_size=16)
+    x, y = layout.place((100, 200, 160, 400), 100, 40)
+
+    assert layout.overlap_area((x, y, x + 100, y + 40)) == 100 * 40
+    assert layout.overlap_area((x + 50, y + 20, x + 150, y + 60)) == 50 * 20
+    assert layout.overlap_area((0, 0, 10, 10)) == 0
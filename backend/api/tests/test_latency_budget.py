@@ -0,0 +1,53 @@
+"""LatencyBudget.plan: degradations in order, only as many as needed"""
+
+import time
+
+import pytest
+
+from latency_budget import LatencyBudget
+
+
+def budget(ms: float) -> LatencyBudget:
+    return LatencyBudget(ms, started=time.perf_counter())
+
+
+def test_nothing_is_degraded_when_the_stages_fit():
+    b = budget(60000)
+    b.plan({'contours': 2000, 'render': 300, 'save_reports': 20})
+
+    assert b.degradations == []
+
+
+def test_contours_are_dropped_before_annotation_quality():
+    b = budget(60000)
+    b.plan({'contours': 70000, 'render': 300, 'save_reports': 20})
+
+    assert b.degradations == ['approximate_contours']
+    assert not b.degraded('low_quality_annotation')
+
+
+def test_both_degradations_in_order_when_still_over_budget():
+    b = budget(60000)
+    b.plan({'contours': 59000, 'render': 62000, 'save_reports': 20})
+
+    assert b.degradations == ['approximate_contours', 'low_quality_annotation']
+
+
+def test_stages_that_are_not_expected_to_run_are_skipped():
+    b = budget(60000)
+    b.plan({'contours': 0, 'render': 61000})
+
+    assert b.degradations == ['low_quality_annotation']
+
+
+def test_plan_does_not_repeat_degradations():
+    b = budget(1)
+    b.plan({'contours': 5000, 'render': 5000})
+    b.plan({'contours': 5000, 'render': 5000})
+
+    assert b.degradations == ['approximate_contours', 'low_quality_annotation']
+
+
+def test_budget_must_be_positive():
+    with pytest.raises(ValueError):
+        LatencyBudget(0)
@@ -0,0 +1,77 @@
+"""PredictionCache: LRU eviction in both tiers, TTL expiry and disk hits after a restart"""
+
+import json
+
+from prediction_cache import PredictionCache
+
+RESULTS = {'unique_id': 'abc', 'detections': [{'tooth_number': 36}]}
+IMAGE = b'\xff\xd8' + b'x' * 998
+
+
+def entry_size(results=RESULTS, image=IMAGE):
+    return len(json.dumps(results)) + len(image)
+
+
+def test_hits_return_copies_and_survive_a_restart(tmp_path):
+    cache = PredictionCache(str(tmp_path))
+    key = PredictionCache.make_key('hash', 'v1', 0.25)
+
+    assert cache.get(key) is None
+    cache.put(key, RESULTS, IMAGE)
+    hit, image = cache.get(key)
+    hit['unique_id'] = 'changed'
+
+    assert cache.get(key) == (RESULTS, IMAGE)
+    assert PredictionCache(str(tmp_path)).get(key) == (RESULTS, IMAGE)
+    assert key != PredictionCache.make_key('hash', 'v1', 0.3)
+    assert cache.get_stats()['hits_memory'] == 2
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = PredictionCache(str(tmp_path), max_memory_bytes=2 * entry_size() + 10)
+    keys = [PredictionCache.make_key(f'hash{i}', 'v1', 0.25) for i in range(3)]
+
+    cache.put(keys[0], RESULTS, IMAGE)
+    cache.put(keys[1], RESULTS, IMAGE)
+    cache.get(keys[0])
+    cache.put(keys[2], RESULTS, IMAGE)
+
+    stats = cache.get_stats()
+    assert (stats['memory_entries'], stats['evictions_memory']) == (2, 1)
+    cache.get(keys[0])
+    cache.get(keys[1])
+    stats = cache.get_stats()
+    # keys[1] was evicted from memory but is still on disk
+    assert (stats['hits_memory'], stats['hits_disk']) == (2, 1)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    disk_size = len(json.dumps({'created_at': 0.0, 'results': RESULTS})) + len(IMAGE) + 20
+    cache = PredictionCache(str(tmp_path), max_memory_bytes=1, max_disk_bytes=2 * disk_size)
+    keys = [PredictionCache.make_key(f'hash{i}', 'v1', 0.25) for i in range(3)]
+
+    for key in keys:
+        cache.put(key, RESULTS, IMAGE)
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == (RESULTS, IMAGE)
+    assert cache.get_stats()['evictions_disk'] == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        f'{key}.{ext}' for key in keys[1:] for ext in ('json', 'jpg'))
+
+
+def test_expired_entries_are_misses_and_removed(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('prediction_cache.time.time', lambda: clock[0])
+    cache = PredictionCache(str(tmp_path), ttl_seconds=60)
+    key = PredictionCache.make_key('hash', 'v1', 0.25)
+
+    cache.put(key, RESULTS, IMAGE)
+    clock[0] += 59
+    assert cache.get(key) is not None
+    clock[0] += 2
+    assert cache.get(key) is None
+
+    stats = cache.get_stats()
+    assert (stats['expirations'], stats['memory_entries'], stats['disk_entries']) == (2, 0, 0)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,93 @@
+"""ResultsIndex: detection / study queries by tooth, disease, severity, urgency and time"""
+
+import pytest
+
+from results_index import ResultsIndex, parse_timestamp
+
+DAY = 86400
+T0 = parse_timestamp('2026-03-01')
+
+
+def detection(detection_id, tooth, disease, severity, urgency):
+    return {
+        'detection_id': detection_id,
+        'tooth_number': tooth,
+        'tooth_name': f'Tooth {tooth}',
+        'disease_type': disease,
+        'severity': severity,
+        'affected_area': 'Crown',
+        'urgency': urgency,
+        'confidence': 0.8,
+        'bounding_box': {'x1': 10 * detection_id, 'y1': 0, 'x2': 10 * detection_id + 8, 'y2': 40},
+    }
+
+
+def study(unique_id, *detections):
+    return {
+        'unique_id': unique_id,
+        'input_image': f'{unique_id}.jpg',
+        'output_image': f'{unique_id}_annotated.jpg',
+        'model': 'best.pt',
+        'confidence_threshold': 0.25,
+        'contour_engine': 'grabcut',
+        'total_detections': len(detections),
+        'detections': list(detections),
+        'summary': {'healthy_teeth': sum(d['disease_type'] == 'Healthy' for d in detections)},
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ResultsIndex(str(tmp_path / 'index' / 'results.db'))
+    index.add_studies([
+        (study('a',
+               detection(0, 36, 'Abscess', 'Severe', 'URGENT - Seek immediate care'),
+               detection(1, 11, 'Healthy', 'None', 'LOW - Routine checkup')), T0),
+        (study('b',
+               detection(0, 36, 'Caries', 'Moderate', 'HIGH - Schedule within 1 week'),
+               detection(1, 21, 'Abscess', 'Severe', 'URGENT - Seek immediate care')), T0 + DAY),
+        (study('c', detection(0, 36, 'Abscess', 'Mild', 'HIGH - Schedule within 1 week')), T0 + 40 * DAY),
+    ])
+    return index
+
+
+def test_find_detections_by_tooth_and_disease_newest_first(index):
+    total, rows = index.find_detections(tooth_number=36, disease_type='Abscess')
+
+    assert total == 2
+    assert [(r['unique_id'], r['severity']) for r in rows] == [('c', 'Mild'), ('a', 'Severe')]
+    assert rows[0]['input_image'] == 'c.jpg'
+    assert rows[1]['bounding_box'] == {'x1': 0, 'y1': 0, 'x2': 8, 'y2': 40}
+
+
+def test_find_detections_by_urgency_level_time_range_and_page(index):
+    total, rows = index.find_detections(urgency='URGENT', since=T0, until=T0 + 2 * DAY)
+    assert total == 2
+    assert [(r['unique_id'], r['tooth_number']) for r in rows] == [('b', 21), ('a', 36)]
+
+    total, rows = index.find_detections(tooth_number=36, limit=1, offset=1)
+    assert total == 3
+    assert [r['unique_id'] for r in rows] == ['b']
+
+
+def test_find_studies_lists_matching_detections(index):
+    total, studies = index.find_studies(disease_type='Abscess', since=T0, until=T0 + 30 * DAY)
+    assert total == 2
+    assert [(s['unique_id'], s['matching_detection_ids']) for s in studies] == [('b', [1]), ('a', [0])]
+
+    total, studies = index.find_studies(since=T0 + DAY)
+    assert total == 2
+    assert all('matching_detection_ids' not in s for s in studies)
+
+
+def test_reindexing_replaces_and_removal_cascades(index):
+    index.add_study(study('a', detection(0, 11, 'Healthy', 'None', 'LOW - Routine checkup')), T0)
+
+    assert index.find_detections(tooth_number=36, disease_type='Abscess')[0] == 1
+    assert [d['tooth_number'] for d in index.get_study('a')['detections']] == [11]
+    assert index.get_study('a')['created_at'] == '2026-03-01T00:00:00Z'
+
+    assert index.remove_studies(['a', 'b']) == 2
+    assert not index.has_study('a') and index.get_study('b') is None
+    stats = index.get_stats()
+    assert (stats['studies'], stats['detections']) == (1, 1)
@@ -0,0 +1,65 @@
+"""Tile planning, tile-to-image shifts and the class-aware merge of tile detections"""
+
+import numpy as np
+
+from tiling import class_aware_nms, merge_detections, plan_tiles, shift_tile_detections
+
+
+def raw(*detections):
+    """(box, confidence, class) tuples -> raw detection dict without masks"""
+    return {
+        'boxes': [d[0] for d in detections],
+        'confidences': [d[1] for d in detections],
+        'classes': [d[2] for d in detections],
+        'mask_polygons': [None] * len(detections),
+    }
+
+
+def test_tiles_cover_the_image_with_the_requested_overlap():
+    tiles = plan_tiles(3000, 1500, tile_size=1280, overlap=256)
+
+    assert tiles[0] == (0, 0, 1280, 1280)
+    assert tiles[-1] == (3000 - 1280, 1500 - 1280, 3000, 1500)
+    assert sorted({t[0] for t in tiles}) == [0, 1024, 1720]
+    assert sorted({t[1] for t in tiles}) == [0, 220]
+    assert plan_tiles(800, 600, tile_size=1280) == [(0, 0, 800, 600)]
+
+
+def test_shift_drops_boxes_cut_by_inner_tile_borders():
+    tile = (1000, 0, 2000, 1000)
+    detections = raw(
+        ((0, 100, 50, 200), 0.9, 1),       # touches the inner left border
+        ((100, 100, 200, 200), 0.8, 2),    # inside
+        ((900, 100, 999, 200), 0.7, 3),    # touches the inner right border
+        ((100, 0, 200, 90), 0.6, 4),       # top border is an image border: kept
+    )
+    detections['mask_polygons'][1] = [(100, 100), (200, 100), (150, 200)]
+
+    shifted = shift_tile_detections(detections, tile, width=3000, height=1000)
+
+    assert shifted['boxes'] == [(1100, 100, 1200, 200), (1100, 0, 1200, 90)]
+    assert shifted['classes'] == [2, 4]
+    assert shifted['mask_polygons'] == [[(1100, 100), (1200, 100), (1150, 200)], None]
+
+
+def test_class_aware_nms_only_suppresses_within_a_class():
+    boxes = np.array([[0, 0, 100, 100], [5, 5, 105, 105], [0, 0, 100, 100], [300, 300, 400, 400]], np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.7], np.float32)
+    classes = np.array([1, 1, 2, 1])
+
+    assert class_aware_nms(boxes, scores, classes, iou_threshold=0.5) == [1, 3, 2]
+
+
+def test_merge_removes_overlap_duplicates_and_keeps_best_per_class():
+    left = raw(((1000, 100, 1100, 300), 0.8, 5), ((200, 100, 300, 300), 0.9, 6))
+    right = raw(((1004, 102, 1102, 298), 0.85, 5), ((1500, 100, 1600, 300), 0.4, 6))
+
+    merged = merge_detections([left, right], iou_threshold=0.5)
+    assert list(zip(merged['classes'], merged['confidences'])) == [(6, 0.9), (5, 0.85)]
+
+    both = merge_detections([left, right], iou_threshold=0.5, one_per_class=False)
+    assert sorted(both['confidences']) == [0.4, 0.85, 0.9]
+
+
+def test_merge_of_nothing_is_empty():
+    assert merge_detections([raw(), raw()]) == raw()
@@ -0,0 +1,120 @@
+"""
+Tiled Inference Helpers
+Splits high-resolution radiographs into overlapping tiles and merges the tile
+detections back into one set: tile offsets are undone, boxes cut by an inner
+tile border are dropped, class-aware NMS removes duplicates from the overlaps
+and only the best box per tooth class is kept
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+Tile = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+def _axis_starts(length: int, tile_size: int, stride: int) -> List[int]:
+    """Tile start offsets along one axis, the last tile is aligned to the image edge"""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+
+def plan_tiles(width: int, height: int, tile_size: int = 1280, overlap: int = 256) -> List[Tile]:
+    """
+    Overlapping tiles covering the whole image
+
+    Args:
+        width, height: Image size
+        tile_size: Tile edge length in pixels
+        overlap: Overlap between neighbouring tiles in pixels (should exceed a tooth's size)
+    """
+    stride = max(1, tile_size - overlap)
+    return [
+        (x0, y0, min(width, x0 + tile_size), min(height, y0 + tile_size))
+        for y0 in _axis_starts(height, tile_size, stride)
+        for x0 in _axis_starts(width, tile_size, stride)
+    ]
+
+
+def shift_tile_detections(raw: Dict[str, list], tile: Tile, width: int, height: int,
+                          edge_margin: int = 2) -> Dict[str, list]:
+    """
+    Move tile detections into image coordinates
+
+    Boxes touching a tile border that is not an image border are cut off by the
+    tile and dropped - the neighbouring tile (or the full-frame pass) sees them whole
+    """
+    x0, y0, x1, y1 = tile
+    inner_left, inner_top = x0 > 0, y0 > 0
+    inner_right, inner_bottom = x1 < width, y1 < height
+
+    shifted = {'boxes': [], 'confidences': [], 'classes': [], 'mask_polygons': []}
+    for box, conf, cls, polygon in zip(raw['boxes'], raw['confidences'],
+                                       raw['classes'], raw['mask_polygons']):
+        bx1, by1, bx2, by2 = box
+        if (inner_left and bx1 <= edge_margin) or (inner_top and by1 <= edge_margin) or \
+                (inner_right and bx2 >= (x1 - x0) - edge_margin) or \
+                (inner_bottom and by2 >= (y1 - y0) - edge_margin):
+            continue
+        shifted['boxes'].append((bx1 + x0, by1 + y0, bx2 + x0, by2 + y0))
+        shifted['confidences'].append(conf)
+        shifted['classes'].append(cls)
+        shifted['mask_polygons'].append(
+            [(px + x0, py + y0) for px, py in polygon] if polygon is not None else None
+        )
+    return shifted
+
+
+def _box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def class_aware_nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+                    iou_threshold: float = 0.5) -> List[int]:
+    """Greedy NMS within each class, returns kept indices by descending score"""
+    keep = []
+    for cls in np.unique(classes):
+        idx = np.where(classes == cls)[0]
+        idx = idx[np.argsort(-scores[idx], kind='stable')]
+        while idx.size:
+            best = idx[0]
+            keep.append(int(best))
+            idx = idx[1:][_box_iou(boxes[best], boxes[idx[1:]]) < iou_threshold]
+    return sorted(keep, key=lambda i: -scores[i])
+
+
+def merge_detections(parts: List[Dict[str, list]], iou_threshold: float = 0.5,
+                     one_per_class: bool = True) -> Dict[str, list]:
+    """
+    Merge raw detections of all tiles (already in image coordinates)
+
+    Duplicates from overlapping tiles are removed with class-aware NMS; with
+    one_per_class only the highest-confidence box of every tooth class survives
+    """
+    merged = {'boxes': [], 'confidences': [], 'classes': [], 'mask_polygons': []}
+    for part in parts:
+        for key in merged:
+            merged[key].extend(part[key])
+    if not merged['boxes']:
+        return merged
+
+    boxes = np.asarray(merged['boxes'], dtype=np.float32)
+    scores = np.asarray(merged['confidences'], dtype=np.float32)
+    classes = np.asarray(merged['classes'])
+    keep = class_aware_nms(boxes, scores, classes, iou_threshold)
+
+    if one_per_class:
+        seen = set()
+        keep = [i for i in keep if not (classes[i] in seen or seen.add(classes[i]))]
+
+    return {key: [values[i] for i in keep] for key, values in merged.items()}